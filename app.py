@@ -1,50 +1,49 @@
+import importlib
+
 import streamlit as st
-from modules.catalogo import catalogo_module
-from modules.recetas import recetas_module
-from modules.stock import stock_module
-from modules.entradas import entradas_module
-from modules.transferencias import transferencias_module
-from modules.ventas import ventas_module
-from modules.auditorias import auditoria_apertura, auditoria_cierre
-from modules.historial import historial_module
-from modules.reportes import reportes_module
+from modules.rendimiento import panel_rendimiento
+from utils import event_store, perf
+from utils.path_utils import asegurar_estructura
 
 st.set_page_config(page_title="Gestión Inventario Licores", layout="wide")
 
+
+@st.cache_resource(show_spinner=False)
+def arrancar():
+    """Preparación única por proceso del servidor."""
+    asegurar_estructura()
+    # Exportaciones que un corte haya dejado pendientes
+    event_store.recuperar()
+
+
+arrancar()
+
+# Cada página se importa recién cuando se elige (fpdf, xlsxwriter y los
+# cargadores de las demás no se tocan al arrancar)
+PAGINAS = {
+    "Catálogo de Productos": ("modules.catalogo", "catalogo_module"),
+    "Recetas": ("modules.recetas", "recetas_module"),
+    "Stock": ("modules.stock", "stock_module"),
+    "Entradas": ("modules.entradas", "entradas_module"),
+    "Transferencias Internas": ("modules.transferencias", "transferencias_module"),
+    "Salidas (Ventas)": ("modules.ventas", "ventas_module"),
+    "Auditoría de Apertura": ("modules.auditorias", "auditoria_apertura"),
+    "Auditoría de Cierre": ("modules.auditorias", "auditoria_cierre"),
+    "Historial": ("modules.historial", "historial_module"),
+    "Mermas": ("modules.mermas", "mermas_module"),
+    "Reportes": ("modules.reportes", "reportes_module"),
+}
+
 # Barra lateral
 st.sidebar.title("Menú")
-opciones = [
-    "Catálogo de Productos",
-    "Recetas",
-    "Stock",
-    "Entradas",
-    "Transferencias Internas",
-    "Salidas (Ventas)",
-    "Auditoría de Apertura",
-    "Auditoría de Cierre",
-    "Historial",
-    "Reportes"
-]
-eleccion = st.sidebar.radio("Seleccione módulo:", opciones)
+eleccion = st.sidebar.radio("Seleccione módulo:", list(PAGINAS))
+perf.iniciar_rerun(eleccion)
 
 # Router de módulos
-if eleccion == "Catálogo de Productos":
-    catalogo_module()
-elif eleccion == "Recetas":
-    recetas_module()
-elif eleccion == "Stock":
-    stock_module()
-elif eleccion == "Entradas":
-    entradas_module()
-elif eleccion == "Transferencias Internas":
-    transferencias_module()
-elif eleccion == "Salidas (Ventas)":
-    ventas_module()
-elif eleccion == "Auditoría de Apertura":
-    auditoria_apertura()
-elif eleccion == "Auditoría de Cierre":
-    auditoria_cierre()
-elif eleccion == "Historial":
-    historial_module()
-elif eleccion == "Reportes":
-    reportes_module()
+with perf.medir(f"pagina.{eleccion}"):
+    modulo, funcion = PAGINAS[eleccion]
+    with perf.medir("pagina.importar", modulo=modulo):
+        pagina = getattr(importlib.import_module(modulo), funcion)
+    pagina()
+
+panel_rendimiento()
@@ -0,0 +1,118 @@
+"""Tiempo de importación al arrancar la app (``python -X importtime``).
+
+Ejecuta en procesos nuevos, con ``INVENTARIO_DATA_DIR`` apuntando a un árbol
+vacío, dos escenarios:
+
+- ``perezoso``: ``import app`` tal como arranca hoy (sólo se importa la
+  página elegida, la primera del menú).
+- ``todas_las_paginas``: ``import app`` más todas las páginas, que es lo que
+  se importaba al arrancar cuando ``app.py`` las cargaba todas al inicio.
+
+Para cada uno informa el tiempo de importación acumulado, el tiempo total del
+proceso, cuántos módulos se cargaron, si se cargaron ``fpdf``,
+``xlsxwriter`` y ``openpyxl`` y los paquetes y módulos propios más
+pesados::
+
+    python -m benchmarks.arranque
+    python -m benchmarks.arranque --repeticiones 5 --salida arranque.json
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPETICIONES = 3
+PESADOS = ["fpdf", "xlsxwriter", "openpyxl"]
+PROPIOS = {"modules", "utils", "core"}
+
+ESCENARIOS = {
+    "perezoso": "import app",
+    "todas_las_paginas": (
+        "import importlib, app\n"
+        "for modulo, _ in app.PAGINAS.values():\n"
+        "    importlib.import_module(modulo)"
+    ),
+}
+
+
+def _importtime(stderr):
+    """Filas (modulo, nivel, propio_us, acumulado_us) del reporte de -X importtime."""
+    filas = []
+    for linea in stderr.splitlines():
+        if not linea.startswith("import time:") or "self [us]" in linea:
+            continue
+        propio, acumulado, nombre = linea[len("import time:"):].split("|", 2)
+        nivel = (len(nombre) - len(nombre.lstrip()) - 1) // 2
+        filas.append((nombre.strip(), nivel, int(propio), int(acumulado)))
+    return filas
+
+
+def medir(codigo, data_dir):
+    """Corre ``codigo`` en un proceso nuevo y resume su reporte de importación."""
+    entorno = dict(os.environ, INVENTARIO_DATA_DIR=data_dir, PYTHONPATH=RAIZ)
+    inicio = time.perf_counter()
+    salida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", codigo],
+        cwd=RAIZ, env=entorno, capture_output=True, text=True, check=True,
+    )
+    total = time.perf_counter() - inicio
+    filas = _importtime(salida.stderr)
+    modulos = {nombre for nombre, *_ in filas}
+    # Paquetes de terceros y módulos propios, no el propio script
+    paquetes = sorted(
+        (
+            f for f in filas
+            if f[0] != "app" and ("." not in f[0] or f[0].split(".")[0] in PROPIOS)
+        ),
+        key=lambda f: f[3], reverse=True,
+    )
+    return {
+        "proceso_s": total,
+        "importacion_s": sum(f[3] for f in filas if f[1] == 0) / 1e6,
+        "modulos": len(modulos),
+        "pesados": {p: p in modulos for p in PESADOS},
+        "mas_pesados": [(nombre, acumulado / 1e6) for nombre, _, _, acumulado in paquetes[:10]],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de importación al arrancar la app.")
+    parser.add_argument("--repeticiones", type=int, default=REPETICIONES)
+    parser.add_argument("--salida", help="ruta del JSON de resultados")
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="arranque_")
+    resultados = {}
+    try:
+        for nombre, codigo in ESCENARIOS.items():
+            corridas = [medir(codigo, data_dir) for _ in range(args.repeticiones)]
+            resultados[nombre] = min(corridas, key=lambda r: r["importacion_s"])
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    for nombre, r in resultados.items():
+        cargados = ", ".join(p for p, si in r["pesados"].items() if si) or "ninguno"
+        print(
+            f"{nombre:<18} importación {r['importacion_s']:7.3f}s  proceso {r['proceso_s']:7.3f}s  "
+            f"{r['modulos']:5d} módulos  pesados: {cargados}"
+        )
+        for modulo, segundos in r["mas_pesados"]:
+            print(f"{'':<20}{modulo:<40} {segundos:7.3f}s")
+    base = resultados["todas_las_paginas"]["importacion_s"]
+    if base:
+        ahorro = 1 - resultados["perezoso"]["importacion_s"] / base
+        print(f"El arranque perezoso importa {ahorro:.0%} menos que cargar todas las páginas.")
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
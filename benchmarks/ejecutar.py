@@ -0,0 +1,227 @@
+"""Benchmarks de las rutas críticas a varios tamaños de datos.
+
+Para cada tamaño se genera un árbol sintético (``benchmarks.generar_datos``)
+en una carpeta temporal y se mide, en un proceso aparte con
+``INVENTARIO_DATA_DIR`` apuntando a ese árbol:
+
+- importación inicial de los Excel al almacén
+- ``calcular_stock_actual`` (recálculo completo) y ``stock_desde_saldos``
+- ``stock_al`` a mitad del período (acumulados por día)
+- ``leer_tasas``: tasas de consumo para el pronóstico, ya calculadas
+- análisis de mermas: diferencias de auditoría (ya en memoria) y los peores pares
+- ``procesar_ventas`` de un día de POS
+- ``conciliar_cierre`` de un día
+- ``cargar_historial`` de un tipo y la primera página del historial completo
+- ``generar_pdf_stock`` (``PDF.tabla``)
+
+Los resultados se guardan en ``benchmarks/resultados/<fecha>.json``; con
+``--comparar`` se contrastan con una corrida anterior y el proceso termina
+con error si alguna medición empeoró más que ``--umbral``::
+
+    python -m benchmarks.ejecutar
+    python benchmarks/ejecutar.py --tamanos 50x30
+    python -m benchmarks.ejecutar --tamanos 100x30 --comparar benchmarks/resultados/base.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    # También como ``python benchmarks/ejecutar.py``: ahí sólo benchmarks/ está en el path
+    sys.path.insert(0, RAIZ)
+RESULTADOS_DIR = os.path.join(RAIZ, "benchmarks", "resultados")
+TAMANOS = ["50x30", "200x90", "500x180"]  # items x días
+REPETICIONES = 3
+MIN_DIFERENCIA_S = 0.005  # diferencias menores se consideran ruido
+
+
+def _cronometrar(funcion, repeticiones=REPETICIONES, antes=None):
+    """Mejor tiempo (s) de ``repeticiones`` llamadas; ``antes`` se llama sin medir."""
+    mejor = None
+    for _ in range(repeticiones):
+        if antes:
+            antes()
+        inicio = time.perf_counter()
+        funcion()
+        transcurrido = time.perf_counter() - inicio
+        mejor = transcurrido if mejor is None else min(mejor, transcurrido)
+    return mejor
+
+
+def medir(data_dir):
+    """Mide las rutas críticas sobre ``data_dir`` (ya en INVENTARIO_DATA_DIR)."""
+    from glob import glob
+
+    import pandas as pd
+
+    from core.auditorias import conciliar_cierre
+    from core.mermas import HistorialMermas
+    from core.ventas import procesar_ventas
+    from modules.catalogo import load_catalog
+    from modules.historial import cargar_historial
+    from modules.recetas import load_recetas
+    from modules.stock import calcular_stock_actual, stock_al, stock_desde_saldos
+    from utils import cache, consumo, diferencias, event_store, historial_index
+    from utils.pdf_report import generar_pdf_stock
+
+    tiempos = {}
+    inicio = time.perf_counter()
+    event_store.importar_desde_excel()
+    tiempos["importacion_inicial"] = time.perf_counter() - inicio
+
+    cat = load_catalog()
+    recetas = load_recetas(cat)
+    tiempos["calcular_stock_actual"] = _cronometrar(
+        lambda: calcular_stock_actual(cat), antes=cache.invalidar
+    )
+    tiempos["stock_desde_saldos"] = _cronometrar(
+        lambda: stock_desde_saldos(cat), antes=cache.invalidar
+    )
+    dias = event_store.archivos("entradas")
+    mitad = datetime.strptime(dias[len(dias) // 2][-15:-5], "%Y-%m-%d")
+    tiempos["stock_al"] = _cronometrar(lambda: stock_al(mitad, cat), antes=cache.invalidar)
+    consumo.leer_tasas()  # el primer cálculo ocurre una vez, al llegar las ventas
+    tiempos["leer_tasas"] = _cronometrar(consumo.leer_tasas, antes=cache.invalidar)
+    diferencias.leer()  # la primera lectura trae todas las auditorías
+    tiempos["mermas"] = _cronometrar(
+        lambda: HistorialMermas.de(diferencias.leer()).peores(), antes=cache.invalidar
+    )
+
+    ultimo_pos = sorted(glob(os.path.join(data_dir, "pos", "ventas_pos_*.xlsx")))[-1]
+    pos = pd.read_excel(ultimo_pos, header=1)
+    fecha = datetime.strptime(os.path.basename(ultimo_pos)[11:21], "%Y-%m-%d")
+    tiempos["procesar_ventas"] = _cronometrar(
+        lambda: procesar_ventas(pos, "Descripción", "Subcategoría", "Cantidad", cat, recetas, fecha)
+    )
+
+    dia = fecha.strftime("%Y-%m-%d")
+    conteo = event_store.leer("auditoria_cierre", fecha=dia).assign(**{"Conteo Apertura": 0.0})
+    entradas = event_store.leer("entradas", fecha=dia)
+    trans = event_store.leer("transferencias", fecha=dia)
+    ventas = event_store.leer("ventas_procesadas", fecha=dia)
+    tiempos["conciliar_cierre"] = _cronometrar(
+        lambda: conciliar_cierre(conteo, entradas, trans, ventas)
+    )
+
+    tiempos["cargar_historial"] = _cronometrar(
+        lambda: cargar_historial("Auditoría cierre"), antes=cache.invalidar
+    )
+    tiempos["historial_pagina"] = _cronometrar(
+        lambda: (historial_index.contar(), historial_index.consultar(pagina=0)),
+        antes=cache.invalidar,
+    )
+
+    df_stock = stock_desde_saldos(cat)
+    tiempos["generar_pdf_stock"] = _cronometrar(lambda: generar_pdf_stock(df_stock), repeticiones=1)
+
+    filas = {
+        tabla: len(event_store.leer(tabla)) for tabla in event_store.TABLAS
+    }
+    return {"tiempos": tiempos, "filas": filas, "lineas_pos": len(pos), "filas_stock": len(df_stock)}
+
+
+def _correr_tamano(tamano, semilla):
+    from benchmarks.generar_datos import generar
+
+    items, dias = (int(x) for x in tamano.split("x"))
+    destino = tempfile.mkdtemp(prefix=f"bench_{tamano}_")
+    try:
+        inicio = time.perf_counter()
+        resumen = generar(destino, items=items, dias=dias, semilla=semilla)
+        generacion = time.perf_counter() - inicio
+        entorno = dict(os.environ, INVENTARIO_DATA_DIR=destino, PYTHONPATH=RAIZ)
+        salida = subprocess.run(
+            [sys.executable, "-m", "benchmarks.ejecutar", "--medir", destino],
+            cwd=RAIZ, env=entorno, capture_output=True, text=True, check=True,
+        )
+        resultado = json.loads(salida.stdout.strip().splitlines()[-1])
+    finally:
+        shutil.rmtree(destino, ignore_errors=True)
+    return {**resumen, "generacion_s": generacion, **resultado}
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(actual, base, umbral):
+    """Imprime la relación actual/base de cada medición; devuelve las regresiones."""
+    regresiones = []
+    for tamano, datos in actual["tamanos"].items():
+        previos = base.get("tamanos", {}).get(tamano)
+        if not previos:
+            continue
+        for nombre, segundos in datos["tiempos"].items():
+            anterior = previos["tiempos"].get(nombre)
+            if not anterior:
+                continue
+            relacion = segundos / anterior
+            peor = relacion > umbral and segundos - anterior > MIN_DIFERENCIA_S
+            marca = "  <-- más lento" if peor else ""
+            print(f"{tamano:>10} {nombre:<24} {anterior:9.4f}s -> {segundos:9.4f}s  x{relacion:5.2f}{marca}")
+            if peor:
+                regresiones.append((tamano, nombre, relacion))
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de rendimiento del inventario.")
+    parser.add_argument("--tamanos", default=",".join(TAMANOS),
+                        help="lista separada por comas de items x días, p. ej. 50x30,200x90")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", help="ruta del JSON de resultados")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior")
+    parser.add_argument("--umbral", type=float, default=1.25,
+                        help="relación actual/base a partir de la cual se considera regresión")
+    parser.add_argument("--medir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        print(json.dumps(medir(args.medir)))
+        return 0
+
+    resultado = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "tamanos": {},
+    }
+    for tamano in args.tamanos.split(","):
+        print(f"Midiendo {tamano}...", file=sys.stderr)
+        resultado["tamanos"][tamano] = _correr_tamano(tamano.strip(), args.semilla)
+        for nombre, segundos in resultado["tamanos"][tamano]["tiempos"].items():
+            print(f"{tamano:>10} {nombre:<24} {segundos:9.4f}s")
+
+    salida = args.salida or os.path.join(
+        RESULTADOS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json"
+    )
+    os.makedirs(os.path.dirname(salida) or ".", exist_ok=True)
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+        if comparar(resultado, base, args.umbral):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
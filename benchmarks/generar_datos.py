@@ -0,0 +1,239 @@
+"""Generador de un árbol ``data/`` sintético para pruebas de rendimiento.
+
+Escribe catálogo, recetas y ``dias`` días de entradas, transferencias,
+ventas procesadas y auditorías con los mismos nombres de archivo que espera
+``utils/path_utils.py``. Además deja, fuera de las carpetas de la app, los
+insumos crudos de cada día: ``pos/ventas_pos_YYYY-MM-DD.xlsx`` (formato del
+POS, con la primera fila vacía) y ``conteos/conteo_{apertura,cierre}_YYYY-MM-DD.xlsx``
+(plantilla de conteo en botellas).
+
+Uso::
+
+    python -m benchmarks.generar_datos /tmp/datos --items 200 --dias 90
+    INVENTARIO_DATA_DIR=/tmp/datos streamlit run app.py
+"""
+import argparse
+import os
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+UBICACIONES = ["Almacén", "Barra", "Vinera"]
+SUBCAT_TRAGOS = ["Rones", "Whiskys", "Vodkas", "Ginebras", "Tequilas"]
+SUBCAT_VINOS = ["Tintos", "Blancos", "Espumantes"]
+SUBCAT_CTL = "Cocteles Clasicos"
+
+
+def _escribir(df, ruta, fila_inicial=0):
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with pd.ExcelWriter(ruta, engine="xlsxwriter") as writer:
+        df.to_excel(writer, index=False, startrow=fila_inicial)
+
+
+def _catalogo(rng, items):
+    n_ctl = max(1, items // 10)
+    n_bot = max(1, (items - n_ctl) // 3)
+    n_trg = max(1, items - n_ctl - n_bot)
+    trg = pd.DataFrame({
+        "Nombre": [f"Trago {i:04d}" for i in range(n_trg)],
+        "Subcategoría": rng.choice(SUBCAT_TRAGOS, n_trg),
+        "Tipo_venta": "TRG",
+        "Unidad": "ml",
+        "Volumen_ml_por_unidad": rng.choice([700.0, 750.0, 1000.0], n_trg),
+        "Dosis_ml": rng.choice([30.0, 45.0, 60.0], n_trg),
+    })
+    bot = pd.DataFrame({
+        "Nombre": [f"Vino {i:04d}" for i in range(n_bot)],
+        "Subcategoría": rng.choice(SUBCAT_VINOS, n_bot),
+        "Tipo_venta": "BOT",
+        "Unidad": "ml",
+        "Volumen_ml_por_unidad": 750.0,
+        "Dosis_ml": np.nan,
+    })
+    ctl = pd.DataFrame({
+        "Nombre": [f"Coctel {i:04d}" for i in range(n_ctl)],
+        "Subcategoría": SUBCAT_CTL,
+        "Tipo_venta": "CTL",
+        "Unidad": "ml",
+        "Volumen_ml_por_unidad": np.nan,
+        "Dosis_ml": np.nan,
+    })
+    return pd.concat([trg, bot, ctl], ignore_index=True)
+
+
+def _recetas(rng, catalogo):
+    trg = catalogo.loc[catalogo["Tipo_venta"] == "TRG", "Nombre"].to_numpy()
+    filas = []
+    for producto in catalogo.loc[catalogo["Tipo_venta"] == "CTL", "Nombre"]:
+        for ingrediente in rng.choice(trg, size=min(len(trg), rng.integers(2, 5)), replace=False):
+            filas.append({
+                "Producto_vendido": producto,
+                "Ingrediente": ingrediente,
+                "Subcategoría": SUBCAT_CTL,
+                "Cantidad_usada": 1,
+                "Unidad": "ml",
+            })
+    return pd.DataFrame(filas)
+
+
+def _ventas_pos(rng, catalogo, lineas):
+    vendibles = catalogo.sample(n=lineas, replace=True, random_state=int(rng.integers(1 << 31)))
+    return pd.DataFrame({
+        "Descripción": vendibles["Nombre"].to_numpy(),
+        "Subcategoría": vendibles["Subcategoría"].to_numpy(),
+        "Cantidad": rng.integers(1, 6, lineas),
+    })
+
+
+def _consumo(catalogo, recetas, pos, fecha):
+    """Ventas procesadas en el formato del almacén (sin pasar por la app)."""
+    cat = catalogo.set_index("Nombre")
+    dosis = cat["Dosis_ml"]
+    filas = pos.merge(catalogo, left_on=["Descripción", "Subcategoría"],
+                      right_on=["Nombre", "Subcategoría"])
+    directas = filas[filas["Tipo_venta"] != "CTL"]
+    cantidad = np.where(
+        directas["Tipo_venta"] == "TRG",
+        directas["Dosis_ml"] * directas["Cantidad"],
+        directas["Volumen_ml_por_unidad"] * directas["Cantidad"],
+    )
+    partes = [pd.DataFrame({
+        "Producto vendido": directas["Nombre"].to_numpy(),
+        "Item usado": directas["Nombre"].to_numpy(),
+        "Cantidad teórica consumida": cantidad,
+    })]
+    ctl = filas[filas["Tipo_venta"] == "CTL"].merge(
+        recetas, left_on="Nombre", right_on="Producto_vendido", suffixes=("", "_receta")
+    )
+    partes.append(pd.DataFrame({
+        "Producto vendido": ctl["Nombre"].to_numpy(),
+        "Item usado": ctl["Ingrediente"].to_numpy(),
+        "Cantidad teórica consumida": dosis.reindex(ctl["Ingrediente"]).to_numpy() * ctl["Cantidad"].to_numpy(),
+    }))
+    consumo = pd.concat(partes, ignore_index=True)
+    consumo.insert(0, "Fecha", fecha)
+    consumo["Subcategoría"] = cat["Subcategoría"].reindex(consumo["Producto vendido"]).to_numpy()
+    consumo["Ubicación de salida"] = "Barra"
+    consumo["Unidad"] = "ml"
+    return consumo[[
+        "Fecha", "Producto vendido", "Item usado", "Subcategoría",
+        "Cantidad teórica consumida", "Ubicación de salida", "Unidad",
+    ]]
+
+
+def generar(destino, items=200, dias=90, semilla=0, inicio=None):
+    """Escribe el árbol sintético en ``destino`` y devuelve un resumen de filas."""
+    rng = np.random.default_rng(semilla)
+    inicio = inicio or date(2024, 1, 1)
+    carpetas = {
+        "catalogo": os.path.join(destino, "catalogo"),
+        "recetas": os.path.join(destino, "recetas"),
+        "entradas": os.path.join(destino, "entradas"),
+        "transferencias": os.path.join(destino, "transferencias"),
+        "ventas_procesadas": os.path.join(destino, "ventas_procesadas"),
+        "apertura": os.path.join(destino, "auditorias", "apertura"),
+        "cierre": os.path.join(destino, "auditorias", "cierre"),
+        "cierres_confirmados": os.path.join(destino, "cierres_confirmados"),
+        "pos": os.path.join(destino, "pos"),
+        "conteos": os.path.join(destino, "conteos"),
+    }
+    catalogo = _catalogo(rng, items)
+    recetas = _recetas(rng, catalogo)
+    _escribir(catalogo, os.path.join(carpetas["catalogo"], f"catalogo_{inicio}.xlsx"))
+    _escribir(recetas, os.path.join(carpetas["recetas"], f"recetas_{inicio}.xlsx"))
+
+    inventariables = catalogo[catalogo["Tipo_venta"] != "CTL"]
+    pares = pd.MultiIndex.from_product(
+        [inventariables["Nombre"], UBICACIONES], names=["Item", "Ubicación"]
+    ).to_frame(index=False)
+    volumen = inventariables.set_index("Nombre")["Volumen_ml_por_unidad"]
+    subcat = catalogo.set_index("Nombre")["Subcategoría"]
+    resumen = {"items": len(catalogo), "dias": dias, "filas": 0, "archivos": 2}
+    cierre_prev = None
+    for d in range(dias):
+        fecha = str(inicio + timedelta(days=d))
+        n_ent = max(1, len(inventariables) // 10)
+        ent_items = rng.choice(inventariables["Nombre"], n_ent)
+        entradas = pd.DataFrame({
+            "Fecha": fecha,
+            "Item": ent_items,
+            "Subcategoría": subcat.reindex(ent_items).to_numpy(),
+            "Ubicación destino": "Almacén",
+            "Cantidad": volumen.reindex(ent_items).to_numpy() * rng.integers(1, 13, n_ent),
+        })
+        n_tr = max(1, len(inventariables) // 5)
+        tr_items = rng.choice(inventariables["Nombre"], n_tr)
+        transferencias = pd.DataFrame({
+            "Fecha": fecha,
+            "Item": tr_items,
+            "Desde": "Almacén",
+            "Hacia": rng.choice(["Barra", "Vinera"], n_tr),
+            "Cantidad": volumen.reindex(tr_items).to_numpy() * rng.integers(1, 4, n_tr),
+        })
+        pos = _ventas_pos(rng, catalogo, max(5, len(catalogo) // 2))
+        consumo = _consumo(catalogo, recetas, pos, fecha)
+
+        fisico = pd.Series(
+            volumen.reindex(pares["Item"]).to_numpy() * rng.uniform(0, 12, len(pares)).round(1),
+            index=pd.MultiIndex.from_frame(pares),
+        )
+        anterior = cierre_prev if cierre_prev is not None else fisico
+        apertura = pd.DataFrame({
+            "Item": pares["Item"],
+            "Ubicación": pares["Ubicación"],
+            "Cierre anterior": anterior.to_numpy(),
+            "Conteo Apertura": anterior.to_numpy(),
+            "Diferencia": 0.0,
+        })
+        teorico = fisico.to_numpy() * rng.uniform(0.95, 1.05, len(pares))
+        cierre = pd.DataFrame({
+            "Item": pares["Item"],
+            "Ubicación": pares["Ubicación"],
+            "Físico Cierre": fisico.to_numpy(),
+            "Teorico": teorico,
+            "Diferencia": fisico.to_numpy() - teorico,
+        })
+        cierre_prev = fisico
+
+        conteo = pd.DataFrame({
+            "Fecha": fecha,
+            "Item": pares["Item"],
+            "Subcategoría": subcat.reindex(pares["Item"]).to_numpy(),
+            "Ubicación": pares["Ubicación"],
+            "Requisicion": 0,
+        })
+        botellas = (fisico / volumen.reindex(pares["Item"]).to_numpy()).round(2).to_numpy()
+
+        _escribir(entradas, os.path.join(carpetas["entradas"], f"entradas_{fecha}.xlsx"))
+        _escribir(transferencias, os.path.join(carpetas["transferencias"], f"transferencias_{fecha}.xlsx"))
+        _escribir(consumo, os.path.join(carpetas["ventas_procesadas"], f"ventas_procesadas_{fecha}.xlsx"))
+        _escribir(apertura, os.path.join(carpetas["apertura"], f"auditoria_apertura_{fecha}.xlsx"))
+        _escribir(cierre, os.path.join(carpetas["cierre"], f"auditoria_cierre_{fecha}.xlsx"))
+        _escribir(cierre, os.path.join(carpetas["cierres_confirmados"], f"auditoria_cierre_{fecha}.xlsx"))
+        _escribir(pos, os.path.join(carpetas["pos"], f"ventas_pos_{fecha}.xlsx"), fila_inicial=1)
+        _escribir(
+            conteo.assign(**{"Conteo Apertura": botellas}),
+            os.path.join(carpetas["conteos"], f"conteo_apertura_{fecha}.xlsx"),
+        )
+        _escribir(
+            conteo.assign(**{"Conteo Cierre": botellas}),
+            os.path.join(carpetas["conteos"], f"conteo_cierre_{fecha}.xlsx"),
+        )
+        resumen["filas"] += (
+            len(entradas) + len(transferencias) + len(consumo) + 3 * len(pares)
+        )
+        resumen["archivos"] += 6
+    for carpeta in ("plantillas", "reportes_pdf"):
+        os.makedirs(os.path.join(destino, carpeta), exist_ok=True)
+    return resumen
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera un árbol data/ sintético.")
+    parser.add_argument("destino")
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--dias", type=int, default=90)
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args()
+    print(generar(args.destino, args.items, args.dias, args.semilla))
@@ -0,0 +1,159 @@
+"""Conciliación de las auditorías de apertura y cierre.
+
+Las funciones trabajan sobre DataFrames ya leídos y no muestran nada: los
+problemas del archivo de conteo se devuelven para que la página o la línea
+de comandos decidan cómo informarlos.
+"""
+import pandas as pd
+
+from utils import perf
+from utils.movimientos import sumar_por_par
+from utils.unit_conversion import CatalogIndex
+
+# Ubicaciones disponibles para las auditorías
+UBICACIONES = ["Almacén", "Barra", "Vinera"]
+
+COLUMNAS_REQUISICION = ["Fecha", "Item", "Desde", "Hacia", "Cantidad"]
+
+
+def preparar_conteo(df, columna, ubicacion="General"):
+    """Valida un conteo físico y completa ``Ubicación`` y ``Requisicion``.
+
+    ``columna`` es la columna del conteo ("Conteo Apertura" o "Conteo
+    Cierre"). Con ``ubicacion`` distinta de "General" todas las filas se
+    asignan a esa ubicación. Devuelve ``(df, faltantes)``; si falta alguna
+    columna requerida ``df`` es ``None``.
+    """
+    requeridas = ["Fecha", "Item", "Subcategoría", columna]
+    if ubicacion == "General":
+        requeridas.append("Ubicación")
+    faltantes = [c for c in requeridas if c not in df.columns]
+    if faltantes:
+        return None, faltantes
+    df = df.copy()
+    if ubicacion != "General":
+        df["Ubicación"] = ubicacion
+    if "Requisicion" not in df.columns:
+        df["Requisicion"] = 0
+    return df, []
+
+
+def conteo_a_ml(df, catalogo, columnas):
+    """Convierte ``columnas`` del conteo (en botellas) a ml según el catálogo."""
+    indice = CatalogIndex.de(catalogo)
+    df = df.copy()
+    for col in columnas:
+        df[col] = indice.to_ml_series(df["Item"], df[col])
+    return df
+
+
+def apertura_a_ml(df, catalogo):
+    """Pasa a ml una auditoría de apertura guardada con los conteos en botellas."""
+    return conteo_a_ml(df, catalogo, ["Cierre anterior", "Conteo Apertura", "Diferencia"])
+
+
+def cierre_a_ml(df, apertura, catalogo, entradas, trans, ventas):
+    """Pasa a ml una auditoría de cierre guardada con el conteo en botellas.
+
+    El físico se convierte con la capacidad; el teórico se había calculado
+    mezclando botellas con movimientos en ml, así que se vuelve a conciliar
+    con ``apertura`` (la auditoría de apertura del día, ya en ml) y los
+    movimientos registrados del día.
+    """
+    df = conteo_a_ml(df, catalogo, ["Físico Cierre"])
+    return conciliar_cierre(unir_apertura(df, apertura), entradas, trans, ventas)
+
+
+def requisiciones(df, fecha):
+    """Transferencias Almacén -> ubicación declaradas en la columna 'Requisicion'."""
+    cantidades = pd.to_numeric(df["Requisicion"], errors="coerce")
+    pedidas = df[cantidades > 0]
+    return pd.DataFrame({
+        "Fecha": fecha,
+        "Item": pedidas["Item"].to_numpy(),
+        "Desde": "Almacén",
+        "Hacia": pedidas["Ubicación"].to_numpy(),
+        "Cantidad": cantidades[cantidades > 0].to_numpy(),
+    }, columns=COLUMNAS_REQUISICION)
+
+
+def sumar_requisiciones(transferencias, nuevas):
+    """Transferencias del día más las requisiciones que aún no estaban registradas.
+
+    Sigue la misma regla que el registro de requisiciones en el almacén: se
+    omiten las que repiten Item, Desde, Hacia y Cantidad de otra del día.
+    """
+    claves = ["Item", "Desde", "Hacia", "Cantidad"]
+    nuevas = nuevas.drop_duplicates(subset=claves)
+    if nuevas.empty:
+        return transferencias
+    if transferencias.empty:
+        return nuevas.reset_index(drop=True)
+    existentes = transferencias[claves].drop_duplicates().astype({"Cantidad": float})
+    cruce = nuevas.astype({"Cantidad": float}).merge(
+        existentes, on=claves, how="left", indicator=True
+    )
+    nuevas = nuevas[(cruce["_merge"] == "left_only").to_numpy()]
+    return pd.concat([transferencias, nuevas], ignore_index=True)
+
+
+def unir_apertura(df, df_open):
+    """Toma el 'Conteo Apertura' de la auditoría de apertura del día (0 si falta)."""
+    if "Conteo Apertura" in df.columns:
+        df = df.drop(columns=["Conteo Apertura"])
+    df = df.merge(
+        df_open[["Item", "Ubicación", "Conteo Apertura"]],
+        on=["Item", "Ubicación"],
+        how="left",
+    )
+    df["Conteo Apertura"] = df["Conteo Apertura"].fillna(0)
+    return df
+
+
+@perf.medido("auditoria.conciliar_cierre")
+def conciliar_cierre(df, entradas, trans, ventas):
+    """Compara el conteo físico de cierre con el cierre teórico de cada fila.
+
+    Teórico = apertura + entradas + transferencias recibidas - enviadas -
+    consumo (sólo en Barra y Vinera). Los movimientos se agregan una vez por
+    (Item, Ubicación) y se alinean con las filas del conteo.
+    """
+    pares = pd.MultiIndex.from_frame(df[["Item", "Ubicación"]])
+    apertura = df["Conteo Apertura"].astype(float).to_numpy()
+    cierre_fisico = df["Físico Cierre"].astype(float).to_numpy()
+    entradas_sum = sumar_por_par(entradas, "Item", "Ubicación destino", "Cantidad", pares)
+    transf_in = sumar_por_par(trans, "Item", "Hacia", "Cantidad", pares)
+    transf_out = sumar_por_par(trans, "Item", "Desde", "Cantidad", pares)
+    consumo = sumar_por_par(ventas, "Item usado", "Ubicación de salida", "Cantidad teórica consumida", pares)
+    consumo = consumo.where(df["Ubicación"].isin(["Barra", "Vinera"]).to_numpy(), 0.0)
+    teorico_cierre = (
+        apertura + entradas_sum.to_numpy() + (transf_in - transf_out).to_numpy() - consumo.to_numpy()
+    )
+    return pd.DataFrame({
+        "Item": df["Item"].to_numpy(),
+        "Ubicación": df["Ubicación"].to_numpy(),
+        "Físico Cierre": cierre_fisico,
+        "Teorico": teorico_cierre,
+        "Diferencia": cierre_fisico - teorico_cierre,
+    }, columns=["Item", "Ubicación", "Físico Cierre", "Teorico", "Diferencia"])
+
+@perf.medido("auditoria.comparar_apertura")
+def comparar_apertura(df, prev):
+    """Compara el conteo de apertura con el cierre confirmado del día anterior.
+
+    Une el conteo con el cierre previo por (Item, Ubicación) en un solo paso;
+    si un par no tiene cierre previo se toma 0. Acepta cierres con la columna
+    antigua 'Conteo Cierre'.
+    """
+    if "Conteo Cierre" in prev.columns and "Físico Cierre" not in prev.columns:
+        prev = prev.rename(columns={"Conteo Cierre": "Físico Cierre"})
+    anterior = prev.drop_duplicates(subset=["Item", "Ubicación"])[
+        ["Item", "Ubicación", "Físico Cierre"]
+    ].rename(columns={"Físico Cierre": "Cierre anterior"})
+    df_res = df[["Item", "Ubicación", "Conteo Apertura"]].merge(
+        anterior, on=["Item", "Ubicación"], how="left", indicator=True
+    )
+    encontrado = df_res["_merge"] == "both"
+    df_res["Cierre anterior"] = df_res["Cierre anterior"].astype(float).where(encontrado, 0.0)
+    df_res["Diferencia"] = df_res["Conteo Apertura"].astype(float) - df_res["Cierre anterior"]
+    return df_res[["Item", "Ubicación", "Cierre anterior", "Conteo Apertura", "Diferencia"]]
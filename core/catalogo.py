@@ -0,0 +1,137 @@
+"""Validación del catálogo y de las recetas, sin dependencias de la interfaz.
+
+Las funciones devuelven los avisos como una lista de ``(nivel, mensaje)``
+(``nivel`` es ``"error"`` o ``"warning"``) para que la página los muestre o
+la línea de comandos los imprima.
+"""
+import os
+from glob import glob
+
+import pandas as pd
+
+from core.recetas import compilar
+from utils import cache
+from utils.path_utils import CATALOGO_DIR, RECETAS_DIR, latest_file
+from utils.unit_conversion import CatalogIndex
+
+COLUMNAS_CATALOGO = [
+    "Item",
+    "Subcategoría",
+    "Tipo_venta",
+    "Unidad",
+    "Volumen_ml_por_unidad",
+    "Dosis_ml",
+]
+
+COLUMNAS_RECETAS = [
+    "Producto_vendido",
+    "Ingrediente",
+    "Unidad",
+]
+
+# Opcional: cuánto rinde el lote de una sub-receta (ver ``core.recetas``)
+COLUMNA_RENDIMIENTO = "Rendimiento"
+
+
+def normalizar_catalogo(df: pd.DataFrame | None) -> tuple[pd.DataFrame, list]:
+    """Catálogo con las columnas esperadas (``Nombre`` e ``Item``) y sus avisos."""
+    avisos = []
+    if df is None:
+        df = pd.DataFrame(columns=COLUMNAS_CATALOGO)
+    elif "Item" not in df.columns and "Nombre" in df.columns:
+        df = df.rename(columns={"Nombre": "Item"})
+
+    missing = [c for c in COLUMNAS_CATALOGO if c not in df.columns]
+    if missing:
+        avisos.append(("error", f"Catálogo incompleto. Faltan columnas: {', '.join(missing)}"))
+        df = df.reindex(columns=COLUMNAS_CATALOGO)
+    if "Nombre" not in df.columns and "Item" in df.columns:
+        df["Nombre"] = df["Item"]
+
+    # Validaciones específicas por tipo de venta
+    if not df.empty:
+        bot_missing = df[(df["Tipo_venta"] == "BOT") & df["Volumen_ml_por_unidad"].isna()]
+        trg_missing = df[(df["Tipo_venta"] == "TRG") & df["Dosis_ml"].isna()]
+        if not bot_missing.empty:
+            avisos.append((
+                "warning",
+                "Hay productos de tipo BOT sin 'Volumen_ml_por_unidad'. Verifica el catálogo.",
+            ))
+        if not trg_missing.empty:
+            avisos.append(("warning", "Hay productos de tipo TRG sin 'Dosis_ml'. Verifica el catálogo."))
+    return df, avisos
+
+
+def ruta_catalogo() -> str | None:
+    """Archivo de catálogo más reciente (o cualquier Excel de la carpeta)."""
+    path = latest_file(CATALOGO_DIR, "catalogo")
+    if not path:
+        candidates = glob(os.path.join(CATALOGO_DIR, "*.xlsx"))
+        path = candidates[0] if candidates else None
+    return path if path and os.path.exists(path) else None
+
+
+def leer_catalogo(path: str | None = None) -> tuple[pd.DataFrame, list]:
+    """Lee (con caché) y valida el catálogo; por defecto el más reciente."""
+    path = path or ruta_catalogo()
+    return normalizar_catalogo(cache.leer_excel(path) if path else None)
+
+
+def normalizar_recetas(
+    df: pd.DataFrame | None, catalogo: pd.DataFrame | None = None
+) -> tuple[pd.DataFrame, list]:
+    """Recetas con la cantidad usada tomada de la dosis del catálogo, y sus avisos.
+
+    Los ingredientes que tienen receta propia son sub-recetas; los ciclos y
+    rendimientos inválidos se informan al compilarlas (``core.recetas``).
+    """
+    avisos = []
+    if df is None:
+        df = pd.DataFrame(columns=COLUMNAS_RECETAS)
+    missing = [c for c in COLUMNAS_RECETAS if c not in df.columns]
+    if missing:
+        avisos.append(("error", f"Recetas incompletas. Faltan columnas: {', '.join(missing)}"))
+    columnas = ["Producto_vendido", "Ingrediente", "Cantidad_usada", "Unidad"]
+    if COLUMNA_RENDIMIENTO in df.columns:
+        columnas.append(COLUMNA_RENDIMIENTO)
+        df = df.reindex(columns=COLUMNAS_RECETAS + [COLUMNA_RENDIMIENTO])
+    else:
+        df = df.reindex(columns=COLUMNAS_RECETAS)
+
+    if catalogo is not None and not df.empty:
+        ctl_products = set(
+            catalogo[catalogo["Tipo_venta"] == "CTL"]["Item"].dropna()
+        )
+        sub_recetas = set(df["Producto_vendido"].dropna()) & set(df["Ingrediente"].dropna())
+        for prod in df["Producto_vendido"].dropna().unique():
+            if prod not in ctl_products and prod not in sub_recetas:
+                avisos.append((
+                    "warning", f"'{prod}' en recetas no está definido como CTL en el catálogo."
+                ))
+
+        catalog_items = set(catalogo["Item"].dropna())
+        for ing in df["Ingrediente"].dropna().unique():
+            if ing not in catalog_items:
+                avisos.append(("warning", f"Ingrediente '{ing}' no existe en el catálogo."))
+
+        df["Cantidad_usada"] = df["Ingrediente"].map(CatalogIndex(catalogo).dosis)
+    else:
+        df["Cantidad_usada"] = None
+
+    df = df[columnas]
+    return df, avisos + compilar(df).avisos
+
+
+def leer_recetas(
+    catalogo: pd.DataFrame | None = None, path: str | None = None
+) -> tuple[pd.DataFrame, list]:
+    """Lee (con caché) y valida las recetas; por defecto las más recientes."""
+    path = path or latest_file(RECETAS_DIR, "recetas")
+    if not path or not os.path.exists(path):
+        return normalizar_recetas(None, catalogo)
+    try:
+        df = cache.leer_excel(path)
+    except Exception as e:
+        df, avisos = normalizar_recetas(None, catalogo)
+        return df, [("error", f"Error cargando recetas.xlsx: {e}")] + avisos
+    return normalizar_recetas(df, catalogo)
@@ -0,0 +1,118 @@
+"""Índice de productos del catálogo por clave normalizada de Nombre + Subcategoría.
+
+El POS no siempre escribe los nombres igual que el catálogo ("Ron  Añejo" y
+"ron anejo"). La clave normalizada quita tildes, pasa a minúsculas
+(``casefold``) y colapsa los espacios. Cada línea se busca en diccionarios,
+primero por el texto exacto, luego por la clave normalizada y al final en
+los alias aprendidos de resoluciones manuales (tabla ``alias_pos`` del
+almacén). Sólo se normalizan los pares distintos de cada archivo, no cada
+línea.
+"""
+import difflib
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from utils import cache
+from utils.alias_pos import COLUMNAS as COLUMNAS_ALIAS
+
+SEPARADOR_ETIQUETA = " · "
+
+
+def normalizar(texto) -> str:
+    """Texto sin tildes, en minúsculas y con los espacios colapsados."""
+    texto = unicodedata.normalize("NFKD", str(texto))
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(texto.casefold().split())
+
+
+def etiqueta(nombre, subcategoria) -> str:
+    """Texto con el que se elige un producto del catálogo en la interfaz."""
+    return f"{nombre}{SEPARADOR_ETIQUETA}{subcategoria}"
+
+
+def como_alias(resoluciones: pd.DataFrame) -> pd.DataFrame:
+    """Alias de los productos del POS (``Producto``, ``Subcategoría``) hacia
+    el producto del catálogo elegido (``Nombre``, ``Subcategoría_catálogo``).
+    """
+    return pd.DataFrame({
+        "Clave_nombre": resoluciones["Producto"].map(normalizar),
+        "Clave_subcategoria": resoluciones["Subcategoría"].map(normalizar),
+        "Nombre": resoluciones["Nombre"],
+        "Subcategoría": resoluciones["Subcategoría_catálogo"],
+    }, columns=COLUMNAS_ALIAS)
+
+
+class IndiceProductos:
+    """Búsqueda O(1) de filas del catálogo por Nombre + Subcategoría.
+
+    ``catalogo`` son las filas del catálogo sin pares repetidos (gana la
+    primera, como al unir por Nombre y Subcategoría). ``alias`` es un
+    DataFrame con :data:`COLUMNAS_ALIAS`; los que apuntan a un producto que
+    ya no está en el catálogo se ignoran.
+    """
+
+    def __init__(self, catalogo: pd.DataFrame, alias: pd.DataFrame | None = None):
+        self.catalogo = catalogo.drop_duplicates(subset=["Nombre", "Subcategoría"]).reset_index(drop=True)
+        nombres = self.catalogo["Nombre"].astype(str).str.strip()
+        subcategorias = self.catalogo["Subcategoría"].astype(str).str.strip()
+        self.exacto, self.normalizado = {}, {}
+        for i, par in enumerate(zip(nombres, subcategorias)):
+            self.exacto.setdefault(par, i)
+            self.normalizado.setdefault((normalizar(par[0]), normalizar(par[1])), i)
+        self.alias = {}
+        if alias is not None and not alias.empty:
+            for clave_n, clave_s, nombre, subcat in alias[COLUMNAS_ALIAS].itertuples(index=False):
+                destino = self.exacto.get((str(nombre).strip(), str(subcat).strip()))
+                if destino is not None:
+                    self.alias.setdefault((clave_n, clave_s), destino)
+        self._textos = {f"{n} {s}": i for (n, s), i in self.normalizado.items()}
+
+    @classmethod
+    def de(cls, catalogo, alias=None) -> "IndiceProductos":
+        """Acepta un índice ya construido o el catálogo (con caché por contenido)."""
+        if isinstance(catalogo, cls):
+            return catalogo
+        clave = (
+            "indice_productos",
+            cache.hash_dataframe(catalogo),
+            None if alias is None else cache.hash_dataframe(alias),
+        )
+        return cache.obtener(clave, (), lambda: cls(catalogo, alias))
+
+    def buscar(self, nombre, subcategoria) -> int:
+        """Posición en :attr:`catalogo` del producto, o -1 si no se encuentra."""
+        exacta = self.exacto.get((nombre, subcategoria))
+        if exacta is not None:
+            return exacta
+        clave = (normalizar(nombre), normalizar(subcategoria))
+        return self.normalizado.get(clave, self.alias.get(clave, -1))
+
+    def resolver(self, nombres: pd.Series, subcategorias: pd.Series) -> np.ndarray:
+        """Posiciones en :attr:`catalogo` de cada línea (-1 si no se encuentra)."""
+        # Un código por par distinto (dos factorize son mucho más baratos
+        # que factorizar un MultiIndex)
+        cod_n, nombres_u = pd.factorize(nombres, use_na_sentinel=False)
+        cod_s, subcats_u = pd.factorize(subcategorias, use_na_sentinel=False)
+        ancho = max(len(subcats_u), 1)
+        codigos, pares = pd.factorize(cod_n.astype(np.int64) * ancho + cod_s)
+        posiciones = np.fromiter(
+            (self.buscar(nombres_u[p // ancho], subcats_u[p % ancho]) for p in pares),
+            dtype=np.intp, count=len(pares),
+        )
+        return posiciones[codigos]
+
+    def etiquetas(self) -> list[str]:
+        """Etiquetas de todos los productos del catálogo, en su orden."""
+        return [etiqueta(n, s) for n, s in zip(self.catalogo["Nombre"], self.catalogo["Subcategoría"])]
+
+    def sugerir(self, nombre, subcategoria, corte=0.75) -> str | None:
+        """Etiqueta del producto del catálogo más parecido, si lo hay."""
+        parecidos = difflib.get_close_matches(
+            f"{normalizar(nombre)} {normalizar(subcategoria)}", list(self._textos), n=1, cutoff=corte
+        )
+        if not parecidos:
+            return None
+        fila = self.catalogo.iloc[self._textos[parecidos[0]]]
+        return etiqueta(fila["Nombre"], fila["Subcategoría"])
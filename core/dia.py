@@ -0,0 +1,143 @@
+"""Procesamiento de un día completo a partir de sus archivos crudos.
+
+Se hace en dos pasos para poder repartir los días entre procesos:
+
+- :func:`leer_dia` lee el POS y los conteos de apertura y cierre de una
+  fecha, los valida y los pasa a ml. No depende de otros días.
+- :func:`conciliar_dia` cruza lo leído con los movimientos del día y con el
+  cierre del día anterior; es barato y se hace en orden de fecha.
+
+Los problemas se devuelven en ``errores`` (el día no puede registrarse) y
+``avisos`` (se registra con supuestos), como texto.
+"""
+from datetime import datetime
+
+import pandas as pd
+
+from core.auditorias import (
+    COLUMNAS_REQUISICION,
+    comparar_apertura,
+    conciliar_cierre,
+    conteo_a_ml,
+    preparar_conteo,
+    requisiciones,
+    sumar_requisiciones,
+    unir_apertura,
+)
+from core.pos import leer_bloques, primeras_filas
+from core.ventas import como_movimientos, detectar_columnas_pos, procesar_ventas_por_bloques
+
+
+def _leer_conteo(ruta, columna, ubicacion, catalogo, errores):
+    try:
+        df = pd.read_excel(ruta)
+    except Exception as e:
+        errores.append(f"{ruta}: {type(e).__name__}: {e}")
+        return None
+    df, faltantes = preparar_conteo(df, columna, ubicacion)
+    if faltantes:
+        errores.append(f"{ruta}: faltan columnas requeridas: {', '.join(faltantes)}")
+        return None
+    return conteo_a_ml(df, catalogo, [columna, "Requisicion"])
+
+
+def leer_dia(
+    fecha: str,
+    catalogo: pd.DataFrame,
+    recetas: pd.DataFrame,
+    pos: str | None = None,
+    apertura: str | None = None,
+    cierre: str | None = None,
+    ubicacion_ventas: str = "Barra",
+    ubicacion_conteo: str = "General",
+    alias: pd.DataFrame | None = None,
+) -> dict:
+    """Lee los archivos de ``fecha`` (rutas o ``None``) y calcula el consumo.
+
+    ``alias`` son los alias de productos del POS guardados en el almacén.
+
+    Devuelve un dict con ``fecha``, ``ventas`` (consumo con las columnas de
+    las ventas procesadas), ``omitidos``, ``apertura`` y ``cierre`` (conteos
+    en ml), ``errores`` y ``avisos``; lo que no tenga archivo queda en
+    ``None``.
+    """
+    dia = {
+        "fecha": fecha, "ventas": None, "omitidos": None,
+        "apertura": None, "cierre": None, "errores": [], "avisos": [],
+    }
+    if pos:
+        try:
+            prod_col, subcat_col, cant_col = detectar_columnas_pos(primeras_filas(pos, 1).columns)
+            if prod_col is None or subcat_col is None:
+                dia["errores"].append(
+                    f"{pos}: no se reconocen las columnas de producto y subcategoría"
+                )
+            else:
+                consumo, dia["omitidos"], _, _ = procesar_ventas_por_bloques(
+                    leer_bloques(pos), prod_col, subcat_col, cant_col, catalogo, recetas,
+                    datetime.strptime(fecha, "%Y-%m-%d"), muestra=0, alias=alias,
+                )
+                dia["ventas"] = como_movimientos(consumo, ubicacion_ventas)
+                if not dia["omitidos"].empty:
+                    dia["avisos"].append(
+                        f"{int(dia['omitidos']['Líneas'].sum())} líneas de venta omitidas "
+                        f"({len(dia['omitidos'])} productos)"
+                    )
+        except Exception as e:
+            dia["errores"].append(f"{pos}: {type(e).__name__}: {e}")
+    if apertura:
+        dia["apertura"] = _leer_conteo(
+            apertura, "Conteo Apertura", ubicacion_conteo, catalogo, dia["errores"]
+        )
+    if cierre:
+        df = _leer_conteo(cierre, "Conteo Cierre", ubicacion_conteo, catalogo, dia["errores"])
+        if df is not None:
+            dia["cierre"] = df.rename(columns={"Conteo Cierre": "Físico Cierre"})
+    return dia
+
+
+def conciliar_dia(
+    dia: dict,
+    cierre_anterior: pd.DataFrame | None,
+    apertura_registrada: pd.DataFrame | None,
+    entradas: pd.DataFrame,
+    transferencias: pd.DataFrame,
+    ventas_registradas: pd.DataFrame,
+) -> dict:
+    """Completa ``dia`` con las requisiciones y las auditorías de apertura y cierre.
+
+    ``cierre_anterior`` es el cierre confirmado de la víspera y
+    ``apertura_registrada`` la auditoría de apertura ya guardada para la
+    fecha (se usa si el día no trae conteo de apertura). ``entradas``,
+    ``transferencias`` y ``ventas_registradas`` son los movimientos del día
+    ya registrados; las ventas leídas del POS reemplazan a estas últimas.
+    Agrega ``requisiciones``, ``auditoria_apertura`` y ``auditoria_cierre``.
+    """
+    fecha = dia["fecha"]
+    partes = [requisiciones(df, fecha) for df in (dia["apertura"], dia["cierre"]) if df is not None]
+    dia["requisiciones"] = (
+        pd.concat(partes, ignore_index=True) if partes
+        else pd.DataFrame(columns=COLUMNAS_REQUISICION)
+    )
+    dia["auditoria_apertura"] = None
+    dia["auditoria_cierre"] = None
+
+    if dia["apertura"] is not None:
+        if cierre_anterior is None:
+            dia["avisos"].append("No se encontró auditoría de cierre del día anterior.")
+            cierre_anterior = pd.DataFrame(columns=["Item", "Ubicación", "Físico Cierre"])
+        dia["auditoria_apertura"] = comparar_apertura(dia["apertura"], cierre_anterior)
+        apertura_registrada = dia["auditoria_apertura"]
+
+    if dia["cierre"] is not None:
+        if apertura_registrada is None:
+            dia["avisos"].append(
+                "No se encontró auditoría de apertura para la fecha; se asume Conteo Apertura = 0."
+            )
+            apertura_registrada = pd.DataFrame(columns=["Item", "Ubicación", "Conteo Apertura"])
+        df = unir_apertura(dia["cierre"], apertura_registrada)
+        ventas = dia["ventas"] if dia["ventas"] is not None else ventas_registradas
+        dia["auditoria_cierre"] = conciliar_cierre(
+            df, entradas, sumar_requisiciones(transferencias, dia["requisiciones"]), ventas
+        )
+    return dia
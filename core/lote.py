@@ -0,0 +1,219 @@
+"""Lotes de exportaciones del POS de varios días (archivos sueltos o zip).
+
+Para ponerse al día después de un fin de semana largo o de una caída del
+sistema se suben muchos archivos juntos. Cada uno se asocia a una fecha por
+su nombre (``2024-01-31``, ``2024_01_31``, ``20240131`` o ``31-01-2024``) o,
+si el nombre no la trae, por la fecha más frecuente de una columna ``Fecha``
+del contenido. Los archivos de una misma fecha (p. ej. varias terminales) se
+suman en un solo día.
+"""
+import os
+import re
+import zipfile
+from datetime import datetime
+
+import pandas as pd
+
+from core.dia import leer_dia
+from core.pos import primeras_filas
+from core.ventas import COLUMNAS_OMITIDOS, detectar_columna
+from utils import paralelo, perf
+
+EXTENSIONES = (".xlsx", ".csv")
+FECHA_NAMES = ["fecha", "fecha venta", "fecha de venta", "date", "dia", "día"]
+FILAS_FECHA = 50  # líneas del contenido que se miran para deducir la fecha
+
+PATRONES_FECHA = [
+    (re.compile(r"(?<!\d)(\d{4})[-_.](\d{2})[-_.](\d{2})(?!\d)"), ("a", "m", "d")),
+    (re.compile(r"(?<!\d)(\d{2})[-_.](\d{2})[-_.](\d{4})(?!\d)"), ("d", "m", "a")),
+    (re.compile(r"(?<!\d)(\d{4})(\d{2})(\d{2})(?!\d)"), ("a", "m", "d")),
+]
+
+# Columnas de las ventas procesadas que identifican un consumo
+CLAVES_CONSUMO = ["Fecha", "Producto vendido", "Item usado", "Unidad", "Ubicación de salida"]
+
+
+def fecha_de_nombre(nombre: str) -> str | None:
+    """Fecha ``YYYY-MM-DD`` escrita en el nombre del archivo, si la hay."""
+    base = os.path.basename(nombre)
+    for patron, orden in PATRONES_FECHA:
+        for coincidencia in patron.finditer(base):
+            partes = dict(zip(orden, coincidencia.groups()))
+            try:
+                return datetime(int(partes["a"]), int(partes["m"]), int(partes["d"])).strftime("%Y-%m-%d")
+            except ValueError:
+                continue
+    return None
+
+
+def fecha_de_contenido(ruta: str) -> str | None:
+    """Fecha más frecuente de la columna de fecha de las primeras líneas."""
+    df = primeras_filas(ruta, FILAS_FECHA)
+    columna = detectar_columna(df.columns, FECHA_NAMES)
+    if columna is None:
+        return None
+    fechas = pd.to_datetime(df[columna], errors="coerce", dayfirst=True).dropna()
+    if fechas.empty:
+        return None
+    return fechas.dt.strftime("%Y-%m-%d").mode().iloc[0]
+
+
+def inferir_fecha(ruta: str) -> str | None:
+    """Fecha del archivo: la del nombre o, si no la tiene, la del contenido."""
+    return fecha_de_nombre(ruta) or fecha_de_contenido(ruta)
+
+
+def _es_exportacion(nombre: str) -> bool:
+    base = os.path.basename(nombre)
+    return (
+        base.lower().endswith(EXTENSIONES)
+        and not base.startswith((".", "~$"))
+        and "__MACOSX" not in nombre
+    )
+
+
+def expandir(rutas: list[str], destino: str) -> list[str]:
+    """Rutas de las exportaciones de ``rutas``, con los zip extraídos en ``destino``."""
+    archivos = []
+    for i, ruta in enumerate(rutas):
+        # Por extensión: un .xlsx también es un zip por dentro
+        if not ruta.lower().endswith(".zip"):
+            if _es_exportacion(ruta):
+                archivos.append(ruta)
+            continue
+        with zipfile.ZipFile(ruta) as zf:
+            carpeta = os.path.join(destino, f"{i}_{os.path.splitext(os.path.basename(ruta))[0]}")
+            for miembro in zf.infolist():
+                if miembro.is_dir() or not _es_exportacion(miembro.filename):
+                    continue
+                # La ruta interna se aplana (las carpetas pueden llevar la
+                # fecha) y así el zip no puede escribir fuera de ``carpeta``
+                plano = miembro.filename.replace("\\", "/").strip("/").replace("/", "_")
+                salida = os.path.join(carpeta, plano)
+                os.makedirs(carpeta, exist_ok=True)
+                with zf.open(miembro) as origen, open(salida, "wb") as copia:
+                    copia.write(origen.read())
+                archivos.append(salida)
+    return archivos
+
+
+def agrupar_por_fecha(rutas: list[str]) -> tuple[dict, list]:
+    """Archivos por fecha inferida y los que no tienen fecha o no se leen.
+
+    Devuelve ``(por_fecha, errores)``: ``por_fecha`` va ordenado por fecha y
+    ``errores`` es una lista de mensajes.
+    """
+    por_fecha, errores = {}, []
+    for ruta in rutas:
+        try:
+            fecha = inferir_fecha(ruta)
+        except Exception as e:
+            errores.append(f"{os.path.basename(ruta)}: {type(e).__name__}: {e}")
+            continue
+        if fecha is None:
+            errores.append(f"{os.path.basename(ruta)}: no se encontró la fecha en el nombre ni en el contenido")
+            continue
+        por_fecha.setdefault(fecha, []).append(ruta)
+    return dict(sorted(por_fecha.items())), errores
+
+
+def procesar(
+    por_fecha: dict,
+    catalogo: pd.DataFrame,
+    recetas: pd.DataFrame,
+    ubicacion: str = "Barra",
+    alias: pd.DataFrame | None = None,
+    trabajadores: int | None = None,
+    conteos: dict | None = None,
+    ubicacion_conteo: str = "General",
+) -> list[dict]:
+    """Lee y calcula el consumo de todos los archivos del lote en paralelo.
+
+    Cada archivo es una tarea de ``core.dia.leer_dia``; después se unen por
+    fecha. ``conteos`` asocia fechas a ``(apertura, cierre)`` (rutas o
+    ``None``) que se leen como una tarea más de su día. Devuelve un dict por
+    fecha, en orden, con ``archivos`` (exportaciones del POS) además de las
+    claves de ``leer_dia``.
+    """
+    conteos = conteos or {}
+    tareas = [(fecha, ruta, None, None) for fecha, rutas in por_fecha.items() for ruta in rutas]
+    tareas += [(fecha, None, ap, ci) for fecha, (ap, ci) in conteos.items()]
+    n = len(tareas)
+    with perf.medir("ventas.lote", archivos=n, dias=len(por_fecha)):
+        leidos = paralelo.mapear(
+            leer_dia, [t[0] for t in tareas], [catalogo] * n, [recetas] * n,
+            [t[1] for t in tareas], [t[2] for t in tareas], [t[3] for t in tareas],
+            [ubicacion] * n, [ubicacion_conteo] * n, [alias] * n,
+            trabajadores=trabajadores,
+        )
+    dias = []
+    for fecha in sorted(set(por_fecha) | set(conteos)):
+        dia = unir_dias([d for t, d in zip(tareas, leidos) if t[0] == fecha])
+        dia["archivos"] = len(por_fecha.get(fecha, []))
+        dias.append(dia)
+    return dias
+
+
+def unir_dias(dias: list[dict]) -> dict:
+    """Suma en un solo día los resultados de ``leer_dia`` de la misma fecha.
+
+    Las ventas y las líneas omitidas se suman; los conteos de apertura y
+    cierre se toman del resultado que los trae.
+    """
+    ventas = [d["ventas"] for d in dias if d["ventas"] is not None]
+    omitidos = [d["omitidos"] for d in dias if d["omitidos"] is not None and not d["omitidos"].empty]
+    dia = dict(dias[0])
+    dia["errores"] = [e for d in dias for e in d["errores"]]
+    dia["avisos"] = [a for d in dias for a in d["avisos"]]
+    for clave in ("apertura", "cierre"):
+        dia[clave] = next((d[clave] for d in dias if d[clave] is not None), None)
+    dia["ventas"] = (
+        pd.concat(ventas, ignore_index=True)
+        .groupby(CLAVES_CONSUMO, sort=False, dropna=False)["Cantidad teórica consumida"]
+        .sum().reset_index()
+        if ventas else None
+    )
+    dia["omitidos"] = (
+        pd.concat(omitidos, ignore_index=True)
+        .groupby(["Producto", "Subcategoría", "Motivo"], sort=False, dropna=False)[["Líneas", "Cantidad"]]
+        .sum().reset_index()[COLUMNAS_OMITIDOS]
+        if omitidos else pd.DataFrame(columns=COLUMNAS_OMITIDOS)
+    )
+    return dia
+
+
+def resumen(dias: list[dict]) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Resúmenes combinados de un lote ya unido por fecha.
+
+    Devuelve ``(por_dia, consumo, omitidos)``: una fila por fecha, el
+    consumo total por ítem y unidad, y los productos omitidos con sus líneas
+    y la cantidad de días en que aparecen.
+    """
+    por_dia = pd.DataFrame([
+        {
+            "Fecha": d["fecha"],
+            "Archivos": d.get("archivos", 1),
+            "Consumos": 0 if d["ventas"] is None else len(d["ventas"]),
+            "Líneas omitidas": int(d["omitidos"]["Líneas"].sum()) if d["omitidos"] is not None else 0,
+            "Errores": len(d["errores"]),
+        }
+        for d in dias
+    ])
+    ventas = [d["ventas"] for d in dias if d["ventas"] is not None]
+    consumo = (
+        pd.concat(ventas, ignore_index=True)
+        .groupby(["Item usado", "Unidad"], sort=False, dropna=False)["Cantidad teórica consumida"]
+        .sum().reset_index()
+        if ventas else pd.DataFrame(columns=["Item usado", "Unidad", "Cantidad teórica consumida"])
+    )
+    omitidos = [
+        d["omitidos"].assign(Días=1) for d in dias
+        if d["omitidos"] is not None and not d["omitidos"].empty
+    ]
+    omitidos = (
+        pd.concat(omitidos, ignore_index=True)
+        .groupby(["Producto", "Subcategoría", "Motivo"], sort=False, dropna=False)[["Líneas", "Cantidad", "Días"]]
+        .sum().reset_index()
+        if omitidos else pd.DataFrame(columns=COLUMNAS_OMITIDOS + ["Días"])
+    )
+    return por_dia, consumo, omitidos
@@ -0,0 +1,190 @@
+"""Diferencias y mermas a lo largo del historial de auditorías.
+
+Cada auditoría guarda, por (Item, Ubicación), lo esperado, lo contado y la
+``Diferencia`` (contado - esperado, en ml): negativa es producto que falta.
+La de apertura cubre la noche (cierre anterior → apertura) y la de cierre el
+día (apertura → cierre), así que sumadas dan todo lo que falta de un par sin
+que lo expliquen los movimientos.
+
+:class:`HistorialMermas` arma una vez por contenido una matriz días × pares
+con las diferencias de cada tipo de auditoría y, para cada selección de
+tipos, las sumas acumuladas por día (de la diferencia, su cuadrado, lo
+esperado y la cantidad de conteos). Los totales, medias y desvíos de
+cualquier ventana de fechas salen de restar dos filas de esas sumas, para
+todos los pares a la vez y sin volver a recorrer el historial.
+"""
+import numpy as np
+import pandas as pd
+
+from utils import cache
+from utils.unit_conversion import CatalogIndex
+
+TIPOS = ["Apertura", "Cierre"]
+COLUMNAS_DIFERENCIAS = ["Fecha", "Tipo", "Item", "Ubicación", "Esperado", "Contado", "Diferencia"]
+VENTANA_MOVIL = 7  # días auditados
+COLUMNAS_VENTANA = [
+    "Item", "Ubicación", "Conteos", "Diferencia total", "Media", "Desvío",
+    "Esperado total", "% del esperado",
+]
+
+
+class HistorialMermas:
+    """Diferencias de auditoría por día y par, con sumas acumuladas.
+
+    ``diferencias`` tiene :data:`COLUMNAS_DIFERENCIAS` (como
+    ``utils.diferencias.leer``). ``dias`` son los días con alguna
+    auditoría, en orden, y ``pares`` el ``MultiIndex`` (Item, Ubicación) de
+    las columnas. En las matrices, un par sin conteo ese día queda en NaN.
+    """
+
+    def __init__(self, diferencias: pd.DataFrame):
+        df = diferencias.dropna(subset=["Fecha", "Item", "Ubicación"])
+        fechas = pd.to_datetime(df["Fecha"])
+        fila, dias = pd.factorize(fechas, sort=True)
+        cod_i, items = pd.factorize(df["Item"].astype(object), sort=True)
+        cod_u, ubicaciones = pd.factorize(df["Ubicación"].astype(object), sort=True)
+        ancho = max(len(ubicaciones), 1)
+        columna, pares = pd.factorize(cod_i.astype(np.int64) * ancho + cod_u, sort=True)
+        self.dias = pd.DatetimeIndex(dias, name="Fecha")
+        self.pares = pd.MultiIndex.from_arrays(
+            [
+                np.asarray(items, dtype=object)[pares // ancho],
+                np.asarray(ubicaciones, dtype=object)[pares % ancho],
+            ],
+            names=["Item", "Ubicación"],
+        )
+        forma = (len(self.dias), len(self.pares))
+        diferencia = pd.to_numeric(df["Diferencia"], errors="coerce").to_numpy(dtype=float)
+        esperado = pd.to_numeric(df["Esperado"], errors="coerce").to_numpy(dtype=float)
+        tipos = df["Tipo"].astype(object).to_numpy()
+        self._diferencia, self._esperado, self._contado = {}, {}, {}
+        for tipo in TIPOS:
+            de_tipo = tipos == tipo
+            posicion = (fila[de_tipo], columna[de_tipo])
+            # Un par repetido en la misma auditoría se suma, como en el almacén
+            suma, esp, conteos = np.zeros(forma), np.zeros(forma), np.zeros(forma)
+            np.add.at(suma, posicion, np.nan_to_num(diferencia[de_tipo]))
+            np.add.at(esp, posicion, np.nan_to_num(esperado[de_tipo]))
+            np.add.at(conteos, posicion, 1.0)
+            self._contado[tipo] = conteos > 0
+            self._diferencia[tipo] = np.where(self._contado[tipo], suma, np.nan)
+            self._esperado[tipo] = np.where(self._contado[tipo], esp, np.nan)
+        self._prefijos = {}
+
+    @classmethod
+    def de(cls, diferencias) -> "HistorialMermas":
+        """Acepta un historial ya armado o las diferencias (con caché por contenido)."""
+        if isinstance(diferencias, cls):
+            return diferencias
+        clave = ("historial_mermas", cache.hash_dataframe(diferencias))
+        return cache.obtener(clave, (), lambda: cls(diferencias))
+
+    @staticmethod
+    def _seleccion(tipo):
+        return tuple(TIPOS) if tipo is None else (tipo,)
+
+    def _valores(self, tipo):
+        """Diferencia y esperado por día y par de ``tipo`` (None: ambos sumados)."""
+        seleccion = self._seleccion(tipo)
+        contado = np.logical_or.reduce([self._contado[t] for t in seleccion])
+        diferencia = np.nansum([self._diferencia[t] for t in seleccion], axis=0)
+        esperado = np.nansum([self._esperado[t] for t in seleccion], axis=0)
+        return np.where(contado, diferencia, np.nan), np.where(contado, esperado, np.nan), contado
+
+    def _acumulados(self, tipo):
+        """Sumas acumuladas por día (con una fila de ceros al principio)."""
+        seleccion = self._seleccion(tipo)
+        if seleccion not in self._prefijos:
+            diferencia, esperado, contado = self._valores(tipo)
+            ceros = np.zeros((1, len(self.pares)))
+            self._prefijos[seleccion] = tuple(
+                np.vstack([ceros, np.cumsum(np.nan_to_num(m), axis=0)])
+                for m in (diferencia, diferencia ** 2, esperado, contado.astype(float))
+            )
+        return self._prefijos[seleccion]
+
+    def _limites(self, desde, hasta):
+        """Filas ``[inicio, fin)`` de los días entre ``desde`` y ``hasta`` inclusive."""
+        inicio = 0 if desde is None else int(self.dias.searchsorted(pd.Timestamp(desde), side="left"))
+        fin = len(self.dias) if hasta is None else int(self.dias.searchsorted(pd.Timestamp(hasta), side="right"))
+        return inicio, max(inicio, fin)
+
+    def matriz(self, tipo: str | None = None) -> pd.DataFrame:
+        """Diferencia (ml) por día y par; ``tipo`` None suma apertura y cierre."""
+        diferencia, _, _ = self._valores(tipo)
+        return pd.DataFrame(diferencia, index=self.dias, columns=self.pares)
+
+    def acumulada(self, desde=None, hasta=None, tipo: str | None = None) -> pd.DataFrame:
+        """Merma acumulada (ml) de cada par desde el inicio de la ventana."""
+        inicio, fin = self._limites(desde, hasta)
+        suma = self._acumulados(tipo)[0]
+        return pd.DataFrame(
+            suma[inicio + 1:fin + 1] - suma[inicio], index=self.dias[inicio:fin], columns=self.pares
+        )
+
+    def movil(
+        self, ventana: int = VENTANA_MOVIL, tipo: str | None = None
+    ) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """Media y desvío de la diferencia de cada par en los últimos ``ventana`` días.
+
+        Los días son los auditados; dentro de la ventana sólo cuentan aquellos
+        en que el par se contó. El desvío necesita al menos dos conteos.
+        """
+        suma, cuadrados, _, conteos = self._acumulados(tipo)
+        fin = np.arange(1, len(self.dias) + 1)
+        inicio = np.clip(fin - int(ventana), 0, None)
+        media, desvio = _estadisticas(
+            suma[fin] - suma[inicio], cuadrados[fin] - cuadrados[inicio], conteos[fin] - conteos[inicio]
+        )
+        return (
+            pd.DataFrame(media, index=self.dias, columns=self.pares),
+            pd.DataFrame(desvio, index=self.dias, columns=self.pares),
+        )
+
+    def ventana(
+        self, desde=None, hasta=None, tipo: str | None = None, cat: pd.DataFrame | None = None
+    ) -> pd.DataFrame:
+        """Totales, media y desvío de la diferencia de cada par entre dos fechas.
+
+        Una fila por par contado en la ventana (:data:`COLUMNAS_VENTANA`).
+        Con ``cat`` se agrega la diferencia total en botellas.
+        """
+        inicio, fin = self._limites(desde, hasta)
+        suma, cuadrados, esperado, conteos = (m[fin] - m[inicio] for m in self._acumulados(tipo))
+        media, desvio = _estadisticas(suma, cuadrados, conteos)
+        porcentaje = np.divide(
+            100 * suma, esperado, out=np.full(len(suma), np.nan), where=np.abs(esperado) > 0
+        )
+        tabla = pd.DataFrame({
+            "Item": self.pares.get_level_values("Item"),
+            "Ubicación": self.pares.get_level_values("Ubicación"),
+            "Conteos": conteos.astype(int),
+            "Diferencia total": suma,
+            "Media": media,
+            "Desvío": desvio,
+            "Esperado total": esperado,
+            "% del esperado": porcentaje,
+        }, columns=COLUMNAS_VENTANA)[conteos > 0].reset_index(drop=True)
+        if cat is not None:
+            capacidad = tabla["Item"].map(CatalogIndex.de(cat).capacidad).to_numpy(dtype=float)
+            tabla["Diferencia botellas"] = tabla["Diferencia total"].to_numpy() / capacidad
+        return tabla
+
+    def peores(
+        self, desde=None, hasta=None, n: int = 20, tipo: str | None = None,
+        cat: pd.DataFrame | None = None,
+    ) -> pd.DataFrame:
+        """Los ``n`` pares con más merma (diferencia total más negativa) en la ventana."""
+        tabla = self.ventana(desde, hasta, tipo, cat)
+        tabla = tabla[tabla["Diferencia total"] < 0]
+        return tabla.nsmallest(n, "Diferencia total").reset_index(drop=True)
+
+
+def _estadisticas(suma, cuadrados, conteos):
+    """Media y desvío muestral a partir de sumas, sumas de cuadrados y conteos."""
+    media = np.divide(suma, conteos, out=np.full(suma.shape, np.nan), where=conteos > 0)
+    varianza = np.divide(
+        cuadrados - suma * np.nan_to_num(media), conteos - 1,
+        out=np.full(suma.shape, np.nan), where=conteos > 1,
+    )
+    return media, np.sqrt(np.clip(varianza, 0, None))
@@ -0,0 +1,123 @@
+"""Lectura por bloques de las exportaciones del POS (Excel o CSV).
+
+Las exportaciones de fin de semana con varias terminales pueden tener cientos
+de miles de líneas; en lugar de cargar el libro completo se recorren las
+filas en bloques de ``BLOQUE_FILAS`` con openpyxl en modo ``read_only`` (o
+``pd.read_csv`` con ``chunksize``), de modo que la memoria depende del
+tamaño del bloque y no del archivo.
+
+En el Excel la primera fila viene vacía y los nombres de las columnas están
+en la segunda, como al leerlo con ``pd.read_excel(archivo, header=1)``.
+"""
+import csv
+import os
+from contextlib import closing
+
+import pandas as pd
+
+BLOQUE_FILAS = 20_000
+FILA_ENCABEZADO = 1  # filas que preceden al encabezado en el Excel del POS
+SEPARADORES = ",;\t|"
+
+
+def _nombre(archivo):
+    return str(archivo if isinstance(archivo, (str, os.PathLike)) else getattr(archivo, "name", ""))
+
+
+def es_csv(archivo) -> bool:
+    """Verdadero si ``archivo`` (ruta o archivo subido) es un CSV."""
+    return _nombre(archivo).lower().endswith(".csv")
+
+
+def _rebobinar(archivo):
+    if hasattr(archivo, "seek"):
+        archivo.seek(0)
+
+
+def _separador(archivo):
+    if isinstance(archivo, (str, os.PathLike)):
+        with open(archivo, "rb") as f:
+            muestra = f.read(64 * 1024)
+    else:
+        _rebobinar(archivo)
+        muestra = archivo.read(64 * 1024)
+        _rebobinar(archivo)
+    try:
+        return csv.Sniffer().sniff(muestra.decode("utf-8", errors="replace"), SEPARADORES).delimiter
+    except csv.Error:
+        return ","
+
+
+def _encabezado(fila):
+    """Nombres de columna como los pone pandas: vacíos y repetidos renombrados."""
+    nombres, vistos = [], {}
+    for i, valor in enumerate(fila):
+        nombre = f"Unnamed: {i}" if valor is None else str(valor)
+        if nombre in vistos:
+            vistos[nombre] += 1
+            nombre = f"{nombre}.{vistos[nombre]}"
+        else:
+            vistos[nombre] = 0
+        nombres.append(nombre)
+    return nombres
+
+
+def _bloques_excel(archivo, tamano):
+    from openpyxl import load_workbook
+
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        # min_row explícito: en read_only la hoja puede declarar que empieza
+        # después de la fila vacía y el encabezado quedaría corrido
+        filas = libro.active.iter_rows(min_row=1, values_only=True)
+        for _ in range(FILA_ENCABEZADO):
+            next(filas, None)
+        columnas = _encabezado(next(filas, ()))
+        ancho = len(columnas)
+        bloque, emitido = [], False
+        for fila in filas:
+            if all(v is None for v in fila):
+                continue
+            bloque.append(tuple(fila[:ancho]) + (None,) * (ancho - len(fila)))
+            if len(bloque) == tamano:
+                yield pd.DataFrame(bloque, columns=columnas)
+                bloque, emitido = [], True
+        if bloque or not emitido:
+            yield pd.DataFrame(bloque, columns=columnas)
+    finally:
+        libro.close()
+
+
+def _bloques_csv(archivo, tamano):
+    lector = pd.read_csv(
+        archivo, sep=_separador(archivo), chunksize=tamano,
+        encoding="utf-8-sig", encoding_errors="replace",
+    )
+    with lector:
+        for bloque in lector:
+            yield bloque.dropna(how="all")
+
+
+def leer_bloques(archivo, tamano=BLOQUE_FILAS):
+    """Genera DataFrames de hasta ``tamano`` líneas del POS, en orden.
+
+    ``archivo`` es una ruta o un archivo abierto (p. ej. el de
+    ``st.file_uploader``); se rebobina antes de empezar. Las filas
+    completamente vacías se omiten.
+    """
+    _rebobinar(archivo)
+    if es_csv(archivo):
+        return _bloques_csv(archivo, tamano)
+    return _bloques_excel(archivo, tamano)
+
+
+def primeras_filas(archivo, n=200) -> pd.DataFrame:
+    """Las primeras ``n`` líneas del POS (o sólo el encabezado si no hay datos)."""
+    if es_csv(archivo):
+        _rebobinar(archivo)
+        return pd.read_csv(
+            archivo, sep=_separador(archivo), nrows=n,
+            encoding="utf-8-sig", encoding_errors="replace",
+        )
+    with closing(leer_bloques(archivo, tamano=n)) as bloques:
+        return next(bloques)
@@ -0,0 +1,53 @@
+"""Días de cobertura y puntos de reorden a partir de las tasas de consumo.
+
+Las tasas (ml por día con ventas, por Item y Ubicación) vienen de
+``utils.consumo``. El punto de reorden es lo que se consume durante el
+plazo de reposición más un stock de seguridad::
+
+    reorden = EWMA * plazo + z * desvío_28 * sqrt(plazo)
+
+todo pasado a botellas con la capacidad del catálogo.
+"""
+import numpy as np
+import pandas as pd
+
+from utils.unit_conversion import CatalogIndex
+
+PLAZO_REPOSICION = 3  # días entre pedir y tener la botella en la ubicación
+Z_SERVICIO = 1.65  # ~95 % de los plazos sin quiebre de stock
+
+COLUMNAS_PRONOSTICO = ["Consumo diario", "Días de cobertura", "Punto de reorden"]
+
+
+def agregar_pronostico(
+    df_stock: pd.DataFrame,
+    tasas: pd.DataFrame,
+    cat: pd.DataFrame,
+    plazo: float = PLAZO_REPOSICION,
+    z: float = Z_SERVICIO,
+) -> pd.DataFrame:
+    """``df_stock`` con el consumo diario, los días de cobertura y el punto de
+    reorden, en botellas.
+
+    Los pares sin consumo en la ventana de las tasas quedan en NaN.
+    """
+    if tasas.empty:
+        return df_stock.assign(**{c: np.nan for c in COLUMNAS_PRONOSTICO})
+    por_par = tasas.set_index(["Item", "Ubicación"])
+    claves = pd.MultiIndex.from_arrays([df_stock["Producto"], df_stock["Ubicación"]])
+    ewma = por_par["EWMA"].reindex(claves).to_numpy(dtype=float)
+    desvio = np.nan_to_num(por_par["Desvio_28"].reindex(claves).to_numpy(dtype=float))
+    capacidad = df_stock["Producto"].map(CatalogIndex.de(cat).capacidad).to_numpy(dtype=float)
+
+    diario = ewma / capacidad
+    reorden = (ewma * plazo + z * desvio * np.sqrt(plazo)) / capacidad
+    con_consumo = diario > 0
+    stock = df_stock["Stock Botellas"].to_numpy(dtype=float)
+    cobertura = np.divide(
+        np.clip(stock, 0, None), diario, out=np.full(len(stock), np.nan), where=con_consumo
+    )
+    return df_stock.assign(**{
+        "Consumo diario": np.where(con_consumo, diario, np.nan).round(2),
+        "Días de cobertura": cobertura.round(1),
+        "Punto de reorden": np.where(con_consumo, reorden, np.nan).round(2),
+    })
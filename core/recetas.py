@@ -0,0 +1,198 @@
+"""Recetas compiladas como matriz dispersa producto × ingrediente.
+
+Una receta puede usar como ingrediente otra preparación de la casa (un
+jarabe, una mezcla en lote) que a su vez tiene receta: todo ingrediente que
+aparece también como ``Producto_vendido`` es una sub-receta. Al compilar,
+las sub-recetas se aplanan en orden topológico (primero las que no dependen
+de otras), así cada producto queda expresado sólo en ingredientes de
+inventario. Las recetas que forman un ciclo no se compilan.
+
+Una sub-receta describe un lote que rinde ``Rendimiento`` (columna opcional
+de las recetas, en la misma unidad que la dosis de la preparación; por
+defecto, la suma de las cantidades de sus ingredientes). Quien la usa
+consume ``Cantidad_usada / Rendimiento`` lotes.
+
+La matriz se guarda en formato COO (fila, columna, valor), ordenada por
+producto y con una entrada por camino. Si un ingrediente llega a un producto
+por dos vías, aparece dos veces, y :meth:`MatrizRecetas.trazar` dice de qué
+producto y de qué sub-receta proviene. El consumo de un día es el vector de
+ventas por producto multiplicado por la matriz.
+"""
+import numpy as np
+import pandas as pd
+
+from utils import cache
+
+SEPARADOR_VIA = " › "
+
+
+def _orden_topologico(dependencias: dict) -> tuple[list, list]:
+    """Productos en orden (dependencias primero) y los que quedan en ciclos.
+
+    Devuelve ``(orden, ciclo)``; ``ciclo`` es un camino cerrado de ejemplo
+    (vacío si no hay ciclos).
+    """
+    pendientes = {p: set(d) for p, d in dependencias.items()}
+    orden = []
+    listos = [p for p, d in pendientes.items() if not d]
+    usuarios = {}
+    for producto, deps in pendientes.items():
+        for dep in deps:
+            usuarios.setdefault(dep, []).append(producto)
+    while listos:
+        producto = listos.pop(0)
+        orden.append(producto)
+        for usuario in usuarios.get(producto, []):
+            pendientes[usuario].discard(producto)
+            if not pendientes[usuario]:
+                listos.append(usuario)
+    hechos = set(orden)
+    restantes = [p for p in dependencias if p not in hechos]
+    if not restantes:
+        return orden, []
+    # Cada producto que quedó depende de otro que también quedó: siguiendo
+    # esas dependencias se vuelve a pasar por uno ya visto
+    camino, visto = [], {}
+    actual = restantes[0]
+    while actual not in visto:
+        visto[actual] = len(camino)
+        camino.append(actual)
+        actual = next(d for d in dependencias[actual] if d not in hechos)
+    return orden, camino[visto[actual]:] + [actual]
+
+
+class MatrizRecetas:
+    """Recetas aplanadas en una matriz dispersa producto × ingrediente.
+
+    ``productos`` e ``ingredientes`` son las etiquetas de filas y columnas;
+    ``filas``, ``columnas`` y ``valores`` las entradas COO (cantidad por
+    unidad vendida), con ``unidades`` y ``vias`` (sub-recetas recorridas,
+    vacío si el ingrediente es directo) alineadas a ellas. ``circulares``
+    son los productos que no se compilaron por estar en un ciclo o depender
+    de uno; ``avisos`` es una lista de ``(nivel, mensaje)``.
+    """
+
+    def __init__(self, recetas: pd.DataFrame | None):
+        if recetas is None:
+            recetas = pd.DataFrame(columns=["Producto_vendido", "Ingrediente", "Cantidad_usada", "Unidad"])
+        tabla = recetas.dropna(subset=["Producto_vendido", "Ingrediente"])
+        cantidades = pd.to_numeric(tabla["Cantidad_usada"], errors="coerce")
+        grupos = {
+            producto: list(zip(grupo["Ingrediente"], grupo["Unidad"], cantidades[grupo.index]))
+            for producto, grupo in tabla.groupby("Producto_vendido", sort=False)
+        }
+        self.avisos = []
+
+        dependencias = {p: {i for i, _, _ in filas if i in grupos} for p, filas in grupos.items()}
+        orden, ciclo = _orden_topologico(dependencias)
+        compilables = set(orden)
+        self.circulares = frozenset(p for p in grupos if p not in compilables)
+        if ciclo:
+            self.avisos.append((
+                "error",
+                f"Recetas circulares: {' → '.join(map(str, ciclo))}. No se usarán "
+                f"{len(self.circulares)} recetas que forman el ciclo o dependen de él.",
+            ))
+
+        rendimientos = self._rendimientos(tabla, grupos, dependencias, compilables)
+        aplanadas = {}
+        for producto in orden:
+            entradas = []
+            for ingrediente, unidad, cantidad in grupos[producto]:
+                if ingrediente not in grupos:
+                    entradas.append((ingrediente, unidad, cantidad, ""))
+                    continue
+                factor = cantidad / rendimientos[ingrediente]
+                for sub_ing, sub_unidad, sub_cantidad, sub_via in aplanadas[ingrediente]:
+                    via = f"{ingrediente}{SEPARADOR_VIA}{sub_via}" if sub_via else str(ingrediente)
+                    entradas.append((sub_ing, sub_unidad, factor * sub_cantidad, via))
+            aplanadas[producto] = entradas
+
+        # Filas en el orden del archivo de recetas
+        self.productos = [p for p in grupos if p in aplanadas]
+        self.indice = {p: i for i, p in enumerate(self.productos)}
+        entradas = [(self.indice[p], *e) for p in self.productos for e in aplanadas[p]]
+        self.ingredientes = list(dict.fromkeys(e[1] for e in entradas))
+        columna = {ing: j for j, ing in enumerate(self.ingredientes)}
+        self.filas = np.array([e[0] for e in entradas], dtype=np.intp)
+        self.columnas = np.array([columna[e[1]] for e in entradas], dtype=np.intp)
+        self.valores = np.array([e[3] for e in entradas], dtype=float)
+        self.unidades = np.array([e[2] for e in entradas], dtype=object)
+        self.vias = np.array([e[4] for e in entradas], dtype=object)
+        # Primera entrada de cada fila (las entradas están ordenadas por fila)
+        self.inicio = np.searchsorted(self.filas, np.arange(len(self.productos) + 1))
+        for arreglo in (self.filas, self.columnas, self.valores, self.unidades, self.vias, self.inicio):
+            arreglo.flags.writeable = False
+
+    def _rendimientos(self, tabla, grupos, dependencias, compilables):
+        usadas = [
+            p for p in grupos
+            if p in compilables and any(p in deps for deps in dependencias.values())
+        ]
+        declarado = (
+            pd.to_numeric(tabla["Rendimiento"], errors="coerce").groupby(tabla["Producto_vendido"]).first()
+            if "Rendimiento" in tabla.columns else pd.Series(dtype=float)
+        )
+        rendimientos = {}
+        for sub in usadas:
+            valor = declarado.get(sub)
+            if valor is None or pd.isna(valor):
+                valor = sum(c for _, _, c in grupos[sub] if pd.notna(c))
+            if not valor > 0:
+                self.avisos.append((
+                    "warning",
+                    f"La sub-receta '{sub}' no tiene un rendimiento válido; su consumo quedará vacío.",
+                ))
+                valor = np.nan
+            rendimientos[sub] = valor
+        return rendimientos
+
+    @classmethod
+    def de(cls, recetas) -> "MatrizRecetas":
+        """Acepta una ``MatrizRecetas`` ya compilada o la tabla de recetas."""
+        return recetas if isinstance(recetas, cls) else compilar(recetas)
+
+    def consumo(self, vendidos: pd.Series) -> pd.DataFrame:
+        """Consumo de ``vendidos`` (cantidad por producto, en orden de venta).
+
+        Los productos deben estar en :attr:`indice`. Devuelve una fila por
+        entrada de la matriz de cada producto vendido, en el orden de
+        ``vendidos`` y de las recetas, con la cantidad de ingrediente.
+        """
+        filas = np.fromiter((self.indice[p] for p in vendidos.index), dtype=np.intp, count=len(vendidos))
+        ventas = np.zeros(len(self.productos))
+        np.add.at(ventas, filas, pd.to_numeric(vendidos, errors="coerce").fillna(0).to_numpy(dtype=float))
+        # Posiciones de las entradas de cada fila vendida, en ese orden
+        inicio, fin = self.inicio[filas], self.inicio[filas + 1]
+        largos = fin - inicio
+        posiciones = np.repeat(inicio - np.cumsum(largos) + largos, largos) + np.arange(largos.sum())
+        return pd.DataFrame({
+            "Producto_vendido": np.array(self.productos, dtype=object)[self.filas[posiciones]],
+            "Ingrediente": np.array(self.ingredientes, dtype=object)[self.columnas[posiciones]],
+            "Unidad": self.unidades[posiciones],
+            "Cantidad_consumida": ventas[self.filas[posiciones]] * self.valores[posiciones],
+        })
+
+    def como_tabla(self) -> pd.DataFrame:
+        """Recetas aplanadas: cantidad de cada ingrediente por unidad vendida."""
+        return pd.DataFrame({
+            "Producto_vendido": np.array(self.productos, dtype=object)[self.filas],
+            "Ingrediente": np.array(self.ingredientes, dtype=object)[self.columnas],
+            "Unidad": self.unidades,
+            "Cantidad_usada": self.valores,
+            "Vía": self.vias,
+        })
+
+    def trazar(self, ingrediente) -> pd.DataFrame:
+        """Productos que consumen ``ingrediente``, con la sub-receta por la que llega."""
+        tabla = self.como_tabla()
+        return tabla[tabla["Ingrediente"] == ingrediente].drop(columns="Ingrediente").reset_index(drop=True)
+
+
+def compilar(recetas: pd.DataFrame | None) -> MatrizRecetas:
+    """Compila (una vez por contenido de la tabla de recetas) la matriz."""
+    if recetas is None:
+        return MatrizRecetas(None)
+    return cache.obtener(
+        ("recetas_compiladas", cache.hash_dataframe(recetas)), (), lambda: MatrizRecetas(recetas)
+    )
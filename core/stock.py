@@ -0,0 +1,76 @@
+"""Stock por producto y ubicación a partir de un cierre y los movimientos."""
+import pandas as pd
+
+from utils.movimientos import sumar_por_par
+from utils.unit_conversion import CatalogIndex
+
+UBICACIONES = ["Almacén", "Barra", "Vinera"]
+
+
+def inventariables(cat):
+    """Catálogo sin los cócteles, que no tienen stock propio."""
+    return cat[~cat["Item"].str.contains(r"(?i)c[oó]ctel(?:es)?|cocktail", na=False)]
+
+
+def indice_pares(cat_filtrado):
+    """MultiIndex (Item, Ubicación) con todos los ítems en todas las ubicaciones."""
+    items = cat_filtrado["Item"].unique()
+    return pd.MultiIndex.from_product([items, UBICACIONES], names=["Item", "Ubicación"])
+
+
+def saldo_inicial_por_par(stock_inicial, indice):
+    """Saldo de apertura por par tomado de la primera coincidencia del cierre."""
+    if stock_inicial.empty:
+        return pd.Series(0.0, index=indice)
+    col = "Cantidad" if "Cantidad" in stock_inicial.columns else "Físico Cierre"
+    inicial = stock_inicial.drop_duplicates(subset=["Item", "Ubicación"])
+    if col in inicial.columns:
+        valores = inicial.set_index(["Item", "Ubicación"])[col]
+    else:
+        valores = pd.Series(0.0, index=pd.MultiIndex.from_frame(inicial[["Item", "Ubicación"]]))
+    return pd.to_numeric(valores, errors="coerce").reindex(indice, fill_value=0.0)
+
+
+def calcular_stock(cat, stock_inicial, entradas, transferencias, ventas):
+    """Stock en botellas por producto y ubicación.
+
+    Stock = cierre inicial + entradas + transferencias netas - consumo, calculado
+    para todos los pares (ítem, ubicación) con agregaciones agrupadas.
+    """
+    cat_filtrado = inventariables(cat)
+    indice = indice_pares(cat_filtrado)
+
+    cantidad = saldo_inicial_por_par(stock_inicial, indice)
+    cantidad = cantidad + sumar_por_par(entradas, "Item", "Ubicación destino", "Cantidad", indice)
+    cantidad = cantidad + sumar_por_par(transferencias, "Item", "Hacia", "Cantidad", indice)
+    cantidad = cantidad - sumar_por_par(transferencias, "Item", "Desde", "Cantidad", indice)
+    consumo = sumar_por_par(ventas, "Item usado", "Ubicación de salida", "Cantidad teórica consumida", indice)
+    consumo = consumo.where(indice.get_level_values("Ubicación").isin(["Barra", "Vinera"]), 0.0)
+    cantidad = cantidad - consumo
+
+    return stock_en_botellas(cantidad, cat, cat_filtrado)
+
+
+def stock_desde_saldo(cat, saldos):
+    """Stock en botellas a partir de un saldo en ml indexado por (Item, Ubicación)."""
+    cat_filtrado = inventariables(cat)
+    cantidad = saldos.reindex(indice_pares(cat_filtrado), fill_value=0.0)
+    return stock_en_botellas(cantidad, cat, cat_filtrado)
+
+
+def stock_en_botellas(cantidad, cat, cat_filtrado):
+    """Convierte una serie de ml indexada por (Item, Ubicación) al formato de stock."""
+    items = cantidad.index.get_level_values("Item")
+    botellas = CatalogIndex.de(cat).to_bottles_series(
+        pd.Series(items), pd.Series(cantidad.to_numpy(dtype=float))
+    )
+    subcats = cat_filtrado.drop_duplicates(subset="Item").set_index("Item")["Subcategoría"]
+    df_stock = pd.DataFrame({
+        "Producto": items,
+        "Subcategoría": subcats.reindex(items).to_numpy(),
+        "Ubicación": cantidad.index.get_level_values("Ubicación"),
+        "Stock Botellas": botellas.to_numpy().round(2),
+    })
+    df_stock = df_stock[df_stock["Stock Botellas"].notna()]
+    df_stock["Stock Botellas"] = df_stock["Stock Botellas"].round(2)
+    return df_stock
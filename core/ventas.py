@@ -0,0 +1,276 @@
+"""Consumo teórico de inventario a partir de las ventas del POS."""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from core.claves import IndiceProductos
+from core.recetas import MatrizRecetas
+from utils import perf
+from utils.unit_conversion import CatalogIndex
+
+COLUMNAS_CONSUMO = [
+    "Fecha",
+    "Producto_vendido",
+    "Ingrediente",
+    "Unidad",
+    "Cantidad_consumida",
+]
+
+COLUMNAS_OMITIDOS = ["Producto", "Subcategoría", "Motivo", "Líneas", "Cantidad"]
+
+MUESTRA_FILAS = 200  # líneas del POS que se muestran como vista previa
+
+# Nombres de las columnas del consumo en las ventas procesadas del almacén
+COLUMNAS_MOVIMIENTO = {
+    "Producto_vendido": "Producto vendido",
+    "Ingrediente": "Item usado",
+    "Cantidad_consumida": "Cantidad teórica consumida",
+}
+
+
+PRODUCTO_NAMES = [
+    "producto vendido",
+    "item vendido",
+    "item",
+    "producto",
+    "descripcion",
+    "descripción",
+]
+
+SUBCAT_NAMES = [
+    "subcategoria",
+    "subcategoría",
+    "subcategory",
+    "sub cat",
+    "subcat",
+    "línea",
+    "linea",
+]
+
+CANTIDAD_NAMES = [
+    "cantidad",
+    "cantidad vendida",
+    "c. vendida",
+    "unidades",
+    "qty",
+]
+
+
+def detectar_columna(columnas, posibles: list[str]) -> str | None:
+    """Primera columna cuyo nombre (sin espacios ni mayúsculas) está en ``posibles``."""
+    posibles_lower = [p.lower() for p in posibles]
+    return next(
+        (c for c in columnas if str(c).strip().lower() in posibles_lower), None
+    )
+
+
+def detectar_columnas_pos(columnas) -> tuple[str | None, str | None, str | None]:
+    """Columnas de producto, subcategoría y cantidad detectadas en un POS."""
+    return (
+        detectar_columna(columnas, PRODUCTO_NAMES),
+        detectar_columna(columnas, SUBCAT_NAMES),
+        detectar_columna(columnas, CANTIDAD_NAMES),
+    )
+
+
+@perf.medido("ventas.procesar")
+def procesar_ventas(
+    df_ventas: pd.DataFrame,
+    prod_col: str,
+    subcat_col: str,
+    cant_col: str | None,
+    catalogo: pd.DataFrame | IndiceProductos,
+    recetas: pd.DataFrame | MatrizRecetas,
+    fecha: datetime,
+    alias: pd.DataFrame | None = None,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Calcula el consumo teórico de inventario de las ventas del POS.
+
+    Cada línea se busca en el catálogo por Nombre + Subcategoría con el
+    índice de claves normalizadas y los ``alias`` aprendidos (ver
+    ``core.claves``); el consumo usa el nombre del catálogo. Los
+    cócteles (CTL) se suman por producto y el vector de ventas se multiplica
+    por la matriz de recetas compilada (ver ``core.recetas``), con las
+    sub-recetas ya resueltas. Las botellas (BOT) se pasan a ml con la
+    capacidad del catálogo, como los tragos (TRG) con su dosis: el consumo
+    queda siempre en ml. Devuelve el consumo y un resumen de las líneas
+    omitidas (producto, subcategoría y motivo).
+    """
+    ventas = pd.DataFrame({
+        "_linea": range(len(df_ventas)),
+        "Nombre": df_ventas[prod_col].astype(str).str.strip().to_numpy(),
+        "Subcategoría": df_ventas[subcat_col].astype(str).str.strip().to_numpy(),
+        "Cantidad": (
+            pd.to_numeric(df_ventas[cant_col], errors="coerce").to_numpy() if cant_col else 1
+        ),
+    })
+    indice = IndiceProductos.de(catalogo, alias)
+    posiciones = indice.resolver(ventas["Nombre"], ventas["Subcategoría"])
+    en_catalogo = pd.Series(posiciones >= 0)
+    cat = indice.catalogo[["Nombre", "Subcategoría", "Tipo_venta", "Unidad", "Dosis_ml"]]
+    filas = cat.reindex(posiciones).reset_index(drop=True)
+    unidas = ventas.assign(**{
+        "Nombre": filas["Nombre"].where(en_catalogo, ventas["Nombre"]),
+        "Subcategoría": filas["Subcategoría"].where(en_catalogo, ventas["Subcategoría"]),
+        "Tipo_venta": filas["Tipo_venta"],
+        "Unidad": filas["Unidad"],
+        "Dosis_ml": filas["Dosis_ml"],
+    })
+    tipo = unidas["Tipo_venta"]
+
+    omitidos = [unidas.loc[~en_catalogo].assign(Motivo="No está en el catálogo")]
+    omitidos.append(
+        unidas.loc[en_catalogo & ~tipo.isin(["CTL", "BOT", "TRG"])].assign(
+            Motivo="Tipo_venta desconocido"
+        )
+    )
+
+    bot = unidas.loc[tipo == "BOT"]
+    capacidad = bot["Nombre"].map(CatalogIndex.de(indice.catalogo).capacidad)
+    omitidos.append(bot.loc[capacidad.isna()].assign(Motivo="BOT sin volumen en el catálogo"))
+    bot, capacidad = bot.loc[capacidad.notna()], capacidad.dropna()
+    trg = unidas.loc[tipo == "TRG"]
+    directas = pd.DataFrame({
+        "_linea": pd.concat([bot["_linea"], trg["_linea"]]),
+        "_orden": 0,
+        "Producto_vendido": pd.concat([bot["Nombre"], trg["Nombre"]]),
+        "Ingrediente": pd.concat([bot["Nombre"], trg["Nombre"]]),
+        "Unidad": "ml",
+        "Cantidad_consumida": pd.concat([capacidad * bot["Cantidad"], trg["Dosis_ml"] * trg["Cantidad"]]),
+    })
+
+    matriz = MatrizRecetas.de(recetas)
+    ctl = unidas.loc[tipo == "CTL", ["_linea", "Nombre", "Subcategoría", "Cantidad"]]
+    con_receta = ctl["Nombre"].isin(matriz.productos)
+    circular = ctl["Nombre"].isin(list(matriz.circulares))
+    omitidos.append(ctl.loc[circular].assign(Motivo="Receta circular"))
+    omitidos.append(ctl.loc[~con_receta & ~circular].assign(Motivo="Sin receta"))
+    vendidos = ctl.loc[con_receta].groupby("Nombre", sort=False).agg(
+        _linea=("_linea", "first"), Cantidad=("Cantidad", "sum")
+    )
+    cocteles = matriz.consumo(vendidos["Cantidad"])
+    cocteles.insert(0, "_linea", cocteles["Producto_vendido"].map(vendidos["_linea"]))
+    cocteles.insert(1, "_orden", range(len(cocteles)))
+
+    consumo = pd.concat([directas, cocteles], ignore_index=True)
+    consumo = consumo.sort_values(["_linea", "_orden"], kind="stable")
+    consumo.insert(0, "Fecha", fecha)
+    consumo = consumo[COLUMNAS_CONSUMO].reset_index(drop=True)
+    if consumo.empty:
+        consumo = pd.DataFrame(columns=COLUMNAS_CONSUMO)
+
+    return consumo, resumir_omitidos(pd.concat(omitidos, ignore_index=True))
+
+
+@perf.medido("ventas.procesar_bloques")
+def procesar_ventas_por_bloques(
+    bloques,
+    prod_col: str,
+    subcat_col: str,
+    cant_col: str | None,
+    catalogo: pd.DataFrame | IndiceProductos,
+    recetas: pd.DataFrame | MatrizRecetas,
+    fecha: datetime,
+    muestra: int = MUESTRA_FILAS,
+    semilla: int = 0,
+    alias: pd.DataFrame | None = None,
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, int]:
+    """Consumo teórico de ventas leídas por bloques (ver ``core.pos.leer_bloques``).
+
+    Cada bloque pasa por :func:`procesar_ventas` y sólo se conservan los
+    totales por producto e ingrediente, las líneas omitidas resumidas y una
+    muestra al azar de ``muestra`` líneas, así que la memoria no crece con el
+    archivo. Devuelve ``(consumo, omitidos, vista_previa, lineas)``; el
+    consumo tiene una fila por producto vendido e ingrediente, en orden de
+    primera aparición.
+    """
+    # El índice y las recetas se compilan una vez para todos los bloques
+    catalogo = IndiceProductos.de(catalogo, alias)
+    recetas = MatrizRecetas.de(recetas)
+    rng = np.random.default_rng(semilla)
+    claves = ["Fecha", "Producto_vendido", "Ingrediente", "Unidad"]
+    consumo = omitidos = vista = None
+    lineas = 0
+    for bloque in bloques:
+        parcial, parcial_omitidos = procesar_ventas(
+            bloque, prod_col, subcat_col, cant_col, catalogo, recetas, fecha
+        )
+        if not parcial.empty:
+            consumo = _acumular(consumo, parcial, claves, {"Cantidad_consumida": "sum"})
+        if not parcial_omitidos.empty:
+            omitidos = _acumular(
+                omitidos, parcial_omitidos, ["Producto", "Subcategoría", "Motivo"],
+                {"Líneas": "sum", "Cantidad": "sum"},
+            )
+        if muestra:
+            # Muestra uniforme: las ``muestra`` líneas con menor clave al azar
+            candidatas = bloque.assign(
+                _clave=rng.random(len(bloque)), _linea=range(lineas, lineas + len(bloque))
+            )
+            vista = candidatas if vista is None else pd.concat([vista, candidatas])
+            vista = vista.nsmallest(muestra, "_clave")
+        lineas += len(bloque)
+
+    consumo = (
+        pd.DataFrame(columns=COLUMNAS_CONSUMO) if consumo is None
+        else consumo.reset_index()[COLUMNAS_CONSUMO]
+    )
+    omitidos = (
+        pd.DataFrame(columns=COLUMNAS_OMITIDOS) if omitidos is None
+        else omitidos.reset_index()[COLUMNAS_OMITIDOS]
+    )
+    if vista is not None:
+        vista = vista.sort_values("_linea").set_index("_linea").drop(columns="_clave")
+        vista.index.name = "Línea"
+    return consumo, omitidos, vista, lineas
+
+
+def _acumular(total, parcial, claves, agregaciones):
+    """Suma ``parcial`` a ``total`` (indexado por ``claves``) en orden de aparición."""
+    if total is not None:
+        parcial = pd.concat([total.reset_index(), parcial], ignore_index=True)
+    return parcial.groupby(claves, sort=False, dropna=False).agg(agregaciones)
+
+
+def resumir_omitidos(omitidos: pd.DataFrame) -> pd.DataFrame:
+    """Agrupa las líneas omitidas por producto, subcategoría y motivo."""
+    if omitidos.empty:
+        return pd.DataFrame(columns=COLUMNAS_OMITIDOS)
+    resumen = (
+        omitidos.groupby(["Nombre", "Subcategoría", "Motivo"], dropna=False, sort=False)
+        .agg(Líneas=("_linea", "size"), Cantidad=("Cantidad", "sum"))
+        .reset_index()
+        .rename(columns={"Nombre": "Producto"})
+    )
+    return resumen[COLUMNAS_OMITIDOS]
+
+
+def corregir_botellas(ventas: pd.DataFrame, catalogo) -> tuple[pd.DataFrame, int]:
+    """Pasa a ml las ventas BOT que se registraron en cantidad de botellas.
+
+    ``ventas`` son ventas procesadas guardadas antes de la corrección: en ellas
+    el consumo de un producto BOT vendido por sí mismo es la cantidad de
+    botellas. Se convierten todas esas filas (las de un producto sin capacidad
+    en el catálogo quedan igual), así que no debe aplicarse a ventas ya en ml.
+    Devuelve las ventas corregidas y cuántas filas cambiaron.
+    """
+    cat = catalogo.drop_duplicates(subset="Nombre").set_index("Nombre")
+    es_bot = ventas["Item usado"].map(cat["Tipo_venta"]).eq("BOT")
+    capacidad = ventas["Item usado"].map(CatalogIndex.de(catalogo).capacidad)
+    cantidad = pd.to_numeric(ventas["Cantidad teórica consumida"], errors="coerce")
+    en_botellas = (
+        es_bot & (ventas["Producto vendido"] == ventas["Item usado"])
+        & cantidad.notna() & (capacidad > 0)
+    )
+    if not en_botellas.any():
+        return ventas, 0
+    ventas = ventas.copy()
+    ventas.loc[en_botellas, "Cantidad teórica consumida"] = cantidad[en_botellas] * capacidad[en_botellas]
+    ventas.loc[en_botellas, "Unidad"] = "ml"
+    return ventas, int(en_botellas.sum())
+
+
+def como_movimientos(consumo: pd.DataFrame, ubicacion: str) -> pd.DataFrame:
+    """Consumo con las columnas de las ventas procesadas y su ubicación de salida."""
+    return consumo.rename(columns=COLUMNAS_MOVIMIENTO).assign(**{"Ubicación de salida": ubicacion})
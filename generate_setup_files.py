@@ -3,7 +3,7 @@ import os, stat, textwrap
 ROOT = os.path.dirname(os.path.abspath(__file__))
 
 requirements = textwrap.dedent("""\
-streamlit
+streamlit>=1.52
 pandas
 openpyxl
 xlsxwriter
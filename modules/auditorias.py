@@ -1,11 +1,24 @@
 import streamlit as st
 import pandas as pd
 import os
-import shutil
 from datetime import datetime, timedelta
 from utils.pdf_report import generar_pdf_cierre, generar_pdf_apertura  # deja tu stub
 from utils.excel_tools import to_excel_bytes
-from utils.unit_conversion import to_ml
+from utils import event_store, trabajos
+from modules.descargas import mostrar_trabajos, registrar_trabajo
+from utils.unit_conversion import CatalogIndex
+from core.auditorias import (
+    COLUMNAS_REQUISICION,
+    UBICACIONES,
+    apertura_a_ml,
+    cierre_a_ml,
+    comparar_apertura,
+    conciliar_cierre,
+    conteo_a_ml,
+    preparar_conteo,
+    requisiciones,
+    unir_apertura,
+)
 from utils.path_utils import (
     CATALOGO_DIR,
     ENTRADAS_DIR,
@@ -26,42 +39,94 @@ AUDITORIA_AP_FOLDER = AUDITORIA_AP_DIR
 AUDITORIA_CI_FOLDER = AUDITORIA_CI_DIR
 REPORTES_PDF_FOLDER = REPORTES_PDF_DIR
 
-# Ubicaciones disponibles para las auditorías
-UBICACIONES = ["Almacén", "Barra", "Vinera"]
-
 def registrar_requisiciones(df_audit, fecha):
-    df_requis = df_audit[(df_audit["Requisicion"] > 0)]
+    df_requis = requisiciones(df_audit, fecha)
     if df_requis.empty:
         return
-    registros = []
-    for idx, row in df_requis.iterrows():
-        registros.append({
-            "Fecha": fecha,
-            "Item": row["Item"],
-            "Desde": "Almacén",
-            "Hacia": row["Ubicación"],
-            "Cantidad": row["Requisicion"]
-        })
-    archivo = f"transferencias_{fecha}.xlsx"
-    path = os.path.join(TRANSFERENCIAS_FOLDER, archivo)
-    if os.path.exists(path):
-        df_old = pd.read_excel(path)
-        df_new = pd.concat([df_old, pd.DataFrame(registros)], ignore_index=True)
-    else:
-        df_new = pd.DataFrame(registros)
-    df_new = df_new.drop_duplicates(subset=["Fecha", "Item", "Desde", "Hacia", "Cantidad"], keep="first")
     try:
-        with pd.ExcelWriter(path, engine="xlsxwriter") as writer:
-            df_new.to_excel(writer, index=False)
+        # Sólo se agregan las requisiciones que no estaban ya registradas
+        event_store.guardar(
+            "transferencias", df_requis, fecha, modo="agregar",
+            unicos=COLUMNAS_REQUISICION,
+        )
     except Exception as e:
         st.error(f"Error guardando transferencias: {e}")
 
+
+def _leer_conteo(archivo, columna, ubicacion):
+    df, faltantes = preparar_conteo(pd.read_excel(archivo), columna, ubicacion)
+    for req in faltantes:
+        st.error(f"Falta columna requerida: {req}")
+    return df
+
+
+def _indice_catalogo():
+    cat_path = latest_file(CATALOGO_DIR, "catalogo")
+    if not cat_path or not os.path.exists(cat_path):
+        st.error("No se encontró el catálogo para validar unidades.")
+        return None
+    return CatalogIndex.desde_archivo(cat_path)
+
+def corregir_auditorias(cat):
+    """Pasa a ml las auditorías guardadas con los conteos en botellas.
+
+    Sólo se convierten los días guardados antes de la corrección (el legado de
+    ``auditorias_ml``). Las ventas BOT deben estar ya en ml: el cierre teórico
+    se recalcula con los movimientos del día. Todo se reemplaza en una sola
+    transacción que deja la conversión como aplicada; después se reconstruye
+    el saldo. Devuelve la cantidad de días convertidos.
+    """
+    legado = {}
+    for tabla, archivo in event_store.legado("auditorias_ml"):
+        legado.setdefault(event_store.dia_de_archivo(tabla, archivo), set()).add(tabla)
+    registros = []
+    for fecha, tablas in sorted(legado.items()):
+        if "auditoria_apertura" in tablas:
+            apertura = apertura_a_ml(event_store.leer("auditoria_apertura", fecha=fecha), cat)
+            registros.append(("auditoria_apertura", apertura, fecha, "reemplazar"))
+        else:
+            apertura = event_store.leer("auditoria_apertura", fecha=fecha)
+        movimientos = [
+            event_store.leer(tabla, fecha=fecha)
+            for tabla in ("entradas", "transferencias", "ventas_procesadas")
+        ]
+        for tabla in ("auditoria_cierre", "cierres_confirmados"):
+            if tabla in tablas:
+                cierre = cierre_a_ml(event_store.leer(tabla, fecha=fecha), apertura, cat, *movimientos)
+                registros.append((tabla, cierre, fecha, "reemplazar"))
+    event_store.migrar("auditorias_ml", registros)
+    event_store.verificar_saldos(reconstruir=True)
+    return len(legado)
+
+
+def _aviso_legado():
+    """Ofrece convertir a ml las auditorías que siguen guardadas en botellas."""
+    pendientes = event_store.legado("auditorias_ml")
+    if not pendientes:
+        return
+    dias = {event_store.dia_de_archivo(tabla, archivo) for tabla, archivo in pendientes}
+    st.warning(
+        f"Hay auditorías de {len(dias)} días guardadas con los conteos en botellas. "
+        "No se usan como base de otra auditoría hasta convertirlas a ml."
+    )
+    if event_store.legado("ventas_bot_ml"):
+        st.caption("Antes corrige las ventas BOT en botellas (Stock → Verificación del saldo).")
+        return
+    if st.button("Convertir auditorías a ml"):
+        cat = _indice_catalogo()
+        if cat is None:
+            return
+        dias = corregir_auditorias(cat)
+        st.success(f"Auditorías de {dias} días convertidas; saldo reconstruido a partir del historial.")
+
+
 def auditoria_apertura():
     st.title("Auditoría de Apertura")
     st.info("""
     Carga el archivo Excel con el conteo físico de apertura (realizado al iniciar el día).
     Si el archivo tiene columna 'Requisicion', las transferencias declaradas se registrarán automáticamente.
     """)
+    _aviso_legado()
     fecha = st.date_input("Fecha de auditoría de apertura", value=datetime.today())
     ubic_sel = st.selectbox(
         "Ubicación de la auditoría",
@@ -72,65 +137,36 @@ def auditoria_apertura():
         type=["xlsx"],
     )
     if archivo and st.button("Procesar auditoría de apertura"):
-        df = pd.read_excel(archivo)
-        requeridas = ["Fecha", "Item", "Subcategoría", "Conteo Apertura"]
-        if ubic_sel == "General":
-            requeridas.append("Ubicación")
-        for req in requeridas:
-            if req not in df.columns:
-                st.error(f"Falta columna requerida: {req}")
-                return
-        if ubic_sel != "General":
-            df["Ubicación"] = ubic_sel
-        if "Requisicion" not in df.columns:
-            df["Requisicion"] = 0
-
-        cat_path = latest_file(CATALOGO_DIR, "catalogo")
-        if not cat_path or not os.path.exists(cat_path):
-            st.error("No se encontró el catálogo para validar unidades.")
+        df = _leer_conteo(archivo, "Conteo Apertura", ubic_sel)
+        if df is None:
             return
-        cat = pd.read_excel(cat_path)
-        df["Conteo Apertura"] = df.apply(lambda r: to_ml(r["Item"], r["Conteo Apertura"], cat), axis=1)
-        df["Requisicion"] = df.apply(lambda r: to_ml(r["Item"], r["Requisicion"], cat), axis=1)
+        cat = _indice_catalogo()
+        if cat is None:
+            return
+        df = conteo_a_ml(df, cat, ["Conteo Apertura", "Requisicion"])
 
-        registrar_requisiciones(df, fecha.strftime("%Y-%m-%d"))
         fecha_prev = fecha - timedelta(days=1)
-        cierre_prev_path = os.path.join(
-            CIERRES_CONFIRMADOS_FOLDER,
-            f"auditoria_cierre_{fecha_prev.strftime('%Y-%m-%d')}.xlsx",
-        )
-        if os.path.exists(cierre_prev_path):
-            prev = pd.read_excel(cierre_prev_path)
-            if "Conteo Cierre" in prev.columns and "Físico Cierre" not in prev.columns:
-                prev = prev.rename(columns={"Conteo Cierre": "Físico Cierre"})
+        fecha_prev_str = fecha_prev.strftime('%Y-%m-%d')
+        cierre_prev_arch = event_store.nombre_archivo("cierres_confirmados", fecha_prev_str)
+        if event_store.es_legado("cierres_confirmados", cierre_prev_arch):
+            st.error(
+                "El cierre del día anterior está guardado en botellas; conviértelo a ml "
+                "antes de usarlo como base de la apertura."
+            )
+            return
+        registrar_requisiciones(df, fecha.strftime("%Y-%m-%d"))
+        if cierre_prev_arch in event_store.archivos("cierres_confirmados"):
+            prev = event_store.leer("cierres_confirmados", fecha=fecha_prev_str)
         else:
             prev = pd.DataFrame(columns=["Item", "Ubicación", "Físico Cierre"])
             st.warning("No se encontró auditoría de cierre del día anterior.")
-        result = []
-        for idx, row in df.iterrows():
-            cierre_prev = prev[
-                (prev["Item"] == row["Item"]) &
-                (prev["Ubicación"] == row["Ubicación"])
-            ]
-            cierre_anterior = float(cierre_prev.iloc[0]["Físico Cierre"]) if not cierre_prev.empty else 0
-            diferencia = float(row["Conteo Apertura"]) - cierre_anterior
-            result.append({
-                "Item": row["Item"],
-                "Ubicación": row["Ubicación"],
-                "Cierre anterior": cierre_anterior,
-                "Apertura actual": row["Conteo Apertura"],
-                "Diferencia": diferencia
-            })
-        df_res = pd.DataFrame(result)
-        df_res.rename(columns={"Apertura actual": "Conteo Apertura"}, inplace=True)
+        df_res = comparar_apertura(df, prev)
         outfile = f"auditoria_apertura_{fecha.strftime('%Y-%m-%d')}.xlsx"
         pdfout = outfile.replace('.xlsx', '.pdf')
-        out_path = os.path.join(AUDITORIA_AP_FOLDER, outfile)
         try:
-            with pd.ExcelWriter(out_path, engine="xlsxwriter") as writer:
-                df_res.to_excel(writer, index=False)
-            pdf_bytes = generar_pdf_apertura(
-                df_res, os.path.join(REPORTES_PDF_FOLDER, pdfout)
+            event_store.guardar(
+                "auditoria_apertura", df_res, fecha.strftime('%Y-%m-%d'),
+                modo="reemplazar", exportar=True,
             )
         except Exception as e:
             st.error(f"Error guardando auditoría: {e}")
@@ -139,7 +175,12 @@ def auditoria_apertura():
         st.dataframe(df_res)
         # USAR EL NUEVO PATRÓN PARA DESCARGA
         st.download_button("Descargar auditoría (Excel)", data=to_excel_bytes(df_res), file_name=outfile)
-        st.download_button("Descargar auditoría (PDF)", data=pdf_bytes, file_name=pdfout, mime="application/pdf")
+        # El PDF se genera en segundo plano y aparece abajo cuando está listo
+        registrar_trabajo(
+            "trabajos_auditorias",
+            trabajos.enviar(generar_pdf_apertura, df_res, pdfout, REPORTES_PDF_FOLDER),
+        )
+    mostrar_trabajos("trabajos_auditorias")
 
 def auditoria_cierre():
     st.title("Auditoría de Cierre")
@@ -151,6 +192,7 @@ def auditoria_cierre():
     - Registra transferencias internas (si las hay en 'Requisicion'),
     - Genera un reporte detallado.
     """)
+    _aviso_legado()
     fecha = st.date_input("Fecha de auditoría de cierre", value=datetime.today())
     ubic_sel = st.selectbox(
         "Ubicación de la auditoría",
@@ -161,114 +203,63 @@ def auditoria_cierre():
         type=["xlsx"],
     )
     if archivo and st.button("Procesar auditoría de cierre"):
-        df = pd.read_excel(archivo)
-        requeridas = ["Fecha", "Item", "Subcategoría", "Conteo Cierre"]
-        if ubic_sel == "General":
-            requeridas.append("Ubicación")
-        for req in requeridas:
-            if req not in df.columns:
-                st.error(f"Falta columna requerida: {req}")
-                return
-        if ubic_sel != "General":
-            df["Ubicación"] = ubic_sel
-        if "Requisicion" not in df.columns:
-            df["Requisicion"] = 0
+        df = _leer_conteo(archivo, "Conteo Cierre", ubic_sel)
+        if df is None:
+            return
 
         # Intentar cargar la auditoría de apertura correspondiente
-        apertura_arch = os.path.join(
-            AUDITORIA_AP_FOLDER,
-            f"auditoria_apertura_{fecha.strftime('%Y-%m-%d')}.xlsx",
-        )
-        if os.path.exists(apertura_arch):
-            df_open = pd.read_excel(apertura_arch)
-            if "Conteo Apertura" in df.columns:
-                df = df.drop(columns=["Conteo Apertura"])
-            df = df.merge(
-                df_open[["Item", "Ubicación", "Conteo Apertura"]],
-                on=["Item", "Ubicación"],
-                how="left",
+        fecha_str = fecha.strftime('%Y-%m-%d')
+        apertura_arch = event_store.nombre_archivo("auditoria_apertura", fecha_str)
+        if event_store.es_legado("auditoria_apertura", apertura_arch):
+            st.error(
+                "La auditoría de apertura del día está guardada en botellas; conviértela a ml "
+                "antes de conciliar el cierre."
             )
-            df["Conteo Apertura"] = df["Conteo Apertura"].fillna(0)
+            return
+        if apertura_arch in event_store.archivos("auditoria_apertura"):
+            df_open = event_store.leer("auditoria_apertura", fecha=fecha_str)
         else:
             df_open = pd.DataFrame(columns=["Item", "Ubicación", "Conteo Apertura"])
-            df["Conteo Apertura"] = 0
             st.info(
                 "No se encontró auditoría de apertura para la fecha; se asume Conteo Apertura = 0."
             )
+        df = unir_apertura(df, df_open)
 
-        cat_path = latest_file(CATALOGO_DIR, "catalogo")
-        if not cat_path or not os.path.exists(cat_path):
-            st.error("No se encontró el catálogo para validar unidades.")
+        cat = _indice_catalogo()
+        if cat is None:
             return
-        cat = pd.read_excel(cat_path)
-        for col in ["Conteo Cierre", "Requisicion"]:
-            df[col] = df.apply(lambda r: to_ml(r["Item"], r[col], cat), axis=1)
-        if "Conteo Apertura" in df.columns:
-            df["Conteo Apertura"] = df.apply(
-                lambda r: to_ml(r["Item"], r["Conteo Apertura"], cat), axis=1
-            )
-        df.rename(columns={"Conteo Cierre": "Físico Cierre"}, inplace=True)
+        # El Conteo Apertura registrado ya está en ml
+        df = conteo_a_ml(df, cat, ["Conteo Cierre", "Requisicion"])
+        df = df.rename(columns={"Conteo Cierre": "Físico Cierre"})
 
         registrar_requisiciones(df, fecha.strftime("%Y-%m-%d"))
 
         # Cargar los movimientos diarios relevantes
-        entradas_arch = os.path.join(ENTRADAS_FOLDER, f"entradas_{fecha.strftime('%Y-%m-%d')}.xlsx")
-        if os.path.exists(entradas_arch):
-            entradas = pd.read_excel(entradas_arch)
-        else:
-            entradas = pd.DataFrame(columns=["Fecha", "Item", "Subcategoría", "Ubicación destino", "Cantidad"])
-
-        trans_arch = os.path.join(TRANSFERENCIAS_FOLDER, f"transferencias_{fecha.strftime('%Y-%m-%d')}.xlsx")
-        if os.path.exists(trans_arch):
-            trans = pd.read_excel(trans_arch)
-        else:
-            trans = pd.DataFrame(columns=["Fecha", "Item", "Desde", "Hacia", "Cantidad"])
-
-        ventas_arch = os.path.join(VENTAS_PROCESADAS_FOLDER, f"ventas_procesadas_{fecha.strftime('%Y-%m-%d')}.xlsx")
-        if os.path.exists(ventas_arch):
-            ventas = pd.read_excel(ventas_arch)
-        else:
-            ventas = pd.DataFrame(columns=["Fecha", "Producto vendido", "Item usado", "Subcategoría",
-                                           "Cantidad teórica consumida", "Ubicación de salida"])
+        entradas = event_store.leer("entradas", fecha=fecha_str)
+        trans = event_store.leer("transferencias", fecha=fecha_str)
+        ventas = event_store.leer("ventas_procesadas", fecha=fecha_str)
 
-        result = []
-        for idx, row in df.iterrows():
-            item, ubic = row["Item"], row["Ubicación"]
-            apertura = float(row["Conteo Apertura"])
-            cierre_fisico = float(row["Físico Cierre"])
-            entradas_sum = entradas[(entradas["Item"] == item) & (entradas["Ubicación destino"] == ubic)]["Cantidad"].sum()
-            transf_in = trans[(trans["Item"] == item) & (trans["Hacia"] == ubic)]["Cantidad"].sum()
-            transf_out = trans[(trans["Item"] == item) & (trans["Desde"] == ubic)]["Cantidad"].sum()
-            transf_netas = transf_in - transf_out
-            if ubic in ["Barra", "Vinera"]:
-                consumo = ventas[(ventas["Item usado"] == item) & (ventas["Ubicación de salida"] == ubic)]["Cantidad teórica consumida"].sum()
-            else:
-                consumo = 0
-            teorico_cierre = apertura + entradas_sum + transf_netas - consumo
-            diferencia = cierre_fisico - teorico_cierre
-            result.append({
-                "Item": item,
-                "Ubicación": ubic,
-                "Físico Cierre": cierre_fisico,
-                "Teorico": teorico_cierre,
-                "Diferencia": diferencia,
-            })
-        df_res = pd.DataFrame(result, columns=["Item", "Ubicación", "Físico Cierre", "Teorico", "Diferencia"])
+        df_res = conciliar_cierre(df, entradas, trans, ventas)
         outfile = f"auditoria_cierre_{fecha.strftime('%Y-%m-%d')}.xlsx"
         pdfout = outfile.replace('.xlsx', '.pdf')
-        out_path = os.path.join(AUDITORIA_CI_FOLDER, outfile)
         try:
-            with pd.ExcelWriter(out_path, engine="xlsxwriter") as writer:
-                df_res.to_excel(writer, index=False)
-            pdf_bytes = generar_pdf_cierre(
-                df_res, os.path.join(REPORTES_PDF_FOLDER, pdfout)
-            )
-            os.makedirs(CIERRES_CONFIRMADOS_FOLDER, exist_ok=True)
-            shutil.copy(out_path, os.path.join(CIERRES_CONFIRMADOS_FOLDER, outfile))
+            event_store.guardar("auditoria_cierre", df_res, fecha_str, modo="reemplazar")
+            event_store.guardar("cierres_confirmados", df_res, fecha_str, modo="reemplazar")
         except Exception as e:
             st.error(f"Error guardando auditoría: {e}")
             return
+        try:
+            # Fin del día: se materializan los Excel de todo lo registrado
+            event_store.compactar(fecha=fecha_str)
+        except Exception as e:
+            # La auditoría ya está en el almacén; el día queda pendiente y se
+            # exporta en la próxima compactación
+            st.warning(f"La auditoría se guardó, pero no se pudieron generar los Excel del día: {e}")
         st.success("Auditoría de cierre procesada y registrada.")
         st.dataframe(df_res)
         st.download_button("Descargar auditoría (Excel)", data=to_excel_bytes(df_res), file_name=outfile)
-        st.download_button("Descargar auditoría (PDF)", data=pdf_bytes, file_name=pdfout, mime="application/pdf")
+        registrar_trabajo(
+            "trabajos_auditorias",
+            trabajos.enviar(generar_pdf_cierre, df_res, pdfout, REPORTES_PDF_FOLDER),
+        )
+    mostrar_trabajos("trabajos_auditorias")
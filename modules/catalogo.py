@@ -1,55 +1,20 @@
 import streamlit as st
-import pandas as pd
-import os
-from glob import glob
-from utils.excel_tools import to_excel_bytes
-from utils.path_utils import CATALOGO_DIR, latest_file
 
+from core.catalogo import leer_catalogo
+from utils import alias_pos
+from utils.excel_tools import excel_diferido
 
-EXPECTED_COLUMNS = [
-    "Item",
-    "Subcategoría",
-    "Tipo_venta",
-    "Unidad",
-    "Volumen_ml_por_unidad",
-    "Dosis_ml",
-]
+
+def mostrar_avisos(avisos):
+    """Muestra los avisos ``(nivel, mensaje)`` de la biblioteca ``core``."""
+    for nivel, mensaje in avisos:
+        getattr(st, nivel)(mensaje)
 
 
 def load_catalog():
     """Carga y valida el catálogo de productos desde Excel."""
-    path = latest_file(CATALOGO_DIR, "catalogo")
-    if not path:
-        # Fallback to any Excel file in the catalog directory
-        candidates = glob(os.path.join(CATALOGO_DIR, "*.xlsx"))
-        path = candidates[0] if candidates else None
-    if path and os.path.exists(path):
-        df = pd.read_excel(path)
-        if "Item" not in df.columns and "Nombre" in df.columns:
-            df = df.rename(columns={"Nombre": "Item"})
-    else:
-        # Si el catálogo no existe, retorna DataFrame vacío con columnas esperadas
-        df = pd.DataFrame(columns=EXPECTED_COLUMNS)
-
-    missing = [c for c in EXPECTED_COLUMNS if c not in df.columns]
-    if missing:
-        st.error(f"Catálogo incompleto. Faltan columnas: {', '.join(missing)}")
-        df = df.reindex(columns=EXPECTED_COLUMNS)
-    if "Nombre" not in df.columns and "Item" in df.columns:
-        df["Nombre"] = df["Item"]
-
-    # Validaciones específicas por tipo de venta
-    if not df.empty:
-        bot_missing = df[(df["Tipo_venta"] == "BOT") & df["Volumen_ml_por_unidad"].isna()]
-        trg_missing = df[(df["Tipo_venta"] == "TRG") & df["Dosis_ml"].isna()]
-        if not bot_missing.empty:
-            st.warning(
-                "Hay productos de tipo BOT sin 'Volumen_ml_por_unidad'. Verifica el catálogo."
-            )
-        if not trg_missing.empty:
-            st.warning(
-                "Hay productos de tipo TRG sin 'Dosis_ml'. Verifica el catálogo."
-            )
+    df, avisos = leer_catalogo()
+    mostrar_avisos(avisos)
     return df
 
 def catalogo_module():
@@ -70,7 +35,7 @@ def catalogo_module():
     # Descarga del catálogo
     st.download_button(
         label="Descargar catálogo en Excel",
-        data=to_excel_bytes(df),
+        data=excel_diferido(df),
         file_name="catalogo_producto.xlsx",
         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     )
@@ -83,4 +48,33 @@ def catalogo_module():
         "- Unidad (ml, botella, etc.)\n"
         "- Volumen_ml_por_unidad (si Tipo_venta = BOT)\n"
         "- Dosis_ml (si Tipo_venta = TRG)"
-    )
\ No newline at end of file
+    )
+
+    alias_pos_section()
+
+
+def alias_pos_section():
+    """Alias aprendidos al resolver productos del POS en la página de ventas."""
+    alias = alias_pos.leer()
+    if alias.empty:
+        return
+    st.subheader("Alias del POS")
+    st.caption(
+        "Productos del POS (clave sin tildes ni mayúsculas) asignados a mano a un "
+        "producto del catálogo. Borra una fila para olvidar el alias."
+    )
+    editados = st.data_editor(
+        alias,
+        num_rows="dynamic",
+        disabled=["Clave_nombre", "Clave_subcategoria", "Nombre", "Subcategoría", "Creado"],
+        hide_index=True,
+        use_container_width=True,
+        key="alias_pos",
+    )
+    if len(editados) != len(alias) and st.button("Guardar alias"):
+        try:
+            alias_pos.guardar(editados, reemplazar=True)
+        except Exception as e:
+            st.error(f"Error guardando alias: {e}")
+            return
+        st.success(f"{len(editados)} alias guardados.")
\ No newline at end of file
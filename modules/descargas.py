@@ -0,0 +1,59 @@
+import os
+
+import streamlit as st
+
+from utils import trabajos
+
+MIMES = {
+    ".pdf": "application/pdf",
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def registrar_trabajo(clave, trabajo_id):
+    """Agrega un trabajo a la lista que la sesión muestra bajo ``clave``."""
+    ids = st.session_state.setdefault(clave, [])
+    if trabajo_id in ids:
+        ids.remove(trabajo_id)
+    ids.insert(0, trabajo_id)
+
+
+def _mostrar(clave):
+    for trabajo_id in list(st.session_state.get(clave, [])):
+        info = trabajos.estado(trabajo_id)
+        if info is None:
+            continue
+        col1, col2 = st.columns([3, 1])
+        col1.write(f"**{info['descripcion']}** — {info['estado']}")
+        if info["estado"] == trabajos.LISTO:
+            col2.download_button(
+                label="Descargar",
+                data=lambda trabajo_id=trabajo_id: trabajos.leer(trabajo_id),
+                key=f"{clave}-{trabajo_id}",
+                file_name=info["nombre"],
+                mime=MIMES.get(os.path.splitext(info["nombre"])[1]),
+            )
+        elif info["estado"] in (trabajos.EN_COLA, trabajos.EN_CURSO):
+            if col2.button("Cancelar", key=f"{clave}-{trabajo_id}-cancelar"):
+                trabajos.cancelar(trabajo_id)
+        elif info["estado"] == trabajos.ERROR:
+            col1.error(f"Error generando el archivo: {info['error']}")
+        elif info["estado"] == trabajos.REEMPLAZADO:
+            col1.caption("Otro reporte escribió después este archivo; vuelve a generarlo para descargarlo.")
+
+
+@st.fragment(run_every=2)
+def _mostrar_con_avance(clave):
+    _mostrar(clave)
+
+
+def mostrar_trabajos(clave):
+    """Lista los trabajos de la sesión; se refresca sola mientras haya pendientes."""
+    pendientes = any(
+        (trabajos.estado(t) or {}).get("estado") in (trabajos.EN_COLA, trabajos.EN_CURSO)
+        for t in st.session_state.get(clave, [])
+    )
+    if pendientes:
+        _mostrar_con_avance(clave)
+    else:
+        _mostrar(clave)
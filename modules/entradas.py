@@ -1,47 +1,33 @@
 import streamlit as st
 import pandas as pd
-import os
 from datetime import datetime
-from utils.excel_tools import to_excel_bytes
+from utils.excel_tools import excel_diferido
 from utils.path_utils import ENTRADAS_DIR
+from utils import event_store
 from modules.catalogo import load_catalog
 
 ENTRADAS_FOLDER = ENTRADAS_DIR
 
 def save_entrada(df, fecha):
     """
-    Guarda el DataFrame de entrada en la carpeta de entradas con formato: entradas_YYYY-MM-DD.xlsx
-    Si ya existe, concatena la nueva entrada.
+    Registra el DataFrame de entrada en el almacén para la fecha indicada.
+    El respaldo diario entradas_YYYY-MM-DD.xlsx se regenera a partir del almacén.
     """
-    nombre_archivo = f"entradas_{fecha}.xlsx"
-    path = os.path.join(ENTRADAS_FOLDER, nombre_archivo)
-    if os.path.exists(path):
-        df_old = pd.read_excel(path)
-        df_new = pd.concat([df_old, df], ignore_index=True)
-    else:
-        df_new = df
     try:
-        with pd.ExcelWriter(path, engine="xlsxwriter") as writer:
-            df_new.to_excel(writer, index=False)
+        event_store.guardar("entradas", df, fecha, modo="agregar")
     except Exception as e:
         st.error(f"Error guardando entradas: {e}")
 
 def show_latest_entradas():
-    """Muestra las últimas 5 entradas cargadas (de los archivos más recientes)."""
-    archivos = [f for f in os.listdir(ENTRADAS_FOLDER) if f.endswith('.xlsx')]
-    archivos = sorted(archivos, reverse=True)
-    dfs = []
-    for archivo in archivos[:5]:
-        try:
-            df = pd.read_excel(os.path.join(ENTRADAS_FOLDER, archivo))
-            df['Archivo'] = archivo
-            dfs.append(df)
-        except:
-            pass
-    if dfs:
-        return pd.concat(dfs, ignore_index=True)
-    else:
+    """Muestra las entradas de los 5 días más recientes registrados."""
+    archivos = event_store.archivos("entradas")[-5:]
+    df = event_store.leer("entradas", archivos=archivos, incluir_origen=True)
+    if df.empty:
         return pd.DataFrame()
+    df = df.rename(columns={"_archivo": "Archivo"})
+    df = df[[c for c in df.columns if c != "Archivo"] + ["Archivo"]]
+    # Más recientes primero, respetando el orden de carga dentro de cada día
+    return df.sort_values("Archivo", ascending=False, kind="stable").reset_index(drop=True)
 
 def entradas_module():
     st.title("Registro de Entradas a Inventario")
@@ -98,7 +84,7 @@ def entradas_module():
         st.dataframe(df_hist)
         st.download_button(
             label="Descargar últimas entradas (Excel)",
-            data=to_excel_bytes(df_hist),
+            data=excel_diferido(df_hist),
             file_name="ultimas_entradas.xlsx",
             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
         )
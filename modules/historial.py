@@ -2,7 +2,8 @@ import streamlit as st
 import pandas as pd
 import os
 from glob import glob
-from utils.excel_tools import to_excel_bytes  # <-- AGREGA ESTA LÍNEA
+from utils.excel_tools import to_excel_bytes, archivo_diferido  # <-- AGREGA ESTA LÍNEA
+from utils import event_store, historial_index
 from utils.path_utils import (
     ENTRADAS_DIR,
     TRANSFERENCIAS_DIR,
@@ -21,103 +22,99 @@ CARPETAS = {
     "Cierres confirmados": CIERRES_CONFIRMADOS_DIR,
 }
 
-def cargar_historial(tipo, path):
-    archivos = glob(os.path.join(path, "*.xlsx"))
-    registros = []
-    for archivo in archivos:
-        try:
-            df = pd.read_excel(archivo)
-            df["Origen archivo"] = os.path.basename(archivo)
-            df["Tipo operación"] = tipo
-            # Estandariza columnas comunes (Item, Ubicación, Fecha, Subcategoría si existe)
-            if "Ubicación destino" in df.columns and "Ubicación" not in df.columns:
-                df["Ubicación"] = df["Ubicación destino"]
-            if "Ubicación de salida" in df.columns and "Ubicación" not in df.columns:
-                df["Ubicación"] = df["Ubicación de salida"]
-            if "Hacia" in df.columns and "Ubicación" not in df.columns:
-                df["Ubicación"] = df["Hacia"]  # solo para transferencias de llegada
-
-            if "Producto vendido" in df.columns and "Item" not in df.columns:
-                df["Item"] = df["Producto vendido"]
-            if "Item usado" in df.columns and "Item" not in df.columns:
-                df["Item"] = df["Item usado"]
-            registros.append(df)
-        except Exception as e:
-            st.warning(f"No fue posible leer {archivo}: {e}")
-    if registros:
-        df = pd.concat(registros, ignore_index=True)
-        # Normaliza algunas columnas
-        for col in ["Fecha", "Item", "Ubicación", "Subcategoría"]:
-            if col not in df.columns:
-                df[col] = '' if col != "Fecha" else None
-        return df
-    else:
-        return pd.DataFrame(columns=["Fecha","Item","Ubicación","Subcategoría","Tipo operación","Origen archivo"])
+POR_PAGINA = 200
+
+def cargar_historial(tipo, path=None, **filtros):
+    """Historial normalizado de un tipo de operación leído del índice.
+
+    ``path`` se conserva por compatibilidad; los datos provienen del almacén.
+    Acepta los filtros de ``historial_index.consultar`` (desde, hasta, item,
+    ubicacion, subcategoria).
+    """
+    return historial_index.consultar(tipos=[tipo], por_pagina=None, **filtros)
 
 def historial_module():
     st.title("Historial integrado de movimientos y auditorías")
 
     st.info("""
         Consulta todos los movimientos y auditorías respaldados en el sistema. 
-        Filtra por ubicación, ítem, subcategoría y descarga los datos para supervisión o análisis.
+        Filtra por fecha, ubicación, ítem, subcategoría y descarga los datos para supervisión o análisis.
     """)
 
+    errores = event_store.fallidos()
+    if errores:
+        st.warning(f"{len(errores)} archivos no se pudieron leer y no aparecen en el historial:")
+        st.dataframe(pd.DataFrame(errores), use_container_width=True)
+
     # Selección tipo de operación
     tipo_sel = st.selectbox("¿Qué movimientos ver?", ["Todos"] + list(CARPETAS.keys()))
+    tipos = None if tipo_sel == "Todos" else [tipo_sel]
 
-    # Carga el historial de uno o todos los tipos
-    if tipo_sel == "Todos":
-        dfs = []
-        for tipo, path in CARPETAS.items():
-            df_tipo = cargar_historial(tipo, path)
-            dfs.append(df_tipo)
-        df_hist = pd.concat(dfs, ignore_index=True)
-    else:
-        df_hist = cargar_historial(tipo_sel, CARPETAS[tipo_sel])
-
-    if df_hist.empty:
+    opciones = historial_index.opciones(tipos)
+    if opciones["desde"] is None:
         st.info("No hay movimientos o auditorías en esa categoría todavía.")
         return
 
-    # Filtros dinámicos
-    ubicaciones = sorted(df_hist["Ubicación"].dropna().unique())
-    items = sorted(df_hist["Item"].dropna().unique())
-    subcats = sorted(df_hist["Subcategoría"].dropna().unique())
+    # Filtros dinámicos (se aplican dentro de la consulta)
+    desde_min = pd.to_datetime(opciones["desde"], errors="coerce")
+    hasta_max = pd.to_datetime(opciones["hasta"], errors="coerce")
+    rango = None
+    if pd.notna(desde_min) and pd.notna(hasta_max):
+        rango = st.date_input(
+            "Rango de fechas",
+            value=(desde_min.date(), hasta_max.date()),
+            min_value=desde_min.date(),
+            max_value=hasta_max.date(),
+        )
 
     col1, col2, col3 = st.columns(3)
-    filtro_ubic = col1.selectbox("Filtrar por Ubicación", ["Todas"] + ubicaciones)
-    filtro_item = col2.selectbox("Filtrar por Item", ["Todos"] + items)
-    filtro_subcat = col3.selectbox("Filtrar por Subcategoría", ["Todas"] + subcats)
-
-    df_filtrado = df_hist.copy()
-    if filtro_ubic != "Todas":
-        df_filtrado = df_filtrado[df_filtrado["Ubicación"] == filtro_ubic]
-    if filtro_item != "Todos":
-        df_filtrado = df_filtrado[df_filtrado["Item"] == filtro_item]
-    if filtro_subcat != "Todas":
-        df_filtrado = df_filtrado[df_filtrado["Subcategoría"] == filtro_subcat]
+    filtro_ubic = col1.selectbox("Filtrar por Ubicación", ["Todas"] + opciones["Ubicación"])
+    filtro_item = col2.selectbox("Filtrar por Item", ["Todos"] + opciones["Item"])
+    filtro_subcat = col3.selectbox("Filtrar por Subcategoría", ["Todas"] + opciones["Subcategoría"])
+
+    filtros = {
+        "tipos": tipos,
+        "ubicacion": None if filtro_ubic == "Todas" else filtro_ubic,
+        "item": None if filtro_item == "Todos" else filtro_item,
+        "subcategoria": None if filtro_subcat == "Todas" else filtro_subcat,
+    }
+    if isinstance(rango, (tuple, list)) and len(rango) == 2:
+        filtros["desde"] = rango[0].strftime("%Y-%m-%d")
+        filtros["hasta"] = rango[1].strftime("%Y-%m-%d")
+
+    total = historial_index.contar(**filtros)
+    paginas = max(1, -(-total // POR_PAGINA))
+    pagina = st.number_input(f"Página (de {paginas})", min_value=1, max_value=paginas, value=1) - 1
+    st.caption(f"{total} registros encontrados.")
+    df_filtrado = historial_index.consultar(pagina=pagina, por_pagina=POR_PAGINA, **filtros)
 
     st.dataframe(df_filtrado, use_container_width=True)
 
     st.download_button(
         label="Descargar historial filtrado (Excel)",
-        data=to_excel_bytes(df_filtrado),
+        data=lambda: to_excel_bytes(historial_index.consultar(por_pagina=None, **filtros)),
         file_name="historial_filtrado.xlsx",
         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     )
 
     st.markdown("---")
     st.subheader("Descargar archivos originales:")
+    faltan = len(event_store.pendientes())
+    if faltan:
+        st.caption(
+            f"{faltan} días con movimientos aún sin exportar a Excel; se generan al "
+            "confirmar el cierre del día o al reiniciar la aplicación."
+        )
 
     for tipo, path in CARPETAS.items():
         archivos = glob(os.path.join(path,"*.xlsx"))
         if archivos:
             with st.expander(f"{tipo} ({len(archivos)} archivos)"):
                 for archivo in archivos:
-                    with open(archivo, "rb") as f:
-                        st.download_button(
-                            label=os.path.basename(archivo),
-                            data=f,
-                            file_name=os.path.basename(archivo),
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                        )
\ No newline at end of file
+                    st.download_button(
+                        label=os.path.basename(archivo),
+                        data=archivo_diferido(archivo),
+                        key=archivo,
+                        file_name=os.path.basename(archivo),
+                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                    )
\ No newline at end of file
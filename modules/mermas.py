@@ -0,0 +1,113 @@
+import streamlit as st
+import pandas as pd
+
+from core.mermas import TIPOS, VENTANA_MOVIL, HistorialMermas
+from core.stock import UBICACIONES
+from modules.catalogo import load_catalog
+from utils import diferencias, event_store
+from utils.excel_tools import excel_diferido
+
+OPCIONES_TIPO = {"Apertura y cierre": None, **{f"Sólo {t.lower()}": t for t in TIPOS}}
+MAX_SERIES = 10  # pares que se grafican a la vez
+
+
+def _etiquetas(pares):
+    return [f"{item} · {ubic}" for item, ubic in pares]
+
+
+def _grafico(df, pares):
+    """Columnas ``pares`` de ``df`` con una etiqueta legible por par."""
+    datos = df.loc[:, pares]
+    datos.columns = _etiquetas(pares)
+    return datos
+
+
+def mermas_module():
+    st.title("Análisis de Mermas")
+    st.info(
+        """
+    Analiza las diferencias de las auditorías de apertura y cierre a lo largo del
+    tiempo. Una diferencia negativa es producto que falta: la de apertura cubre la
+    noche y la de cierre el día. Elige un período para ver los productos con más
+    merma, cómo se acumula y su variación en los últimos días auditados.
+    """
+    )
+
+    auditadas = diferencias.leer()
+    if event_store.legado("auditorias_ml"):
+        st.warning(
+            "Algunas auditorías siguen guardadas con los conteos en botellas y no se incluyen. "
+            "Conviértelas a ml desde Auditoría de Apertura o de Cierre."
+        )
+    if auditadas.empty:
+        st.info("No hay auditorías registradas todavía.")
+        return
+    historial = HistorialMermas.de(auditadas)
+    cat = load_catalog()
+
+    primero, ultimo = historial.dias[0].date(), historial.dias[-1].date()
+    col1, col2, col3 = st.columns(3)
+    rango = col1.date_input(
+        "Período", value=(primero, ultimo), min_value=primero, max_value=ultimo
+    )
+    desde, hasta = (rango[0], rango[-1]) if isinstance(rango, (list, tuple)) and rango else (primero, ultimo)
+    tipo = OPCIONES_TIPO[col2.selectbox("Auditorías", list(OPCIONES_TIPO))]
+    ubicacion = col3.selectbox("Ubicación", ["TODAS"] + UBICACIONES)
+
+    # PEORES DIFERENCIAS DEL PERÍODO
+    st.subheader("Productos con más merma")
+    n = st.slider("Cantidad de productos", min_value=5, max_value=100, value=20, step=5)
+    tabla = historial.ventana(desde, hasta, tipo, cat)
+    if ubicacion != "TODAS":
+        tabla = tabla[tabla["Ubicación"] == ubicacion]
+    peores = tabla[tabla["Diferencia total"] < 0].nsmallest(n, "Diferencia total").reset_index(drop=True)
+    total = tabla["Diferencia total"].sum()
+    st.caption(
+        f"Diferencia neta del período: {total:,.0f} ml en {len(tabla)} pares contados; "
+        f"{int((tabla['Diferencia total'] < 0).sum())} con merma."
+    )
+    if peores.empty:
+        st.success("No hay mermas en el período elegido.")
+        return
+    formatos = {
+        "Diferencia total": "{:,.0f}", "Media": "{:,.1f}", "Desvío": "{:,.1f}",
+        "Esperado total": "{:,.0f}", "% del esperado": "{:.2f}", "Diferencia botellas": "{:.2f}",
+    }
+    st.dataframe(
+        peores.style.format(formatos, na_rep="—"), use_container_width=True, hide_index=True
+    )
+    st.download_button(
+        label="Descargar mermas del período (Excel)",
+        data=excel_diferido(tabla.sort_values("Diferencia total").reset_index(drop=True)),
+        file_name=f"mermas_{desde}_{hasta}.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    )
+
+    # EVOLUCIÓN DE LOS PARES ELEGIDOS
+    pares = list(zip(peores["Item"], peores["Ubicación"]))
+    etiquetas = dict(zip(_etiquetas(pares), pares))
+    elegidos = st.multiselect(
+        "Productos a graficar", list(etiquetas), default=list(etiquetas)[:5],
+        max_selections=MAX_SERIES,
+    )
+    if not elegidos:
+        return
+    elegidos = [etiquetas[e] for e in elegidos]
+
+    st.subheader("Merma acumulada (ml)")
+    st.line_chart(_grafico(historial.acumulada(desde, hasta, tipo), elegidos))
+
+    st.subheader("Variación móvil (ml)")
+    ventana = st.number_input(
+        "Días auditados de la ventana", min_value=2, max_value=90, value=VENTANA_MOVIL,
+        help="La media y el desvío de cada día miran hacia atrás esta cantidad de días auditados.",
+    )
+    media, desvio = historial.movil(ventana, tipo)
+    periodo = (media.index >= pd.Timestamp(desde)) & (media.index <= pd.Timestamp(hasta))
+    col_media, col_desvio = st.columns(2)
+    with col_media:
+        st.caption("Media de la diferencia")
+        st.line_chart(_grafico(media[periodo], elegidos))
+    with col_desvio:
+        st.caption("Desvío de la diferencia")
+        st.line_chart(_grafico(desvio[periodo], elegidos))
@@ -3,6 +3,7 @@ import pandas as pd
 import os
 from datetime import datetime
 from utils.excel_tools import to_excel_bytes  # <-- AGREGA ESTA LÍNEA
+from utils import cache, escritor
 from utils.path_utils import PLANTILLAS_DIR
 from modules.catalogo import load_catalog
 
@@ -50,8 +51,8 @@ def plantilla_module():
 
     # Guardar el archivo plantilla, aunque la app permite descargar directo
     try:
-        with pd.ExcelWriter(ruta, engine="xlsxwriter") as writer:
-            df_plantilla.to_excel(writer, index=False)
+        escritor.escribir(ruta, to_excel_bytes(df_plantilla))
+        cache.invalidar(ruta)
     except Exception as e:
         st.error(f"Error guardando plantilla: {e}")
 
@@ -1,59 +1,16 @@
-import os
 import pandas as pd
 import streamlit as st
 
-from utils.excel_tools import to_excel_bytes
-from utils.path_utils import RECETAS_DIR, latest_file
-from modules.catalogo import load_catalog
-
-
-EXPECTED_COLUMNS = [
-    "Producto_vendido",
-    "Ingrediente",
-    "Unidad",
-]
+from core.catalogo import leer_recetas
+from core.recetas import compilar
+from utils.excel_tools import excel_diferido
+from modules.catalogo import load_catalog, mostrar_avisos
 
 
 def load_recetas(catalogo: pd.DataFrame | None = None) -> pd.DataFrame:
     """Carga y valida la hoja de recetas."""
-    path = latest_file(RECETAS_DIR, "recetas")
-    if path and os.path.exists(path):
-        try:
-            df = pd.read_excel(path)
-        except Exception as e:
-            st.error(f"Error cargando recetas.xlsx: {e}")
-            df = pd.DataFrame(columns=EXPECTED_COLUMNS)
-    else:
-        df = pd.DataFrame(columns=EXPECTED_COLUMNS)
-
-    missing = [c for c in EXPECTED_COLUMNS if c not in df.columns]
-    if missing:
-        st.error(f"Recetas incompletas. Faltan columnas: {', '.join(missing)}")
-    df = df.reindex(columns=EXPECTED_COLUMNS)
-
-    if catalogo is not None and not df.empty:
-        ctl_products = set(
-            catalogo[catalogo["Tipo_venta"] == "CTL"]["Item"].dropna()
-        )
-        for prod in df["Producto_vendido"].dropna().unique():
-            if prod not in ctl_products:
-                st.warning(
-                    f"'{prod}' en recetas no está definido como CTL en el catálogo."
-                )
-
-        catalog_items = set(catalogo["Item"].dropna())
-        for ing in df["Ingrediente"].dropna().unique():
-            if ing not in catalog_items:
-                st.warning(
-                    f"Ingrediente '{ing}' no existe en el catálogo."
-                )
-
-        dosis_map = catalogo.set_index("Item")["Dosis_ml"]
-        df["Cantidad_usada"] = df["Ingrediente"].map(dosis_map)
-    else:
-        df["Cantidad_usada"] = None
-
-    df = df[["Producto_vendido", "Ingrediente", "Cantidad_usada", "Unidad"]]
+    df, avisos = leer_recetas(catalogo)
+    mostrar_avisos(avisos)
     return df
 
 
@@ -74,16 +31,34 @@ def recetas_module():
 
     st.download_button(
         label="Descargar archivo de recetas", 
-        data=to_excel_bytes(df_recetas),
+        data=excel_diferido(df_recetas),
         file_name="recetas.xlsx",
         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
     )
 
+    matriz = compilar(df_recetas)
+    if any(matriz.vias):
+        st.subheader("Recetas aplanadas")
+        st.caption(
+            "Cantidad de cada ingrediente de inventario por unidad vendida, con las "
+            "sub-recetas resueltas. 'Vía' indica por qué preparaciones llega."
+        )
+        st.dataframe(matriz.como_tabla(), use_container_width=True)
+
+    if matriz.ingredientes:
+        st.subheader("Trazabilidad de ingredientes")
+        ingrediente = st.selectbox("Ingrediente", matriz.ingredientes)
+        st.dataframe(matriz.trazar(ingrediente), use_container_width=True)
+
     st.info(
         "**Formato requerido:**\n"
         "- Producto_vendido\n"
         "- Ingrediente\n"
         "- Unidad\n"
-        "*(Cantidad_usada se toma automáticamente del catálogo)*"
+        "*(Cantidad_usada se toma automáticamente del catálogo)*\n\n"
+        "Un ingrediente que tiene su propia receta (jarabe, mezcla en lote) se "
+        "resuelve como sub-receta. La columna opcional **Rendimiento** indica "
+        "cuánto rinde su lote, en la unidad de su dosis; si falta, se usa la suma "
+        "de las cantidades de sus ingredientes."
     )
 
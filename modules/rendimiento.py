@@ -0,0 +1,36 @@
+import pandas as pd
+import streamlit as st
+
+from utils import cache, escritor, perf
+
+
+def panel_rendimiento():
+    """Panel opcional de la barra lateral con las mediciones de este rerun."""
+    if not st.sidebar.checkbox("Mostrar rendimiento", key="mostrar_rendimiento"):
+        return
+    registros = perf.registros()
+    with st.sidebar.expander("Rendimiento de esta ejecución", expanded=True):
+        if registros:
+            df = pd.DataFrame(registros)
+            df["operacion"] = [
+                "· " * nivel + op for nivel, op in zip(df["nivel"], df["operacion"])
+            ]
+            df["ms"] = (df["segundos"] * 1000).round(1)
+            st.dataframe(
+                df[["operacion", "ms", "filas", "bytes", "aciertos_cache"]],
+                hide_index=True,
+                use_container_width=True,
+            )
+        else:
+            st.caption("Sin operaciones medidas en esta ejecución.")
+        stats = cache.estadisticas()
+        st.caption(
+            f"Caché: {stats['entradas']} entradas, {stats['bytes'] / 1e6:.1f} MB, "
+            f"aciertos {stats['tasa_aciertos']:.0%}"
+        )
+        cola = escritor.metricas()
+        st.caption(
+            f"Escritor: {cola['en_cola']} en cola, espera media "
+            f"{cola['espera_media_ms']:.1f} ms, escritura p95 {cola['escritura_p95_ms']:.1f} ms"
+        )
+        st.caption(f"Log detallado: {perf.LOG_PATH}")
@@ -1,11 +1,14 @@
 import streamlit as st
 import os
 from glob import glob
-from datetime import datetime
+from datetime import date
 
 from modules.catalogo import load_catalog
-from modules.stock import load_last_cierre, calcular_stock_actual
+from modules.stock import stock_a_fecha
 from utils.pdf_report import generar_pdf_stock
+from utils.excel_tools import archivo_diferido
+from utils import trabajos
+from modules.descargas import mostrar_trabajos, registrar_trabajo
 from utils.path_utils import (
     REPORTES_PDF_DIR,
     AUDITORIA_AP_DIR,
@@ -19,13 +22,13 @@ def _listar_pdfs(patron):
         st.info("No hay reportes disponibles.")
         return
     for archivo in archivos:
-        with open(archivo, "rb") as f:
-            st.download_button(
-                label=os.path.basename(archivo),
-                data=f,
-                file_name=os.path.basename(archivo),
-                mime="application/pdf",
-            )
+        st.download_button(
+            label=os.path.basename(archivo),
+            data=archivo_diferido(archivo),
+            key=archivo,
+            file_name=os.path.basename(archivo),
+            mime="application/pdf",
+        )
 
 
 def _listar_excels(folder):
@@ -34,29 +37,23 @@ def _listar_excels(folder):
         st.info("No hay reportes disponibles.")
         return
     for archivo in archivos:
-        with open(archivo, "rb") as f:
-            st.download_button(
-                label=os.path.basename(archivo),
-                data=f,
-                file_name=os.path.basename(archivo),
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            )
+        st.download_button(
+            label=os.path.basename(archivo),
+            data=archivo_diferido(archivo),
+            key=archivo,
+            file_name=os.path.basename(archivo),
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
 
 
-def _generar_reporte_stock(prefijo):
+def _generar_reporte_stock(prefijo, fecha):
     cat = load_catalog()
-    stock_inicial, _ = load_last_cierre()
-    df_stock = calcular_stock_actual(cat, stock_inicial)
-    nombre = f"{prefijo}_{datetime.today().strftime('%Y-%m-%d')}.pdf"
-    ruta = os.path.join(REPORTES_PDF_DIR, nombre)
-    pdf_bytes = generar_pdf_stock(df_stock, ruta)
-    st.success(f"Reporte {prefijo} generado.")
-    st.download_button(
-        label="Descargar reporte recién generado",
-        data=pdf_bytes,
-        file_name=nombre,
-        mime="application/pdf",
-    )
+    df_stock = stock_a_fecha(fecha, cat)
+    nombre = f"{prefijo}_{fecha.strftime('%Y-%m-%d')}.pdf"
+    # El PDF se genera en segundo plano; la página sigue respondiendo
+    trabajo_id = trabajos.enviar(generar_pdf_stock, df_stock, nombre)
+    registrar_trabajo("trabajos_reportes", trabajo_id)
+    st.success(f"Reporte {prefijo} en preparación.")
 
 
 def reportes_module():
@@ -92,12 +89,20 @@ def reportes_module():
         )
 
     with tab_semanal:
+        fecha_semanal = st.date_input(
+            "Stock al", value=date.today(), max_value=date.today(), key="corte_semanal"
+        )
         if st.button("Generar reporte semanal de stock"):
-            _generar_reporte_stock("reporte_semanal")
+            _generar_reporte_stock("reporte_semanal", fecha_semanal)
         _listar_pdfs("reporte_semanal_*.pdf")
 
     with tab_mensual:
+        fecha_mensual = st.date_input(
+            "Stock al", value=date.today(), max_value=date.today(), key="corte_mensual"
+        )
         if st.button("Generar reporte mensual de stock"):
-            _generar_reporte_stock("reporte_mensual")
+            _generar_reporte_stock("reporte_mensual", fecha_mensual)
         _listar_pdfs("reporte_mensual_*.pdf")
 
+    st.subheader("Reportes en preparación")
+    mostrar_trabajos("trabajos_reportes")
@@ -1,8 +1,12 @@
 import streamlit as st
 import pandas as pd
 import os
-from utils.excel_tools import to_excel_bytes
-from utils.unit_conversion import to_bottles
+from datetime import date
+from utils.excel_tools import excel_diferido
+from utils import acumulados, consumo, event_store, perf, trabajos
+from core.pronostico import PLAZO_REPOSICION, agregar_pronostico
+from core.ventas import corregir_botellas
+from core.stock import UBICACIONES, calcular_stock, stock_desde_saldo
 from utils.path_utils import (
     ENTRADAS_DIR,
     TRANSFERENCIAS_DIR,
@@ -10,11 +14,11 @@ from utils.path_utils import (
     CIERRES_CONFIRMADOS_DIR,
     AUDITORIA_AP_DIR,
     AUDITORIA_CI_DIR,
-    REPORTES_PDF_DIR,
     latest_file,
 )
 from utils.pdf_report import generar_pdf_stock
 from modules.catalogo import load_catalog
+from modules.descargas import mostrar_trabajos, registrar_trabajo
 
 ENTRADAS_FOLDER = ENTRADAS_DIR
 TRANSFERENCIAS_FOLDER = TRANSFERENCIAS_DIR
@@ -23,127 +27,97 @@ CIERRES_CONFIRMADOS_FOLDER = CIERRES_CONFIRMADOS_DIR
 AUDITORIA_AP_FOLDER = AUDITORIA_AP_DIR
 AUDITORIA_CI_FOLDER = AUDITORIA_CI_DIR
 
-LOW_STOCK_THRESHOLD = 3  # botellas
-UBICACIONES = ["Almacén", "Barra", "Vinera"]
+LOW_STOCK_THRESHOLD = 3  # botellas, para lo que no tiene punto de reorden
 
 
 def load_all_entradas():
-    archivos = [f for f in os.listdir(ENTRADAS_FOLDER) if f.endswith('.xlsx')]
-    dfs = []
-    for f in archivos:
-        try:
-            df = pd.read_excel(os.path.join(ENTRADAS_FOLDER, f))
-            dfs.append(df)
-        except:  # noqa: E722
-            pass
-    if dfs:
-        return pd.concat(dfs, ignore_index=True)
-    else:
-        return pd.DataFrame(columns=["Fecha", "Item", "Subcategoría", "Ubicación destino", "Cantidad"])
+    return event_store.leer("entradas")
 
 
 def load_all_transferencias():
-    archivos = [f for f in os.listdir(TRANSFERENCIAS_FOLDER) if f.endswith('.xlsx')]
-    dfs = []
-    for f in archivos:
-        try:
-            df = pd.read_excel(os.path.join(TRANSFERENCIAS_FOLDER, f))
-            dfs.append(df)
-        except:  # noqa: E722
-            pass
-    if dfs:
-        return pd.concat(dfs, ignore_index=True)
-    else:
-        return pd.DataFrame(columns=["Fecha", "Item", "Desde", "Hacia", "Cantidad"])
+    return event_store.leer("transferencias")
 
 
 def load_all_ventas():
-    archivos = [f for f in os.listdir(VENTAS_PROCESADAS_FOLDER) if f.endswith('.xlsx')]
-    dfs = []
-    for f in archivos:
-        try:
-            df = pd.read_excel(os.path.join(VENTAS_PROCESADAS_FOLDER, f))
-            dfs.append(df)
-        except:  # noqa: E722
-            pass
-    if dfs:
-        return pd.concat(dfs, ignore_index=True)
-    else:
-        return pd.DataFrame(
-            columns=[
-                "Fecha",
-                "Producto vendido",
-                "Item usado",
-                "Subcategoría",
-                "Cantidad teórica consumida",
-                "Ubicación de salida",
-            ]
-        )
+    return event_store.leer("ventas_procesadas").drop(columns=["Unidad"])
 
 
 def load_last_cierre():
-    archivos = [f for f in os.listdir(CIERRES_CONFIRMADOS_FOLDER) if f.endswith('.xlsx')]
-    if not archivos:
+    df, archivo = event_store.leer_ultimo("cierres_confirmados")
+    if archivo is None:
         return pd.DataFrame(columns=["Item", "Ubicación", "Cantidad"]), False
-    archivos_sorted = sorted(archivos, reverse=True)
-    df = pd.read_excel(os.path.join(CIERRES_CONFIRMADOS_FOLDER, archivos_sorted[0]))
     return df, True
 
 
+@perf.medido("stock.calcular")
 def calcular_stock_actual(cat=None, stock_inicial=None):
-    """Calcula el stock actual por producto y ubicación y retorna un DataFrame."""
+    """Calcula el stock actual por producto y ubicación y retorna un DataFrame.
+
+    Parte del último cierre confirmado y suma todos los movimientos del
+    almacén (ver ``core.stock.calcular_stock``).
+    """
     if cat is None:
         cat = load_catalog()
     if stock_inicial is None:
         stock_inicial, _ = load_last_cierre()
+    return calcular_stock(
+        cat, stock_inicial, load_all_entradas(), load_all_transferencias(), load_all_ventas()
+    )
+
+
+@perf.medido("stock.desde_saldos")
+def stock_desde_saldos(cat=None):
+    """Stock actual leído del saldo incremental persistido.
+
+    Devuelve el mismo formato que ``calcular_stock_actual`` sin recorrer el
+    historial de movimientos.
+    """
+    if cat is None:
+        cat = load_catalog()
+    return stock_desde_saldo(cat, event_store.leer_saldos())
+
+
+@perf.medido("stock.al")
+def stock_al(fecha, cat=None):
+    """Stock al cierre de ``fecha`` con el mismo formato que ``stock_desde_saldos``.
+
+    Lee los movimientos acumulados por día del almacén, sin recorrer el
+    historial.
+    """
+    if cat is None:
+        cat = load_catalog()
+    return stock_desde_saldo(cat, acumulados.leer_saldos_al(fecha.strftime("%Y-%m-%d")))
+
+
+def stock_a_fecha(fecha, cat=None):
+    """Stock actual si ``fecha`` es hoy o posterior; si no, el de esa fecha."""
+    if fecha >= date.today():
+        return stock_desde_saldos(cat)
+    return stock_al(fecha, cat)
 
-    entradas = load_all_entradas()
-    transferencias = load_all_transferencias()
-    ventas = load_all_ventas()
-
-    cat_filtrado = cat[~cat["Item"].str.contains(r"(?i)c[oó]ctel(?:es)?|cocktail", na=False)]
-    items = cat_filtrado["Item"].unique()
-
-    stock = []
-    for item in items:
-        for ubic in UBICACIONES:
-            cantidad = 0.0
-            if not stock_inicial.empty:
-                match = stock_inicial[(stock_inicial["Item"] == item) & (stock_inicial["Ubicación"] == ubic)]
-                if not match.empty:
-                    cantidad = (
-                        match.iloc[0]["Cantidad"]
-                        if "Cantidad" in match.columns
-                        else match.iloc[0].get("Físico Cierre", 0)
-                    )
-            if not entradas.empty:
-                entradas_sum = entradas[(entradas["Item"] == item) & (entradas["Ubicación destino"] == ubic)]["Cantidad"].sum()
-                cantidad += entradas_sum
-            if not transferencias.empty:
-                transfer_in = transferencias[(transferencias["Item"] == item) & (transferencias["Hacia"] == ubic)]["Cantidad"].sum()
-                transfer_out = transferencias[(transferencias["Item"] == item) & (transferencias["Desde"] == ubic)]["Cantidad"].sum()
-                cantidad += transfer_in - transfer_out
-            if ubic in ["Barra", "Vinera"] and not ventas.empty:
-                consumo = ventas[(ventas["Item usado"] == item) & (ventas["Ubicación de salida"] == ubic)]["Cantidad teórica consumida"].sum()
-                cantidad -= consumo
-
-            stock_botellas = to_bottles(item, cantidad, cat)
-            subcat = (
-                cat_filtrado[cat_filtrado["Item"] == item]["Subcategoría"].iloc[0]
-                if not cat_filtrado[cat_filtrado["Item"] == item].empty
-                else None
-            )
-            stock.append({
-                "Producto": item,
-                "Subcategoría": subcat,
-                "Ubicación": ubic,
-                "Stock Botellas": round(stock_botellas, 2) if stock_botellas is not None else None,
-            })
-
-    df_stock = pd.DataFrame(stock)
-    df_stock = df_stock[df_stock["Stock Botellas"].notna()]
-    df_stock["Stock Botellas"] = df_stock["Stock Botellas"].round(2)
-    return df_stock
+
+def corregir_ventas_bot(cat):
+    """Pasa a ml las ventas BOT registradas en botellas y reconstruye el saldo.
+
+    Sólo se convierten los días guardados antes de la corrección (los que el
+    almacén tiene como legado de ``ventas_bot_ml``). Se reemplazan en una sola
+    transacción que además deja la conversión como aplicada, así que no se
+    repite; el saldo, los acumulados y el consumo por día se regeneran después
+    desde el historial. Devuelve la cantidad de filas corregidas.
+    """
+    archivos = [archivo for _, archivo in event_store.legado("ventas_bot_ml")]
+    ventas = event_store.leer("ventas_procesadas", archivos=archivos, incluir_origen=True)
+    registros, filas = [], 0
+    prefijo = event_store.TABLAS["ventas_procesadas"]["prefijo"]
+    for archivo, dia in ventas.groupby("_archivo", sort=True):
+        corregido, cambiadas = corregir_botellas(dia.drop(columns="_archivo"), cat)
+        if cambiadas:
+            fecha = archivo.replace(f"{prefijo}_", "", 1).replace(".xlsx", "")
+            registros.append(("ventas_procesadas", corregido, fecha, "reemplazar"))
+            filas += cambiadas
+    event_store.migrar("ventas_bot_ml", registros)
+    event_store.verificar_saldos(reconstruir=True)
+    return filas
 
 
 def obtener_ultimo_movimiento():
@@ -181,7 +155,10 @@ def stock_module():
     st.info(
         """
     Visualiza el stock actual considerando todos los movimientos registrados a la fecha.
-    El cálculo parte del último cierre confirmado.
+    El cálculo parte del último cierre confirmado. Elige una fecha anterior para ver
+    el stock al cierre de ese día.
+    El consumo diario es una media exponencial de los últimos días con ventas; con
+    él se calculan los días de cobertura y el punto de reorden de cada producto.
     """
     )
 
@@ -189,14 +166,27 @@ def stock_module():
     if cat.empty or "Item" not in cat.columns:
         st.warning("No se encontró el catálogo o falta la columna 'Item'.")
         return
-    stock_inicial, cierre_encontrado = load_last_cierre()
+    cierre_encontrado = bool(event_store.archivos("cierres_confirmados"))
     if not cierre_encontrado:
         st.warning(
             "No se encontró un cierre confirmado. El stock se calcula desde cero."
         )
+    elif any(tabla == "cierres_confirmados" for tabla, _ in event_store.legado("auditorias_ml")):
+        st.warning(
+            "Hay cierres confirmados guardados con el conteo en botellas: el stock que parte "
+            "de ellos no es correcto hasta convertirlos a ml desde Auditoría de Cierre."
+        )
     ult_mov = obtener_ultimo_movimiento()
     st.caption(f"Último movimiento registrado: {ult_mov}")
-    df_stock = calcular_stock_actual(cat, stock_inicial)
+    fecha_corte = st.date_input("Stock al", value=date.today(), max_value=date.today())
+    df_stock = stock_a_fecha(fecha_corte, cat)
+    nombre = "stock_actual" if fecha_corte >= date.today() else f"stock_al_{fecha_corte}"
+    if fecha_corte >= date.today():
+        plazo = st.number_input(
+            "Días de reposición", min_value=1, max_value=60, value=PLAZO_REPOSICION,
+            help="Días entre hacer el pedido y tener las botellas en la ubicación.",
+        )
+        df_stock = agregar_pronostico(df_stock, consumo.leer_tasas(), cat, plazo=plazo)
     ubicaciones = UBICACIONES
 
     # FILTRO POR UBICACIÓN
@@ -211,19 +201,20 @@ def stock_module():
             df_stock["Producto"].str.contains(search_term, case=False, na=False)
         ]
 
-    # ESTADO SEGÚN STOCK
-    def evaluar_estado(cant):
+    # ESTADO SEGÚN STOCK (y el punto de reorden, si lo hay)
+    def evaluar_estado(cant, reorden):
         if pd.isna(cant):
             return ""
         if cant < 0:
             return "⚠️ Negativo"
         if cant == 0:
             return "🔴 Agotado"
-        if cant <= LOW_STOCK_THRESHOLD:
+        if cant <= (LOW_STOCK_THRESHOLD if pd.isna(reorden) else reorden):
             return "🟡 Bajo stock"
         return "✅ OK"
 
-    df_stock["Estado"] = df_stock["Stock Botellas"].apply(evaluar_estado)
+    reorden = df_stock.get("Punto de reorden", pd.Series(float("nan"), index=df_stock.index))
+    df_stock["Estado"] = [evaluar_estado(c, r) for c, r in zip(df_stock["Stock Botellas"], reorden)]
 
     # ORDEN ASCENDENTE POR DEFECTO
     df_stock = df_stock.sort_values(by="Stock Botellas", ascending=True)
@@ -242,23 +233,53 @@ def stock_module():
             return ["background-color: #fff5ba"] * len(row)
         return [""] * len(row)
 
+    formatos = {
+        "Stock Botellas": "{:.2f}", "Consumo diario": "{:.2f}",
+        "Días de cobertura": "{:.1f}", "Punto de reorden": "{:.2f}",
+    }
+    formatos = {c: f for c, f in formatos.items() if c in df_stock.columns}
     st.dataframe(
-        df_stock.style.format({"Stock Botellas": "{:.2f}"}).apply(color_estado, axis=1),
+        df_stock.style.format(formatos, na_rep="—").apply(color_estado, axis=1),
         use_container_width=True,
     )
 
-    pdfout = "stock_actual.pdf"
-    pdf_bytes = generar_pdf_stock(df_stock, os.path.join(REPORTES_PDF_DIR, pdfout))
-    st.download_button(
-        label="Descargar Stock Actual (PDF)",
-        data=pdf_bytes,
-        file_name=pdfout,
-        mime="application/pdf",
-    )
+    # El PDF se genera en segundo plano; el Excel sólo al pulsar la descarga
+    if st.button("Generar Stock Actual (PDF)"):
+        registrar_trabajo(
+            "trabajos_stock",
+            # El stock depende de los filtros: cada pedido tiene su archivo
+            trabajos.enviar(generar_pdf_stock, df_stock, f"{nombre}.pdf", unico=True),
+        )
+    mostrar_trabajos("trabajos_stock")
 
     st.download_button(
         label="Descargar Stock Actual (Excel)",
-        data=to_excel_bytes(df_stock),
-        file_name="stock_actual.xlsx",
+        data=excel_diferido(df_stock),
+        file_name=f"{nombre}.xlsx",
         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
     )
+
+    with st.expander("Verificación del saldo"):
+        st.caption(
+            "El stock se lee de un saldo que se actualiza con cada movimiento. "
+            "Aquí puedes compararlo con un recálculo completo del historial."
+        )
+        if st.button("Verificar saldo"):
+            diferencias = event_store.verificar_saldos()
+            if diferencias.empty:
+                st.success("El saldo coincide con el recálculo completo.")
+            else:
+                st.warning(f"{len(diferencias)} pares difieren del recálculo completo.")
+                st.dataframe(diferencias, use_container_width=True)
+        if st.button("Reconstruir saldo desde cero"):
+            event_store.verificar_saldos(reconstruir=True)
+            st.success("Saldo reconstruido a partir del historial.")
+        if event_store.legado("ventas_bot_ml"):
+            st.caption(
+                "Las ventas de botellas (BOT) registradas antes de pasarlas a ml restaban "
+                "botellas de un saldo en ml. Corregirlas reemplaza esos días y reconstruye "
+                "el saldo; se hace una sola vez."
+            )
+            if st.button("Corregir ventas BOT en botellas"):
+                filas = corregir_ventas_bot(cat)
+                st.success(f"{filas} ventas corregidas; saldo reconstruido a partir del historial.")
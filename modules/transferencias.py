@@ -1,27 +1,16 @@
 import streamlit as st
 import pandas as pd
-import os
-from utils.excel_tools import to_excel_bytes  # <-- AGREGA ESTA LÍNEA
+from utils.excel_tools import excel_diferido  # <-- AGREGA ESTA LÍNEA
 from utils.path_utils import TRANSFERENCIAS_DIR
+from utils import event_store
 
 TRANSFERENCIAS_FOLDER = TRANSFERENCIAS_DIR
 
 def load_all_transferencias():
     """Carga y concatena todas las transferencias registradas (manuales y automáticas)."""
-    archivos = [f for f in os.listdir(TRANSFERENCIAS_FOLDER) if f.endswith('.xlsx')]
-    dfs = []
-    for f in archivos:
-        try:
-            df = pd.read_excel(os.path.join(TRANSFERENCIAS_FOLDER, f))
-            df['OrigenArchivo'] = f
-            dfs.append(df)
-        except Exception as e:
-            st.warning(f"Error leyendo {f}: {e}")
-    if dfs:
-        df_tot = pd.concat(dfs, ignore_index=True)
-        return df_tot
-    else:
-        return pd.DataFrame(columns=["Fecha","Item","Desde","Hacia","Cantidad","OrigenArchivo"])
+    df = event_store.leer("transferencias", incluir_origen=True)
+    df = df.rename(columns={"_archivo": "OrigenArchivo"})
+    return df[[c for c in df.columns if c != "OrigenArchivo"] + ["OrigenArchivo"]]
 
 def transferencias_module():
     st.title("Historial de Transferencias Internas")
@@ -56,7 +45,7 @@ def transferencias_module():
 
     st.download_button(
         label="Descargar transferencias filtradas (Excel)",
-        data=to_excel_bytes(filtro_df),
+        data=excel_diferido(filtro_df),
         file_name="transferencias_filtradas.xlsx",
         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     )
\ No newline at end of file
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from datetime import datetime
 
 import pandas as pd
@@ -6,123 +7,162 @@ import streamlit as st
 
 from utils.excel_tools import to_excel_bytes
 from utils.path_utils import VENTAS_PROCESADAS_DIR
+from utils import alias_pos, event_store
+from core.claves import IndiceProductos, como_alias
+from core import lote
+from core.pos import leer_bloques, primeras_filas
+from core.ventas import (
+    CANTIDAD_NAMES,
+    MUESTRA_FILAS,
+    PRODUCTO_NAMES,
+    SUBCAT_NAMES,
+    detectar_columna,
+    procesar_ventas_por_bloques,
+)
 from modules.catalogo import load_catalog
 from modules.recetas import load_recetas
 
 
 VENTAS_PROCESADAS_FOLDER = VENTAS_PROCESADAS_DIR
-
-PRODUCTO_NAMES = [
-    "producto vendido",
-    "item vendido",
-    "item",
-    "producto",
-    "descripcion",
-    "descripción",
-]
-
-SUBCAT_NAMES = [
-    "subcategoria",
-    "subcategoría",
-    "subcategory",
-    "sub cat",
-    "subcat",
-    "línea",
-    "linea",
-]
-
-CANTIDAD_NAMES = [
-    "cantidad",
-    "cantidad vendida",
-    "c. vendida",
-    "unidades",
-    "qty",
-]
+SIN_CATALOGO = "No está en el catálogo"
 
 
 def seleccionar_columna(df: pd.DataFrame, label: str, posibles: list[str]) -> str:
-    posibles_lower = [p.lower() for p in posibles]
-    detected = next(
-        (c for c in df.columns if c.strip().lower() in posibles_lower), None
-    )
+    detected = detectar_columna(df.columns, posibles)
     index = df.columns.get_loc(detected) if detected in df.columns else 0
     return st.selectbox(label, df.columns, index=index)
 
 
-def procesar_ventas(
-    df_ventas: pd.DataFrame,
-    prod_col: str,
-    subcat_col: str,
-    cant_col: str | None,
-    catalogo: pd.DataFrame,
-    recetas: pd.DataFrame,
-    fecha: datetime,
-) -> pd.DataFrame:
-    resultado: list[dict] = []
-
-    for _, row in df_ventas.iterrows():
-        nombre = str(row[prod_col]).strip()
-        subcat = str(row[subcat_col]).strip()
-        cantidad = row[cant_col] if cant_col else 1
-
-        match = catalogo[
-            (catalogo["Nombre"] == nombre) & (catalogo["Subcategoría"] == subcat)
-        ]
-        if match.empty:
-            st.warning(f"Producto '{nombre}' / '{subcat}' no está en el catálogo. Se omite.")
-            continue
-
-        tipo = match.iloc[0]["Tipo_venta"]
-        unidad = match.iloc[0]["Unidad"]
-
-        if tipo == "CTL":
-            receta = recetas[recetas["Producto_vendido"] == nombre]
-            if receta.empty:
-                st.warning(f"No hay receta para '{nombre}'. Se omite.")
-                continue
-            for _, ing in receta.iterrows():
-                resultado.append(
-                    {
-                        "Fecha": fecha,
-                        "Producto_vendido": nombre,
-                        "Ingrediente": ing["Ingrediente"],
-                        "Unidad": ing["Unidad"],
-                        "Cantidad_consumida": ing["Cantidad_usada"] * cantidad,
-                    }
-                )
-        elif tipo == "BOT":
-            resultado.append(
-                {
-                    "Fecha": fecha,
-                    "Producto_vendido": nombre,
-                    "Ingrediente": nombre,
-                    "Unidad": unidad,
-                    "Cantidad_consumida": cantidad,
-                }
+def resolver_sin_catalogo(indice: IndiceProductos, archivo_id) -> bool:
+    """Tabla para asignar en bloque los productos del POS sin catálogo.
+
+    Las asignaciones se guardan como alias y valen para los próximos
+    archivos. Devuelve True si se guardaron (hay que volver a procesar).
+    """
+    pendientes = st.session_state.get("ventas_sin_catalogo")
+    if pendientes is None or pendientes[0] != archivo_id or pendientes[1].empty:
+        return False
+    st.subheader("Productos sin catálogo")
+    st.caption(
+        "Elige el producto del catálogo que corresponde a cada uno. Se guardan como "
+        "alias y se usan en todos los archivos siguientes. Las sugerencias vienen "
+        "precargadas: revísalas antes de guardar."
+    )
+    tabla = pendientes[1][["Producto", "Subcategoría", "Líneas"]].copy()
+    tabla["Producto del catálogo"] = [
+        indice.sugerir(p, s) for p, s in zip(tabla["Producto"], tabla["Subcategoría"])
+    ]
+    editada = st.data_editor(
+        tabla,
+        column_config={
+            "Producto del catálogo": st.column_config.SelectboxColumn(options=indice.etiquetas()),
+        },
+        disabled=["Producto", "Subcategoría", "Líneas"],
+        hide_index=True,
+        use_container_width=True,
+        key=f"alias_{archivo_id}",
+    )
+    elegidas = editada.dropna(subset=["Producto del catálogo"])
+    if not st.button(f"Guardar {len(elegidas)} alias y volver a procesar", disabled=elegidas.empty):
+        return False
+    destinos = dict(zip(indice.etiquetas(), zip(indice.catalogo["Nombre"], indice.catalogo["Subcategoría"])))
+    elegidas = elegidas.assign(
+        Nombre=[destinos[e][0] for e in elegidas["Producto del catálogo"]],
+        **{"Subcategoría_catálogo": [destinos[e][1] for e in elegidas["Producto del catálogo"]]},
+    )
+    try:
+        alias_pos.guardar(como_alias(elegidas))
+    except Exception as e:
+        st.error(f"Error guardando alias: {e}")
+        return False
+    del st.session_state["ventas_sin_catalogo"]
+    return True
+
+
+def ventas_lote(catalogo, recetas, indice, alias):
+    """Varios archivos del POS (o un zip) de distintos días, en paralelo."""
+    archivos = st.file_uploader(
+        "Selecciona los archivos de ventas (o un zip)...",
+        type=["xlsx", "csv", "zip"],
+        accept_multiple_files=True,
+    )
+    ubicacion = st.selectbox("Ubicación de salida", ["Barra", "Vinera"], key="lote_ubicacion")
+    if not archivos:
+        return
+
+    lote_id = tuple(getattr(a, "file_id", a.name) for a in archivos)
+    reprocesar = st.session_state.pop("ventas_reprocesar", None) == lote_id
+    if st.button("Procesar lote") or reprocesar:
+        with tempfile.TemporaryDirectory(prefix="lote_pos_") as carpeta:
+            rutas = []
+            for i, archivo in enumerate(archivos):
+                ruta = os.path.join(carpeta, str(i), os.path.basename(archivo.name))
+                os.makedirs(os.path.dirname(ruta))
+                with open(ruta, "wb") as f:
+                    f.write(archivo.getvalue())
+                rutas.append(ruta)
+            try:
+                por_fecha, errores = lote.agrupar_por_fecha(lote.expandir(rutas, carpeta))
+            except Exception as e:
+                st.error(f"Error leyendo los archivos: {e}")
+                return
+            n = sum(len(r) for r in por_fecha.values())
+            with st.spinner(f"Procesando {n} archivos de {len(por_fecha)} días..."):
+                dias = lote.procesar(por_fecha, catalogo, recetas, ubicacion, alias)
+            errores += [
+                f"{d['fecha']}: {e}".replace(carpeta + os.sep, "") for d in dias for e in d["errores"]
+            ]
+
+        por_dia, consumo, omitidos = lote.resumen(dias)
+        st.dataframe(por_dia, hide_index=True, use_container_width=True)
+        if errores:
+            st.error(
+                "No se registró ningún día. Corrige o quita estos archivos y vuelve a procesar:\n"
+                + "\n".join(f"- {e}" for e in errores)
+            )
+        elif dias:
+            registros = [
+                ("ventas_procesadas", d["ventas"], d["fecha"], "reemplazar")
+                for d in dias if d["ventas"] is not None and not d["ventas"].empty
+            ]
+            try:
+                guardados = event_store.guardar_varios(registros)
+            except Exception as e:
+                st.error(f"Error guardando ventas procesadas: {e}")
+                return
+            st.success(f"{len(guardados)} días registrados juntos: {', '.join(guardados)}")
+
+        if not consumo.empty:
+            st.subheader("Consumo combinado")
+            st.dataframe(consumo, use_container_width=True)
+            st.download_button(
+                label="Descargar consumo combinado",
+                data=to_excel_bytes(consumo),
+                file_name=f"consumo_{por_dia['Fecha'].min()}_a_{por_dia['Fecha'].max()}.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             )
-        elif tipo == "TRG":
-            dosis = match.iloc[0]["Dosis_ml"]
-            resultado.append(
-                {
-                    "Fecha": fecha,
-                    "Producto_vendido": nombre,
-                    "Ingrediente": nombre,
-                    "Unidad": "ml",
-                    "Cantidad_consumida": dosis * cantidad,
-                }
+        if not omitidos.empty:
+            st.warning(
+                f"{int(omitidos['Líneas'].sum())} líneas de venta se omitieron "
+                f"({len(omitidos)} productos). Revisa el resumen:"
             )
-        else:
-            st.warning(f"Tipo_venta desconocido para '{nombre}'. Se omite.")
+            st.dataframe(omitidos, use_container_width=True)
+        st.session_state["ventas_sin_catalogo"] = (
+            lote_id, omitidos[omitidos["Motivo"] == SIN_CATALOGO]
+        )
 
-    return pd.DataFrame(resultado)
+    if resolver_sin_catalogo(indice, lote_id):
+        st.session_state["ventas_reprocesar"] = lote_id
+        st.rerun()
 
 
 def ventas_module():
     st.title("Procesador de Ventas")
     st.info(
-        """Sube el Excel del POS (ventas del día). El sistema usará el catálogo y
-        las recetas para calcular el consumo teórico de inventario. La identificación
-        de productos se realiza exclusivamente por Nombre y Subcategoría."""
+        """Sube el Excel (o CSV) del POS con las ventas del día. El sistema usará el
+        catálogo y las recetas para calcular el consumo teórico de inventario. La
+        identificación de productos se realiza exclusivamente por Nombre y Subcategoría.
+        El archivo se procesa por bloques, así que puede ser muy grande."""
     )
 
     catalogo = load_catalog()
@@ -131,20 +171,30 @@ def ventas_module():
         return
 
     recetas = load_recetas(catalogo)
+    alias = alias_pos.leer()
+    indice = IndiceProductos.de(catalogo, alias)
+
+    modo = st.radio("Modo", ["Un archivo", "Varios días (lote)"], horizontal=True)
+    if modo != "Un archivo":
+        st.caption(
+            "La fecha de cada archivo se toma de su nombre (p. ej. ventas_2024-01-31.xlsx) "
+            "o de su columna Fecha. Los archivos de una misma fecha se suman y todos los "
+            "días se registran juntos: si uno falla, no se registra ninguno."
+        )
+        ventas_lote(catalogo, recetas, indice, alias)
+        return
 
     fecha = st.date_input("Selecciona la fecha de las ventas", value=datetime.today())
-    archivo = st.file_uploader("Selecciona archivo Excel de ventas...", type=["xlsx"])
+    archivo = st.file_uploader("Selecciona archivo de ventas...", type=["xlsx", "csv"])
 
     if archivo:
         try:
-            # La primera fila del archivo generado por el POS viene vacía,
-            # por lo que se usa header=1 para ignorarla y tomar los nombres
-            # de las columnas de la segunda fila.
-            df_ventas = pd.read_excel(archivo, header=1)
+            df_ventas = primeras_filas(archivo, MUESTRA_FILAS)
         except Exception as e:
             st.error(f"Error leyendo archivo de ventas: {e}")
             return
 
+        st.caption(f"Vista previa: primeras {len(df_ventas)} líneas del archivo.")
         st.dataframe(df_ventas)
 
         prod_col = seleccionar_columna(
@@ -159,18 +209,41 @@ def ventas_module():
         if cant_col == "(ninguna)":
             cant_col = None
 
-        if st.button("Procesar ventas"):
-            df_proc = procesar_ventas(
-                df_ventas, prod_col, subcat_col, cant_col, catalogo, recetas, fecha
+        ubicacion = st.selectbox("Ubicación de salida", ["Barra", "Vinera"])
+
+        archivo_id = getattr(archivo, "file_id", archivo.name)
+        reprocesar = st.session_state.pop("ventas_reprocesar", None) == archivo_id
+        if st.button("Procesar ventas") or reprocesar:
+            try:
+                df_proc, df_omitidos, df_muestra, lineas = procesar_ventas_por_bloques(
+                    leer_bloques(archivo), prod_col, subcat_col, cant_col,
+                    indice, recetas, fecha,
+                )
+            except Exception as e:
+                st.error(f"Error leyendo archivo de ventas: {e}")
+                return
+            st.session_state["ventas_sin_catalogo"] = (
+                archivo_id, df_omitidos[df_omitidos["Motivo"] == SIN_CATALOGO]
             )
+            if df_muestra is not None and len(df_muestra) < lineas:
+                st.caption(f"{lineas} líneas procesadas. Muestra al azar de {len(df_muestra)}:")
+                st.dataframe(df_muestra)
+            if not df_omitidos.empty:
+                st.warning(
+                    f"{int(df_omitidos['Líneas'].sum())} líneas de venta se omitieron "
+                    f"({len(df_omitidos)} productos). Revisa el resumen:"
+                )
+                st.dataframe(df_omitidos, use_container_width=True)
             if df_proc.empty:
                 st.warning("No se generó consumo. Revisa los datos.")
             else:
-                output_file = f"ventas_procesadas_{fecha.strftime('%Y-%m-%d')}.xlsx"
-                out_path = os.path.join(VENTAS_PROCESADAS_FOLDER, output_file)
                 try:
-                    with pd.ExcelWriter(out_path, engine="xlsxwriter") as writer:
-                        df_proc.to_excel(writer, index=False)
+                    output_file = event_store.guardar(
+                        "ventas_procesadas",
+                        df_proc.assign(**{"Ubicación de salida": ubicacion}),
+                        fecha.strftime('%Y-%m-%d'),
+                        modo="reemplazar",
+                    )
                 except Exception as e:
                     st.error(f"Error guardando ventas procesadas: {e}")
                     return
@@ -183,3 +256,7 @@ def ventas_module():
                     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                 )
 
+        if resolver_sin_catalogo(indice, archivo_id):
+            st.session_state["ventas_reprocesar"] = archivo_id
+            st.rerun()
+
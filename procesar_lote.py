@@ -0,0 +1,218 @@
+"""Procesa ventas del POS y auditorías de un rango de fechas sin la interfaz.
+
+Busca en ``--pos`` las exportaciones del POS (Excel, CSV o zip) y en
+``--conteos`` las planillas de conteo de apertura y cierre. Las
+exportaciones se asocian a su fecha como en la carga por lotes de la app
+(``core.lote``: por el nombre o por el contenido) y las de una misma fecha,
+p. ej. de varias terminales, se suman en un solo día. Los conteos deben
+llevar la fecha en el nombre y decir además "apertura" o "cierre". Los
+archivos se leen y se calcula su consumo en paralelo; luego los días se
+concilian y registran en orden de fecha, igual que al cargarlos desde la
+app, y al final se materializan los Excel::
+
+    python procesar_lote.py --desde 2024-01-01 --hasta 2024-01-31 \\
+        --pos ~/exportaciones_pos --conteos ~/conteos
+
+Con ``--simular`` sólo se informa lo que se registraría.
+"""
+import argparse
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from core import lote
+from core.auditorias import COLUMNAS_REQUISICION, UBICACIONES
+from core.catalogo import leer_catalogo, leer_recetas
+from core.dia import conciliar_dia, leer_dia
+from utils import alias_pos, event_store
+from utils.path_utils import asegurar_estructura
+
+
+def _rutas(carpeta):
+    if not carpeta or not os.path.isdir(carpeta):
+        return []
+    return [os.path.join(carpeta, nombre) for nombre in sorted(os.listdir(carpeta))]
+
+
+def _conteos_por_fecha(carpeta, palabra, fechas, errores):
+    """Conteos de ``carpeta`` con ``palabra`` en el nombre, por la fecha del nombre.
+
+    Una fecha con más de un conteo queda en ``errores`` (fecha -> mensajes)
+    y sin conteo: no hay forma segura de elegir uno.
+    """
+    encontrados = {}
+    for ruta in _rutas(carpeta):
+        nombre = os.path.basename(ruta)
+        if nombre.startswith((".", "~$")) or not nombre.lower().endswith(".xlsx"):
+            continue
+        fecha = lote.fecha_de_nombre(nombre)
+        if palabra in nombre.lower() and fecha in fechas:
+            encontrados.setdefault(fecha, []).append(ruta)
+    for fecha, rutas in encontrados.items():
+        if len(rutas) > 1:
+            errores.setdefault(fecha, []).append(
+                f"hay {len(rutas)} conteos de {palabra}: "
+                + ", ".join(os.path.basename(r) for r in rutas)
+            )
+    return {fecha: rutas[0] for fecha, rutas in encontrados.items() if len(rutas) == 1}
+
+
+def _fechas(desde, hasta):
+    dia = datetime.strptime(desde, "%Y-%m-%d")
+    fin = datetime.strptime(hasta, "%Y-%m-%d")
+    while dia <= fin:
+        yield dia.strftime("%Y-%m-%d")
+        dia += timedelta(days=1)
+
+
+def _registrado(tabla, fecha):
+    """Registros de ``tabla`` para ``fecha``, o ``None`` si no hay archivo del día."""
+    if event_store.nombre_archivo(tabla, fecha) not in event_store.archivos(tabla):
+        return None
+    return event_store.leer(tabla, fecha=fecha)
+
+
+def _legado(dia, anterior):
+    """Errores por usar de base una auditoría guardada en botellas.
+
+    El cierre de la víspera es la base de la apertura y, si el día no trae
+    conteo de apertura, la apertura registrada es la base del cierre.
+    """
+    bases = []
+    if dia["apertura"] is not None and anterior is not None:
+        bases.append(("cierres_confirmados", anterior, "el cierre confirmado"))
+    if dia["apertura"] is None and dia["cierre"] is not None:
+        bases.append(("auditoria_apertura", dia["fecha"], "la auditoría de apertura"))
+    return [
+        f"{nombre.capitalize()} del {fecha} está en botellas; convierte las auditorías a ml desde la app"
+        for tabla, fecha, nombre in bases
+        if event_store.es_legado(tabla, event_store.nombre_archivo(tabla, fecha))
+    ]
+
+
+def _registrar(dia):
+    fecha = dia["fecha"]
+    if dia["ventas"] is not None and not dia["ventas"].empty:
+        event_store.guardar("ventas_procesadas", dia["ventas"], fecha, modo="reemplazar")
+    if not dia["requisiciones"].empty:
+        event_store.guardar(
+            "transferencias", dia["requisiciones"], fecha, modo="agregar",
+            unicos=COLUMNAS_REQUISICION,
+        )
+    if dia["auditoria_apertura"] is not None:
+        event_store.guardar("auditoria_apertura", dia["auditoria_apertura"], fecha, modo="reemplazar")
+    if dia["auditoria_cierre"] is not None:
+        event_store.guardar("auditoria_cierre", dia["auditoria_cierre"], fecha, modo="reemplazar")
+        event_store.guardar("cierres_confirmados", dia["auditoria_cierre"], fecha, modo="reemplazar")
+
+
+def _resumen(dia):
+    partes = []
+    if dia["ventas"] is not None:
+        partes.append(f"{len(dia['ventas'])} consumos")
+    if not dia["requisiciones"].empty:
+        partes.append(f"{len(dia['requisiciones'])} requisiciones")
+    if dia["auditoria_apertura"] is not None:
+        partes.append(f"apertura dif. {dia['auditoria_apertura']['Diferencia'].sum():.0f} ml")
+    if dia["auditoria_cierre"] is not None:
+        partes.append(f"cierre dif. {dia['auditoria_cierre']['Diferencia'].sum():.0f} ml")
+    return ", ".join(partes) or "sin archivos"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Procesa ventas del POS y auditorías de un rango de fechas."
+    )
+    parser.add_argument("--desde", required=True, help="primera fecha (YYYY-MM-DD)")
+    parser.add_argument("--hasta", required=True, help="última fecha (YYYY-MM-DD)")
+    parser.add_argument("--pos", help="carpeta con las exportaciones del POS (Excel, CSV o zip)")
+    parser.add_argument("--conteos", help="carpeta con los conteos de apertura y cierre")
+    parser.add_argument("--ubicacion-ventas", default="Barra", choices=["Barra", "Vinera"],
+                        help="ubicación de salida del consumo (por defecto Barra)")
+    parser.add_argument("--ubicacion-conteo", default="General", choices=["General"] + UBICACIONES,
+                        help="ubicación de los conteos; General usa la columna 'Ubicación'")
+    parser.add_argument("--trabajadores", type=int, help="procesos para leer los días")
+    parser.add_argument("--simular", action="store_true", help="no registra nada")
+    args = parser.parse_args(argv)
+    asegurar_estructura()
+
+    try:
+        fechas = list(_fechas(args.desde, args.hasta))
+    except ValueError as e:
+        parser.error(str(e))
+    catalogo, avisos = leer_catalogo()
+    recetas, avisos_recetas = leer_recetas(catalogo)
+    for nivel, mensaje in avisos + avisos_recetas:
+        print(f"[{nivel}] {mensaje}", file=sys.stderr)
+    if catalogo.empty:
+        print("El catálogo está vacío. No se pueden procesar ventas.", file=sys.stderr)
+        return 1
+
+    event_store.recuperar()
+    alias = alias_pos.leer()
+    en_rango = set(fechas)
+    errores_conteo = {}
+    aperturas = _conteos_por_fecha(args.conteos, "apertura", en_rango, errores_conteo)
+    cierres = _conteos_por_fecha(args.conteos, "cierre", en_rango, errores_conteo)
+    conteos = {f: (aperturas.get(f), cierres.get(f)) for f in fechas if f in aperturas or f in cierres}
+    with tempfile.TemporaryDirectory() as carpeta:
+        # Los zip se extraen a una carpeta temporal que dura lo que la lectura
+        por_fecha, sin_fecha = lote.agrupar_por_fecha(lote.expandir(_rutas(args.pos), carpeta))
+        for mensaje in sin_fecha:
+            print(f"[warning] {mensaje}", file=sys.stderr)
+        por_fecha = {f: rutas for f, rutas in por_fecha.items() if f in en_rango}
+        leidos = {
+            dia["fecha"]: dia for dia in lote.procesar(
+                por_fecha, catalogo, recetas, args.ubicacion_ventas, alias,
+                trabajadores=args.trabajadores, conteos=conteos,
+                ubicacion_conteo=args.ubicacion_conteo,
+            )
+        }
+    dias = [leidos.get(f) or leer_dia(f, catalogo, recetas) for f in fechas]
+    for dia in dias:
+        dia["errores"].extend(errores_conteo.get(dia["fecha"], []))
+        if dia.get("archivos", 0) > 1:
+            dia["avisos"].append(f"{dia['archivos']} exportaciones del POS sumadas")
+
+    errores = 0
+    cierre_previo = None
+    for dia in dias:
+        fecha = dia["fecha"]
+        anterior = None
+        if cierre_previo is None:
+            anterior = (datetime.strptime(fecha, "%Y-%m-%d") - timedelta(days=1)).strftime("%Y-%m-%d")
+            cierre_previo = _registrado("cierres_confirmados", anterior)
+        dia["errores"].extend(_legado(dia, anterior))
+        conciliar_dia(
+            dia,
+            cierre_previo,
+            _registrado("auditoria_apertura", fecha),
+            event_store.leer("entradas", fecha=fecha),
+            event_store.leer("transferencias", fecha=fecha),
+            event_store.leer("ventas_procesadas", fecha=fecha),
+        )
+        if dia["errores"]:
+            errores += 1
+            print(f"{fecha}: ERROR, no se registra", file=sys.stderr)
+            for mensaje in dia["errores"]:
+                print(f"  - {mensaje}", file=sys.stderr)
+            cierre_previo = None
+            continue
+        if not args.simular:
+            _registrar(dia)
+        print(f"{fecha}: {_resumen(dia)}")
+        for mensaje in dia["avisos"]:
+            print(f"  - {mensaje}")
+        cierre_previo = dia["auditoria_cierre"]
+
+    if not args.simular:
+        # Fin del lote: se materializan los Excel de todo lo registrado
+        event_store.compactar()
+    procesados = sum(1 for d in dias if not d["errores"])
+    print(f"{procesados} días procesados, {errores} con errores.")
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,26 @@
+"""Configuración común de las pruebas.
+
+Las pruebas corren desde la raíz del repositorio contra un árbol de datos
+temporal; cada una recibe un almacén vacío propio (fixture ``almacen``).
+"""
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Antes de importar utils: path_utils fija las carpetas al importarse
+os.environ["INVENTARIO_DATA_DIR"] = tempfile.mkdtemp(prefix="inventario_pruebas_")
+atexit.register(shutil.rmtree, os.environ["INVENTARIO_DATA_DIR"], True)
+
+
+@pytest.fixture
+def almacen(tmp_path, monkeypatch):
+    """``utils.event_store`` apuntando a una base vacía en ``tmp_path``."""
+    from utils import event_store
+
+    monkeypatch.setattr(event_store, "DB_PATH", str(tmp_path / "inventario.db"))
+    return event_store
@@ -0,0 +1,139 @@
+"""Saldo, acumulados y consumo diario frente a su recálculo completo.
+
+Cada caso escribe, reemplaza y borra un día de una tabla con efecto sobre el
+saldo y, después de cada paso, exige que la versión incremental coincida con
+la reconstruida desde el historial.
+"""
+import pandas as pd
+import pytest
+
+from utils import acumulados, consumo, saldos
+
+DIA = "2024-01-02"
+ANTERIOR = "2024-01-01"
+SIGUIENTE = "2024-01-03"
+
+
+def _entradas(cantidad, fecha=DIA):
+    return pd.DataFrame({
+        "Fecha": [fecha, fecha],
+        "Item": ["Ron", "Gin"],
+        "Subcategoría": ["Ron", "Gin"],
+        "Ubicación destino": ["Bodega", "Barra"],
+        "Cantidad": [cantidad, cantidad / 2],
+    })
+
+
+def _transferencias(cantidad, fecha=DIA):
+    return pd.DataFrame({
+        "Fecha": [fecha],
+        "Item": ["Ron"],
+        "Desde": ["Bodega"],
+        "Hacia": ["Barra"],
+        "Cantidad": [cantidad],
+    })
+
+
+def _ventas(cantidad, fecha=DIA):
+    return pd.DataFrame({
+        "Fecha": [fecha, fecha, fecha],
+        "Producto vendido": ["Mojito", "Gin tonic", "Ron"],
+        "Item usado": ["Ron", "Gin", "Ron"],
+        "Subcategoría": ["Ron", "Gin", "Ron"],
+        "Cantidad teórica consumida": [cantidad, cantidad / 4, cantidad / 10],
+        "Ubicación de salida": ["Barra", "Barra", "Bodega"],
+        "Unidad": ["ml", "ml", "ml"],
+    })
+
+
+def _cierre(cantidad, fecha=DIA):
+    return pd.DataFrame({
+        "Item": ["Ron", "Gin"],
+        "Ubicación": ["Barra", "Barra"],
+        "Físico Cierre": [cantidad, cantidad / 3],
+        "Teorico": [cantidad, cantidad / 3],
+        "Diferencia": [0.0, 0.0],
+    })
+
+
+MOVIMIENTOS = {
+    "entradas": _entradas,
+    "transferencias": _transferencias,
+    "ventas_procesadas": _ventas,
+    "cierres_confirmados": _cierre,
+}
+
+
+def _historial(almacen):
+    """Días antes y después de ``DIA``, para que los acumulados se propaguen."""
+    almacen.guardar("entradas", _entradas(3000, ANTERIOR), ANTERIOR)
+    almacen.guardar("ventas_procesadas", _ventas(200, ANTERIOR), ANTERIOR)
+    almacen.guardar("transferencias", _transferencias(700, SIGUIENTE), SIGUIENTE)
+    almacen.guardar("ventas_procesadas", _ventas(150, SIGUIENTE), SIGUIENTE)
+
+
+def _sin_diferencias(almacen, paso):
+    con = almacen.conectar()
+    try:
+        for nombre, verificar in (
+            ("saldos", saldos.verificar),
+            ("acumulados", acumulados.verificar),
+            ("consumo", consumo.verificar),
+        ):
+            diferencias = verificar(con)
+            assert diferencias.empty, f"{nombre} difiere tras {paso}:\n{diferencias}"
+    finally:
+        con.close()
+
+
+@pytest.mark.parametrize("tabla", list(MOVIMIENTOS))
+def test_escribir_reemplazar_y_borrar_un_dia(almacen, tabla):
+    _historial(almacen)
+    movimientos = MOVIMIENTOS[tabla]
+
+    almacen.guardar(tabla, movimientos(1000), DIA)
+    _sin_diferencias(almacen, "escribir")
+
+    almacen.guardar(tabla, movimientos(400), DIA, modo="reemplazar")
+    _sin_diferencias(almacen, "reemplazar")
+
+    almacen.guardar(tabla, movimientos(0).iloc[:0], DIA, modo="reemplazar")
+    _sin_diferencias(almacen, "borrar")
+
+
+@pytest.mark.parametrize("tabla", ["entradas", "transferencias", "ventas_procesadas"])
+def test_agregar_filas_a_un_dia(almacen, tabla):
+    _historial(almacen)
+    movimientos = MOVIMIENTOS[tabla]
+
+    almacen.guardar(tabla, movimientos(1000), DIA)
+    almacen.guardar(tabla, movimientos(250), DIA)
+    _sin_diferencias(almacen, "agregar")
+
+    almacen.guardar_varios([(tabla, movimientos(80), DIA, "reemplazar")])
+    _sin_diferencias(almacen, "guardar_varios")
+
+
+def test_saldo_y_stock_a_una_fecha(almacen):
+    _historial(almacen)
+    saldo = almacen.leer_saldos()
+    # Lo vendido desde Bodega no descuenta: sólo consumen Barra y Vinera
+    assert saldo[("Ron", "Bodega")] == pytest.approx(3000 - 700)
+    # 700 transferidos - 200 y 150 vendidos en Barra
+    assert saldo[("Ron", "Barra")] == pytest.approx(700 - 200 - 150)
+
+    al_anterior = acumulados.leer_saldos_al(ANTERIOR)
+    assert al_anterior[("Ron", "Bodega")] == pytest.approx(3000)
+    assert al_anterior[("Ron", "Barra")] == pytest.approx(-200)
+
+
+def test_reconstruir_tras_corromper(almacen):
+    _historial(almacen)
+    almacen.transaccion(lambda con: (
+        con.execute('UPDATE saldos SET "Cantidad" = "Cantidad" + 5'),
+        con.execute('UPDATE consumo_diario SET "Cantidad" = 0'),
+    ))
+    assert not almacen.verificar_saldos().empty
+
+    almacen.verificar_saldos(reconstruir=True)
+    _sin_diferencias(almacen, "reconstruir")
@@ -0,0 +1,88 @@
+"""Fechas y unión por día de los lotes del POS en ``core.lote``."""
+import pandas as pd
+import pytest
+
+from core.dia import leer_dia
+from core.lote import agrupar_por_fecha, fecha_de_contenido, fecha_de_nombre, inferir_fecha, unir_dias
+
+CATALOGO = pd.DataFrame({
+    "Nombre": ["Ron", "Mojito", "Menta"],
+    "Subcategoría": ["Ron", "Cocteles", "Insumos"],
+    "Tipo_venta": ["BOT", "CTL", "CTL"],
+    "Unidad": ["ml", "ml", "g"],
+    "Volumen_ml_por_unidad": [750, None, None],
+    "Dosis_ml": [60, None, None],
+})
+RECETAS = pd.DataFrame({
+    "Producto_vendido": ["Mojito", "Mojito"],
+    "Ingrediente": ["Ron", "Menta"],
+    "Cantidad_usada": [60, 5],
+    "Unidad": ["ml", "g"],
+})
+
+
+def _csv(ruta, texto):
+    ruta.write_text(texto, encoding="utf-8")
+    return str(ruta)
+
+
+@pytest.mark.parametrize("nombre", [
+    "ventas_2024-01-31.xlsx",
+    "ventas_2024_01_31.xlsx",
+    "ventas_20240131.xlsx",
+    "ventas_31-01-2024.xlsx",
+])
+def test_fecha_de_nombre_en_cada_formato(nombre):
+    assert fecha_de_nombre(f"/lote/caja 2/{nombre}") == "2024-01-31"
+
+
+@pytest.mark.parametrize("nombre, fecha", [
+    ("ventas_2024-02-30.xlsx", None),
+    ("ventas_30-02-2024.xlsx", None),
+    ("ventas_20241301.xlsx", None),
+    # Una fecha imposible no tapa otra válida del mismo nombre
+    ("ventas_2024-02-30_2024-03-01.xlsx", "2024-03-01"),
+    ("terminal_123456.xlsx", None),
+])
+def test_fecha_de_nombre_descarta_fechas_invalidas(nombre, fecha):
+    assert fecha_de_nombre(nombre) == fecha
+
+
+def test_fecha_del_contenido_con_el_dia_primero(tmp_path):
+    ruta = _csv(tmp_path / "caja.csv", (
+        "Descripción,Subcategoría,Cantidad,Fecha\n"
+        "Ron,Ron,1,03/02/2024\n"
+        "Ron,Ron,1,03/02/2024\n"
+        "Ron,Ron,1,04/02/2024\n"
+    ))
+    assert fecha_de_nombre(ruta) is None
+    assert fecha_de_contenido(ruta) == "2024-02-03"
+    assert inferir_fecha(ruta) == "2024-02-03"
+
+
+def test_agrupar_por_fecha(tmp_path):
+    con_nombre = _csv(tmp_path / "caja1_2024-02-03.csv", "Descripción,Subcategoría,Cantidad\n")
+    por_contenido = _csv(tmp_path / "caja2.csv", "Descripción,Fecha\nRon,03/02/2024\n")
+    sin_fecha = _csv(tmp_path / "caja3.csv", "Descripción,Cantidad\nRon,1\n")
+    por_fecha, errores = agrupar_por_fecha([con_nombre, sin_fecha, por_contenido])
+    assert por_fecha == {"2024-02-03": [con_nombre, por_contenido]}
+    assert len(errores) == 1 and errores[0].startswith("caja3.csv:")
+
+
+def test_dos_terminales_del_mismo_dia_se_suman(tmp_path):
+    terminales = [
+        _csv(tmp_path / "caja1_2024-02-03.csv", "Descripción,Subcategoría,Cantidad\nRon,Ron,2\nMojito,Cocteles,3\n"),
+        _csv(tmp_path / "caja2_2024-02-03.csv", (
+            "Descripción,Subcategoría,Cantidad\nRon,Ron,1\nMojito,Cocteles,1\nNada,X,4\n"
+        )),
+    ]
+    dia = unir_dias([leer_dia("2024-02-03", CATALOGO, RECETAS, pos=ruta) for ruta in terminales])
+
+    consumo = dia["ventas"].set_index(["Producto vendido", "Item usado"])["Cantidad teórica consumida"]
+    assert consumo.to_dict() == {
+        ("Ron", "Ron"): 3 * 750.0,
+        ("Mojito", "Ron"): 4 * 60.0,
+        ("Mojito", "Menta"): 4 * 5.0,
+    }
+    assert dia["omitidos"][["Producto", "Líneas", "Cantidad"]].values.tolist() == [["Nada", 1, 4]]
+    assert dia["errores"] == [] and len(dia["avisos"]) == 1
@@ -0,0 +1,123 @@
+"""Conversiones de datos guardados antes de una corrección.
+
+Cada caso arma un almacén "viejo" (escrito sin la conversión registrada),
+la registra al reabrirlo y exige que se aplique una sola vez y sólo a los
+días anteriores.
+"""
+import pandas as pd
+import pytest
+
+from modules.auditorias import corregir_auditorias
+from modules.stock import corregir_ventas_bot
+from utils import diferencias
+
+CATALOGO = pd.DataFrame({
+    "Nombre": ["Ron", "Gin"],
+    "Subcategoría": ["Ron", "Gin"],
+    "Tipo_venta": ["BOT", "CTL"],
+    "Unidad": ["ml", "ml"],
+    "Volumen_ml_por_unidad": [750, 1000],
+})
+
+
+def _ventas(cantidad, fecha):
+    return pd.DataFrame({
+        "Fecha": [fecha, fecha],
+        "Producto vendido": ["Ron", "Gin tonic"],
+        "Item usado": ["Ron", "Gin"],
+        "Subcategoría": ["Ron", "Gin"],
+        "Cantidad teórica consumida": [cantidad, 50.0],
+        "Ubicación de salida": ["Barra", "Barra"],
+        "Unidad": ["ml", "ml"],
+    })
+
+
+def _apertura(botellas):
+    return pd.DataFrame({
+        "Item": ["Ron"],
+        "Ubicación": ["Barra"],
+        "Cierre anterior": [botellas],
+        "Conteo Apertura": [botellas],
+        "Diferencia": [0.0],
+    })
+
+
+def _cierre(botellas):
+    # Teórico viejo: apertura en botellas menos ventas en botellas
+    return pd.DataFrame({
+        "Item": ["Ron"],
+        "Ubicación": ["Barra"],
+        "Físico Cierre": [botellas],
+        "Teorico": [8.0],
+        "Diferencia": [botellas - 8.0],
+    })
+
+
+@pytest.fixture
+def almacen_viejo(almacen, monkeypatch):
+    """Almacén con un día guardado antes de registrar las conversiones."""
+    migraciones = dict(almacen.MIGRACIONES)
+    monkeypatch.setattr(almacen, "MIGRACIONES", {})
+    almacen.guardar("ventas_procesadas", _ventas(2.0, "2024-01-01"), "2024-01-01", "reemplazar")
+    almacen.guardar("auditoria_apertura", _apertura(10.0), "2024-01-01", "reemplazar")
+    almacen.guardar("auditoria_cierre", _cierre(7.0), "2024-01-01", "reemplazar")
+    almacen.guardar("cierres_confirmados", _cierre(7.0), "2024-01-01", "reemplazar")
+    # Se reabre con la versión actual: la conversión se registra ahora
+    monkeypatch.setattr(almacen, "MIGRACIONES", migraciones)
+    almacen._esquema_listo.discard(almacen.DB_PATH)
+    return almacen
+
+
+def _consumo_ron(almacen, fecha):
+    ventas = almacen.leer("ventas_procesadas", fecha=fecha)
+    return ventas.loc[ventas["Item usado"] == "Ron", "Cantidad teórica consumida"].tolist()
+
+
+def test_solo_los_dias_anteriores_quedan_como_legado(almacen_viejo):
+    almacen_viejo.guardar("ventas_procesadas", _ventas(750.0, "2024-01-02"), "2024-01-02", "reemplazar")
+    assert almacen_viejo.legado("ventas_bot_ml") == [
+        ("ventas_procesadas", almacen_viejo.nombre_archivo("ventas_procesadas", "2024-01-01"))
+    ]
+    assert almacen_viejo.migracion_aplicada("ventas_bot_ml") is None
+    assert len(almacen_viejo.legado("auditorias_ml")) == 3
+    assert almacen_viejo.es_legado(
+        "cierres_confirmados", almacen_viejo.nombre_archivo("cierres_confirmados", "2024-01-01")
+    )
+
+
+def test_la_correccion_se_aplica_una_sola_vez(almacen_viejo):
+    almacen_viejo.guardar("ventas_procesadas", _ventas(750.0, "2024-01-02"), "2024-01-02", "reemplazar")
+
+    assert corregir_ventas_bot(CATALOGO) == 1
+    assert _consumo_ron(almacen_viejo, "2024-01-01") == [1500.0]
+    assert _consumo_ron(almacen_viejo, "2024-01-02") == [750.0]
+    assert almacen_viejo.legado("ventas_bot_ml") == []
+    assert almacen_viejo.migracion_aplicada("ventas_bot_ml") is not None
+
+    assert corregir_ventas_bot(CATALOGO) == 0
+    assert _consumo_ron(almacen_viejo, "2024-01-01") == [1500.0]
+
+
+def test_reescribir_un_dia_lo_saca_del_legado(almacen_viejo):
+    almacen_viejo.guardar("ventas_procesadas", _ventas(1500.0, "2024-01-01"), "2024-01-01", "reemplazar")
+    assert almacen_viejo.legado("ventas_bot_ml") == []
+    assert corregir_ventas_bot(CATALOGO) == 0
+    assert _consumo_ron(almacen_viejo, "2024-01-01") == [1500.0]
+
+
+def test_auditorias_en_botellas_se_convierten_y_concilian(almacen_viejo):
+    assert diferencias.leer().empty  # en botellas no entran al análisis de mermas
+    corregir_ventas_bot(CATALOGO)
+
+    assert corregir_auditorias(CATALOGO) == 1
+    apertura = almacen_viejo.leer("auditoria_apertura", fecha="2024-01-01")
+    assert apertura[["Cierre anterior", "Conteo Apertura"]].iloc[0].tolist() == [7500.0, 7500.0]
+    for tabla in ("auditoria_cierre", "cierres_confirmados"):
+        cierre = almacen_viejo.leer(tabla, fecha="2024-01-01").iloc[0]
+        # 7500 de apertura menos 1500 de Ron vendido por botella en Barra
+        assert (cierre["Físico Cierre"], cierre["Teorico"], cierre["Diferencia"]) == (5250.0, 6000.0, -750.0)
+    assert almacen_viejo.legado("auditorias_ml") == []
+    assert len(diferencias.leer()) == 2
+
+    assert corregir_auditorias(CATALOGO) == 0
+    assert almacen_viejo.leer("auditoria_apertura", fecha="2024-01-01")["Conteo Apertura"].tolist() == [7500.0]
@@ -0,0 +1,95 @@
+"""Compilación de recetas con sub-recetas en ``core.recetas``."""
+import numpy as np
+import pandas as pd
+
+from core.recetas import SEPARADOR_VIA, MatrizRecetas, _orden_topologico
+
+
+def _recetas(filas):
+    return pd.DataFrame(
+        filas, columns=["Producto_vendido", "Ingrediente", "Cantidad_usada", "Unidad", "Rendimiento"]
+    )
+
+
+# Jarabe rinde la suma de sus ingredientes (1000 ml); Base declara 400 ml.
+# Daiquiri usa Jarabe directo y a través de Base.
+RECETAS = _recetas([
+    ("Jarabe", "Azúcar", 500, "g", np.nan),
+    ("Jarabe", "Agua", 500, "ml", np.nan),
+    ("Base", "Jarabe", 200, "ml", 400),
+    ("Base", "Limón", 300, "ml", np.nan),
+    ("Daiquiri", "Ron", 60, "ml", np.nan),
+    ("Daiquiri", "Base", 40, "ml", np.nan),
+    ("Daiquiri", "Jarabe", 10, "ml", np.nan),
+])
+
+
+def _entradas(matriz, producto):
+    tabla = matriz.como_tabla()
+    tabla = tabla[tabla["Producto_vendido"] == producto]
+    return list(zip(tabla["Ingrediente"], tabla["Cantidad_usada"].round(9), tabla["Vía"]))
+
+
+def test_orden_topologico_pone_primero_las_dependencias():
+    orden, ciclo = _orden_topologico({"Daiquiri": {"Base", "Jarabe"}, "Base": {"Jarabe"}, "Jarabe": set()})
+    assert orden == ["Jarabe", "Base", "Daiquiri"]
+    assert ciclo == []
+
+
+def test_sub_receta_de_dos_niveles_con_rendimiento_declarado_y_por_defecto():
+    matriz = MatrizRecetas(RECETAS)
+    assert matriz.avisos == []
+    # Base: 200/1000 lotes de Jarabe y 300 ml de Limón por lote de 400 ml
+    assert _entradas(matriz, "Base") == [
+        ("Azúcar", 100.0, "Jarabe"),
+        ("Agua", 100.0, "Jarabe"),
+        ("Limón", 300.0, ""),
+    ]
+
+
+def test_ingrediente_que_llega_por_dos_caminos():
+    matriz = MatrizRecetas(RECETAS)
+    via_base = f"Base{SEPARADOR_VIA}Jarabe"
+    assert _entradas(matriz, "Daiquiri") == [
+        ("Ron", 60.0, ""),
+        ("Azúcar", 10.0, via_base),
+        ("Agua", 10.0, via_base),
+        ("Limón", 30.0, "Base"),
+        ("Azúcar", 5.0, "Jarabe"),
+        ("Agua", 5.0, "Jarabe"),
+    ]
+    traza = matriz.trazar("Azúcar")
+    assert traza.loc[traza["Producto_vendido"] == "Daiquiri", "Vía"].tolist() == [via_base, "Jarabe"]
+
+
+def test_ciclo_y_producto_que_depende_de_el():
+    dependencias = {"A": {"B"}, "B": {"A"}, "C": {"A"}, "D": set()}
+    orden, ciclo = _orden_topologico(dependencias)
+    assert orden == ["D"]
+    assert ciclo[0] == ciclo[-1] and set(ciclo) == {"A", "B"}
+
+    matriz = MatrizRecetas(_recetas([
+        ("A", "B", 1, "ml", np.nan),
+        ("B", "A", 1, "ml", np.nan),
+        ("C", "A", 1, "ml", np.nan),
+        ("C", "Ron", 30, "ml", np.nan),
+        ("D", "Ron", 60, "ml", np.nan),
+    ]))
+    assert matriz.circulares == {"A", "B", "C"}
+    assert matriz.productos == ["D"]
+    assert [nivel for nivel, _ in matriz.avisos] == ["error"]
+
+
+def test_consumo_de_productos_vendidos_fuera_del_orden_de_las_recetas():
+    matriz = MatrizRecetas(RECETAS)
+    consumo = matriz.consumo(pd.Series({"Daiquiri": 2, "Jarabe": 3}))
+    assert consumo["Producto_vendido"].tolist() == ["Daiquiri"] * 6 + ["Jarabe"] * 2
+    assert consumo["Ingrediente"].tolist() == [
+        "Ron", "Azúcar", "Agua", "Limón", "Azúcar", "Agua", "Azúcar", "Agua",
+    ]
+    assert consumo["Cantidad_consumida"].round(9).tolist() == [
+        120.0, 20.0, 20.0, 60.0, 10.0, 10.0, 1500.0, 1500.0,
+    ]
+    assert consumo.groupby("Ingrediente")["Cantidad_consumida"].sum().round(9).to_dict() == {
+        "Agua": 1530.0, "Azúcar": 1530.0, "Limón": 60.0, "Ron": 120.0,
+    }
@@ -0,0 +1,190 @@
+"""Movimientos acumulados por día para consultar el stock en cualquier fecha.
+
+La tabla ``acumulados`` guarda, para cada (Item, Ubicación) y cada día con
+movimientos, el efecto neto del día (``Delta``) y la suma de todos los días
+hasta ese inclusive (``Acumulado``), en ml. El stock al cierre de una fecha
+es el último cierre confirmado hasta esa fecha más el ``Acumulado`` de la
+última fila de cada par no posterior a ella: una consulta, sin recorrer el
+historial.
+
+Se mantiene con los mismos deltas que el saldo corriente (``utils.saldos``):
+cada escritura de un día suma su diferencia a la fila de ese día y a los
+acumulados de los días siguientes del par.
+
+Para comprobar o regenerar la tabla desde cero::
+
+    python -m utils.acumulados verificar
+    python -m utils.acumulados reconstruir
+"""
+import sys
+
+import pandas as pd
+
+from utils import cache, event_store, saldos
+
+TABLAS_MOVIMIENTO = ("entradas", "transferencias", "ventas_procesadas")
+
+
+def _leer(con, tabla, where="", params=()):
+    return pd.read_sql_query(
+        f'SELECT * FROM "{tabla}" {where} ORDER BY _archivo, _fila', con, params=list(params)
+    )
+
+
+def asegurar_tabla(con):
+    """Crea la tabla de acumulados; devuelve True si no existía."""
+    existe = con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'acumulados'"
+    ).fetchone()
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS acumulados ("
+        '"Item" TEXT NOT NULL, "Ubicación" TEXT NOT NULL, dia TEXT NOT NULL, '
+        '"Delta" REAL NOT NULL, "Acumulado" REAL NOT NULL, '
+        'PRIMARY KEY ("Item", "Ubicación", dia))'
+    )
+    return existe is None
+
+
+def aplicar(con, tabla, dia, antes, despues):
+    """Suma ``despues - antes`` (efecto por par) al día ``dia`` y a los siguientes."""
+    if tabla not in TABLAS_MOVIMIENTO or antes is None or despues is None:
+        return
+    delta = despues.sub(antes, fill_value=0.0)
+    delta = delta[delta.abs() > saldos.TOLERANCIA]
+    if delta.empty:
+        return
+    pares = [(item, ubic, float(cant)) for (item, ubic), cant in delta.items()]
+    # La fila nueva de un día parte del acumulado del día anterior del par
+    con.executemany(
+        'INSERT OR IGNORE INTO acumulados ("Item", "Ubicación", dia, "Delta", "Acumulado") '
+        "VALUES (?, ?, ?, 0, COALESCE(("
+        'SELECT "Acumulado" FROM acumulados WHERE "Item" = ? AND "Ubicación" = ? AND dia < ? '
+        "ORDER BY dia DESC LIMIT 1), 0))",
+        ((item, ubic, dia, item, ubic, dia) for item, ubic, _ in pares),
+    )
+    con.executemany(
+        'UPDATE acumulados SET "Delta" = "Delta" + ? WHERE "Item" = ? AND "Ubicación" = ? AND dia = ?',
+        ((cant, item, ubic, dia) for item, ubic, cant in pares),
+    )
+    con.executemany(
+        'UPDATE acumulados SET "Acumulado" = "Acumulado" + ? '
+        'WHERE "Item" = ? AND "Ubicación" = ? AND dia >= ?',
+        ((cant, item, ubic, dia) for item, ubic, cant in pares),
+    )
+    # Un día que quedó sin efecto neto no aporta nada a la consulta
+    con.executemany(
+        'DELETE FROM acumulados WHERE "Item" = ? AND "Ubicación" = ? AND dia = ? '
+        'AND ABS("Delta") <= ?',
+        ((item, ubic, dia, saldos.TOLERANCIA) for item, ubic, _ in pares),
+    )
+
+
+def recalcular(con):
+    """Tabla de acumulados recalculada a partir de todo el historial del almacén."""
+    partes = []
+    for tabla in TABLAS_MOVIMIENTO:
+        df = _leer(con, tabla)
+        for dia, grupo in df.groupby("_dia", sort=False):
+            efecto = saldos.efecto(tabla, grupo)
+            if not efecto.empty:
+                partes.append(efecto.reset_index().assign(dia=dia))
+    if not partes:
+        return pd.DataFrame(columns=["Item", "Ubicación", "dia", "Delta", "Acumulado"])
+    todo = (
+        pd.concat(partes, ignore_index=True)
+        .groupby(["Item", "Ubicación", "dia"], as_index=False)["Cantidad"].sum()
+        .rename(columns={"Cantidad": "Delta"})
+        .sort_values(["Item", "Ubicación", "dia"], ignore_index=True)
+    )
+    todo["Acumulado"] = todo.groupby(["Item", "Ubicación"])["Delta"].cumsum()
+    return todo[todo["Delta"].abs() > saldos.TOLERANCIA].reset_index(drop=True)
+
+
+def reconstruir(con):
+    """Reemplaza la tabla de acumulados por el recálculo completo."""
+    todo = recalcular(con)
+    con.execute("DELETE FROM acumulados")
+    con.executemany(
+        'INSERT INTO acumulados ("Item", "Ubicación", dia, "Delta", "Acumulado") '
+        "VALUES (?, ?, ?, ?, ?)",
+        todo[["Item", "Ubicación", "dia", "Delta", "Acumulado"]].itertuples(index=False, name=None),
+    )
+    return todo
+
+
+def _ultimo_cierre(con, fecha):
+    fila = con.execute(
+        "SELECT MAX(_dia) FROM cierres_confirmados WHERE _dia <= ?", (fecha,)
+    ).fetchone()
+    return fila[0]
+
+
+def leer_al(con, fecha):
+    """Stock en ml al cierre de ``fecha`` (YYYY-MM-DD), indexado por (Item, Ubicación)."""
+    # Con MAX() SQLite toma las demás columnas de la fila del máximo
+    movimientos = pd.read_sql_query(
+        'SELECT "Item", "Ubicación", "Acumulado" AS "Cantidad", MAX(dia) '
+        'FROM acumulados WHERE dia <= ? GROUP BY "Item", "Ubicación"',
+        con, params=[fecha],
+    ).set_index(["Item", "Ubicación"])["Cantidad"].astype(float)
+    dia_cierre = _ultimo_cierre(con, fecha)
+    if dia_cierre is None:
+        return movimientos
+    cierre = saldos.efecto(
+        "cierres_confirmados",
+        _leer(con, "cierres_confirmados", "WHERE _dia = ?", [dia_cierre]),
+    )
+    return pd.concat([cierre, movimientos]).groupby(level=["Item", "Ubicación"]).sum()
+
+
+def leer_saldos_al(fecha):
+    """Stock en ml al cierre de ``fecha`` (YYYY-MM-DD), indexado por (Item, Ubicación).
+
+    Sale de la tabla de acumulados y del último cierre confirmado hasta esa
+    fecha; con la fecha del último día registrado coincide con
+    ``event_store.leer_saldos``.
+    """
+    event_store.sincronizar(saldos.TABLAS_CON_EFECTO)
+    return cache.obtener(
+        ("saldos_al", event_store.DB_PATH, fecha), event_store.firma(),
+        lambda: event_store.consultar(lambda con: leer_al(con, fecha)),
+    )
+
+
+def verificar(con):
+    """Compara la tabla guardada con el recálculo completo.
+
+    Devuelve un DataFrame con los (Item, Ubicación, día) que difieren.
+    """
+    guardado = pd.read_sql_query(
+        'SELECT "Item", "Ubicación", dia, "Acumulado" FROM acumulados', con
+    ).set_index(["Item", "Ubicación", "dia"])["Acumulado"]
+    completo = recalcular(con).set_index(["Item", "Ubicación", "dia"])["Acumulado"]
+    df = pd.DataFrame({"Guardado": guardado, "Recalculado": completo}).fillna(0.0)
+    df["Diferencia"] = df["Guardado"] - df["Recalculado"]
+    return df[df["Diferencia"].abs() > saldos.TOLERANCIA].reset_index()
+
+
+event_store.registrar_derivado("utils.acumulados", asegurar_tabla, aplicar, reconstruir)
+
+
+if __name__ == "__main__":
+    comando = sys.argv[1] if len(sys.argv) > 1 else ""
+    if comando not in ("verificar", "reconstruir"):
+        print("Uso: python -m utils.acumulados [verificar|reconstruir]")
+        sys.exit(1)
+    con = event_store.conectar()
+    try:
+        if comando == "reconstruir":
+            with con:
+                todo = reconstruir(con)
+            print(f"Acumulados reconstruidos: {len(todo)} filas (Item, Ubicación, día).")
+        else:
+            diferencias = verificar(con)
+            if diferencias.empty:
+                print("Los acumulados coinciden con el recálculo completo.")
+            else:
+                print(diferencias.to_string(index=False))
+                sys.exit(2)
+    finally:
+        con.close()
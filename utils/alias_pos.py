@@ -0,0 +1,68 @@
+"""Alias aprendidos para productos del POS que no coinciden con el catálogo.
+
+La tabla ``alias_pos`` del almacén guarda, por clave normalizada del
+producto del POS (nombre y subcategoría, ver ``core.claves.normalizar``), el
+Nombre y la Subcategoría del catálogo elegidos al resolverlo a mano. Una
+resolución nueva de la misma clave reemplaza a la anterior.
+"""
+from datetime import datetime
+
+import pandas as pd
+
+from utils import cache, event_store
+
+COLUMNAS = ["Clave_nombre", "Clave_subcategoria", "Nombre", "Subcategoría"]
+
+
+def asegurar_tabla(con):
+    """Crea la tabla de alias; devuelve True si no existía."""
+    existe = con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'alias_pos'"
+    ).fetchone()
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS alias_pos ("
+        '"Clave_nombre" TEXT NOT NULL, "Clave_subcategoria" TEXT NOT NULL, '
+        '"Nombre" TEXT NOT NULL, "Subcategoría" TEXT NOT NULL, "Creado" TEXT, '
+        'PRIMARY KEY ("Clave_nombre", "Clave_subcategoria"))'
+    )
+    return existe is None
+
+
+def _leer(con):
+    return pd.read_sql_query(
+        'SELECT "Clave_nombre", "Clave_subcategoria", "Nombre", "Subcategoría", "Creado" '
+        'FROM alias_pos ORDER BY "Creado", rowid',
+        con,
+    )
+
+
+def _guardar(con, df, reemplazar=False):
+    """Agrega (o actualiza) los alias de ``df``; con ``reemplazar`` quedan sólo ellos."""
+    if reemplazar:
+        con.execute("DELETE FROM alias_pos")
+    creado = datetime.now().isoformat(timespec="seconds")
+    filas = df[COLUMNAS].dropna().astype(str).itertuples(index=False, name=None)
+    con.executemany(
+        'INSERT INTO alias_pos ("Clave_nombre", "Clave_subcategoria", "Nombre", "Subcategoría", "Creado") '
+        "VALUES (?, ?, ?, ?, ?) "
+        'ON CONFLICT ("Clave_nombre", "Clave_subcategoria") DO UPDATE SET '
+        '"Nombre" = excluded."Nombre", "Subcategoría" = excluded."Subcategoría", '
+        '"Creado" = excluded."Creado"',
+        (fila + (creado,) for fila in filas),
+    )
+
+
+def leer():
+    """Alias guardados, en orden de creación."""
+    return cache.obtener(
+        ("alias_pos", event_store.DB_PATH), event_store.firma(), lambda: event_store.consultar(_leer)
+    )
+
+
+def guardar(df, reemplazar=False):
+    """Guarda los alias de ``df`` (columnas de :data:`COLUMNAS`); devuelve cuántos."""
+    event_store.escribir(lambda con: _guardar(con, df, reemplazar=reemplazar))
+    return len(df)
+
+
+event_store.registrar_derivado("utils.alias_pos", asegurar_tabla)
@@ -0,0 +1,143 @@
+"""Caché de lecturas compartida por todos los cargadores de la app.
+
+Cada entrada se guarda junto con la firma (ruta, mtime, tamaño) de los
+archivos de los que proviene: si la firma cambia, la entrada se descarta y se
+vuelve a leer. La caché es común a todas las sesiones del proceso y se limita
+por cantidad de entradas y por bytes, desalojando las menos usadas (LRU).
+"""
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from utils import perf
+
+MAX_ENTRADAS = 256
+MAX_BYTES = 256 * 1024 * 1024
+
+_lock = threading.RLock()
+_entradas = OrderedDict()  # clave -> (firma, valor, bytes, rutas)
+_bytes_total = 0
+_contadores = {"hits": 0, "misses": 0, "desalojos": 0, "invalidaciones": 0}
+
+
+def firma(*rutas):
+    """Firma de uno o más archivos: (ruta absoluta, mtime_ns, tamaño)."""
+    resultado = []
+    for ruta in rutas:
+        ruta = os.path.abspath(ruta)
+        try:
+            info = os.stat(ruta)
+            resultado.append((ruta, info.st_mtime_ns, info.st_size))
+        except FileNotFoundError:
+            resultado.append((ruta, None, None))
+    return tuple(resultado)
+
+
+def _tamano(valor):
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(deep=True).sum())
+    if isinstance(valor, pd.Series):
+        return int(valor.memory_usage(deep=True))
+    return sys.getsizeof(valor)
+
+
+def _copia(valor):
+    # Los llamadores suelen modificar los DataFrames recibidos
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        return valor.copy()
+    return valor
+
+
+def _quitar(clave):
+    global _bytes_total
+    _, _, tamano, _ = _entradas.pop(clave)
+    _bytes_total -= tamano
+
+
+def obtener(clave, firma_actual, cargar):
+    """Devuelve el valor cacheado para ``clave`` o lo carga con ``cargar()``.
+
+    ``firma_actual`` suele ser el resultado de :func:`firma`; si difiere de
+    la guardada la entrada se considera obsoleta.
+    """
+    global _bytes_total
+    with _lock:
+        entrada = _entradas.get(clave)
+        if entrada is not None and entrada[0] == firma_actual:
+            _entradas.move_to_end(clave)
+            _contadores["hits"] += 1
+            return _copia(entrada[1])
+        _contadores["misses"] += 1
+    valor = cargar()
+    tamano = _tamano(valor)
+    rutas = {f[0] for f in firma_actual if isinstance(f, tuple) and f and isinstance(f[0], str)}
+    with _lock:
+        if clave in _entradas:
+            _quitar(clave)
+        if tamano <= MAX_BYTES:
+            _entradas[clave] = (firma_actual, valor, tamano, rutas)
+            _bytes_total += tamano
+            while len(_entradas) > MAX_ENTRADAS or _bytes_total > MAX_BYTES:
+                _quitar(next(iter(_entradas)))
+                _contadores["desalojos"] += 1
+    return _copia(valor)
+
+
+def leer_excel(path, **kwargs):
+    """``pd.read_excel`` cacheado por la firma del archivo."""
+    clave = ("excel", os.path.abspath(path), tuple(sorted((k, repr(v)) for k, v in kwargs.items())))
+    with perf.medir("excel.leer", archivo=os.path.basename(path)) as registro:
+
+        def cargar():
+            registro["bytes"] = os.path.getsize(path)
+            return pd.read_excel(path, **kwargs)
+
+        df = obtener(clave, firma(path), cargar)
+        registro["filas"] = len(df)
+    return df
+
+
+def invalidar(ruta=None):
+    """Descarta las entradas que dependen de ``ruta`` (o todas si es None)."""
+    with _lock:
+        if ruta is None:
+            claves = list(_entradas)
+        else:
+            ruta = os.path.abspath(ruta)
+            claves = [c for c, e in _entradas.items() if ruta in e[3]]
+        for clave in claves:
+            _quitar(clave)
+        _contadores["invalidaciones"] += len(claves)
+
+
+def estadisticas():
+    """Contadores de aciertos/fallos y ocupación actual de la caché."""
+    with _lock:
+        total = _contadores["hits"] + _contadores["misses"]
+        return {
+            **_contadores,
+            "tasa_aciertos": _contadores["hits"] / total if total else 0.0,
+            "entradas": len(_entradas),
+            "bytes": _bytes_total,
+        }
+
+
+def hash_dataframe(df):
+    """Hash del contenido de ``df`` (valores, índice y encabezados)."""
+    h = hashlib.sha1()
+    h.update(repr(list(df.columns)).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def memoizar_artefacto(tipo, df, generar):
+    """Genera (o reutiliza) un artefacto derivado del contenido de ``df``.
+
+    Útil para PDF/Excel de descarga: mientras los datos no cambien, los bytes
+    se sirven desde la caché sin volver a renderizar.
+    """
+    return obtener(("artefacto", tipo, hash_dataframe(df)), (), generar)
@@ -0,0 +1,184 @@
+"""Consumo diario y tasas de consumo por (Item, Ubicación) para el pronóstico.
+
+La tabla ``consumo_diario`` guarda, en ml, lo que salió de cada par en cada
+día con ventas procesadas. Se mantiene con los mismos deltas que el saldo
+corriente (``utils.saldos``): cada escritura de ventas de un día suma su
+diferencia a las filas de ese día.
+
+La tabla ``tasas_consumo`` guarda, por par, las tasas calculadas sobre los
+últimos ``VENTANA_DIAS`` días con ventas: media de 7 y de 28 días, media
+exponencial (EWMA) y desvío de 28 días, junto con el día de referencia
+(``Hasta``). Una escritura sólo borra las tasas de los pares que tocó. Al
+leerlas se recalculan, de una vez y con operaciones vectorizadas, las que
+faltan; si llegó un día nuevo se recalculan todas.
+"""
+import numpy as np
+import pandas as pd
+
+from utils import cache, event_store, perf, saldos
+
+VENTANA_DIAS = 90  # días con ventas que se miran; el EWMA ya pesa < 0.001 más atrás
+SPAN_EWMA = 14
+COLUMNAS_TASAS = ["Item", "Ubicación", "Media_7", "Media_28", "EWMA", "Desvio_28", "Dias_con_consumo", "Hasta"]
+
+
+def asegurar_tabla(con):
+    """Crea las tablas de consumo diario y de tasas; True si no existían."""
+    existe = con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'consumo_diario'"
+    ).fetchone()
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS consumo_diario ("
+        '"Item" TEXT NOT NULL, "Ubicación" TEXT NOT NULL, dia TEXT NOT NULL, '
+        '"Cantidad" REAL NOT NULL, PRIMARY KEY ("Item", "Ubicación", dia))'
+    )
+    con.execute("CREATE INDEX IF NOT EXISTS ix_consumo_diario_dia ON consumo_diario (dia)")
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS tasas_consumo ("
+        '"Item" TEXT NOT NULL, "Ubicación" TEXT NOT NULL, "Media_7" REAL, "Media_28" REAL, '
+        '"EWMA" REAL, "Desvio_28" REAL, "Dias_con_consumo" INTEGER, "Hasta" TEXT, '
+        'PRIMARY KEY ("Item", "Ubicación"))'
+    )
+    return existe is None
+
+
+def aplicar(con, tabla, dia, antes, despues):
+    """Suma al consumo de ``dia`` la diferencia de una escritura de ventas."""
+    if tabla != "ventas_procesadas" or antes is None or despues is None:
+        return
+    # El efecto de las ventas sobre el saldo es negativo: el consumo es su opuesto
+    delta = antes.sub(despues, fill_value=0.0)
+    delta = delta[delta.abs() > saldos.TOLERANCIA]
+    if delta.empty:
+        return
+    pares = [(item, ubic, float(cant)) for (item, ubic), cant in delta.items()]
+    con.executemany(
+        'INSERT INTO consumo_diario ("Item", "Ubicación", dia, "Cantidad") VALUES (?, ?, ?, ?) '
+        'ON CONFLICT ("Item", "Ubicación", dia) DO UPDATE SET "Cantidad" = "Cantidad" + excluded."Cantidad"',
+        ((item, ubic, dia, cant) for item, ubic, cant in pares),
+    )
+    con.executemany(
+        'DELETE FROM consumo_diario WHERE "Item" = ? AND "Ubicación" = ? AND dia = ? '
+        'AND ABS("Cantidad") <= ?',
+        ((item, ubic, dia, saldos.TOLERANCIA) for item, ubic, _ in pares),
+    )
+    con.executemany(
+        'DELETE FROM tasas_consumo WHERE "Item" = ? AND "Ubicación" = ?',
+        ((item, ubic) for item, ubic, _ in pares),
+    )
+
+
+def recalcular(con):
+    """Consumo por (Item, Ubicación, día) recalculado desde todas las ventas procesadas."""
+    df = pd.read_sql_query("SELECT * FROM ventas_procesadas ORDER BY _archivo, _fila", con)
+    partes = [
+        (-saldos.efecto("ventas_procesadas", grupo)).reset_index().assign(dia=dia)
+        for dia, grupo in df.groupby("_dia", sort=False)
+    ]
+    if not partes:
+        return pd.DataFrame(columns=["Item", "Ubicación", "dia", "Cantidad"])
+    todo = pd.concat(partes, ignore_index=True)
+    return todo[todo["Cantidad"].abs() > saldos.TOLERANCIA][
+        ["Item", "Ubicación", "dia", "Cantidad"]
+    ].reset_index(drop=True)
+
+
+def reconstruir(con):
+    """Recalcula el consumo diario desde todas las ventas procesadas."""
+    todo = recalcular(con)
+    con.execute("DELETE FROM consumo_diario")
+    con.execute("DELETE FROM tasas_consumo")
+    con.executemany(
+        'INSERT INTO consumo_diario ("Item", "Ubicación", dia, "Cantidad") VALUES (?, ?, ?, ?)',
+        todo.itertuples(index=False, name=None),
+    )
+
+
+def verificar(con):
+    """Compara el consumo diario guardado con el recálculo completo.
+
+    Devuelve un DataFrame con los (Item, Ubicación, día) que difieren.
+    """
+    guardado = pd.read_sql_query(
+        'SELECT "Item", "Ubicación", dia, "Cantidad" FROM consumo_diario', con
+    ).set_index(["Item", "Ubicación", "dia"])["Cantidad"]
+    completo = recalcular(con).set_index(["Item", "Ubicación", "dia"])["Cantidad"]
+    df = pd.DataFrame({"Guardado": guardado, "Recalculado": completo}).fillna(0.0)
+    df["Diferencia"] = df["Guardado"] - df["Recalculado"]
+    return df[df["Diferencia"].abs() > saldos.TOLERANCIA].reset_index()
+
+
+def calcular_tasas(consumo: pd.DataFrame, dias: list[str]) -> pd.DataFrame:
+    """Tasas de consumo diario (ml) por par sobre los ``dias`` dados, en orden.
+
+    ``consumo`` tiene una fila por (Item, Ubicación, dia) con consumo; los
+    días sin fila cuentan como cero. Todo se calcula sobre una matriz pares ×
+    días: medias de los últimos 7 y 28 días, EWMA (``SPAN_EWMA``, con pesos
+    normalizados como ``pandas.ewm(adjust=True)``) y desvío de 28 días.
+    """
+    if consumo.empty or not dias:
+        return pd.DataFrame(columns=COLUMNAS_TASAS[:-1])
+    matriz = consumo.pivot_table(
+        index=["Item", "Ubicación"], columns="dia", values="Cantidad", aggfunc="sum", fill_value=0.0
+    ).reindex(columns=dias, fill_value=0.0)
+    valores = matriz.to_numpy(dtype=float)
+    ultimos_7, ultimos_28 = valores[:, -7:], valores[:, -28:]
+    alfa = 2 / (SPAN_EWMA + 1)
+    pesos = (1 - alfa) ** np.arange(len(dias) - 1, -1, -1)
+    return pd.DataFrame({
+        "Item": matriz.index.get_level_values("Item"),
+        "Ubicación": matriz.index.get_level_values("Ubicación"),
+        "Media_7": ultimos_7.mean(axis=1),
+        "Media_28": ultimos_28.mean(axis=1),
+        "EWMA": valores @ pesos / pesos.sum(),
+        "Desvio_28": ultimos_28.std(axis=1, ddof=1) if ultimos_28.shape[1] > 1 else 0.0,
+        "Dias_con_consumo": (valores > 0).sum(axis=1),
+    })
+
+
+def _dias_ventana(con):
+    filas = con.execute(
+        "SELECT DISTINCT dia FROM consumo_diario ORDER BY dia DESC LIMIT ?", (VENTANA_DIAS,)
+    ).fetchall()
+    return [f[0] for f in reversed(filas)]
+
+
+def actualizar_tasas(con):
+    """Recalcula las tasas que faltan (o todas si hay un día nuevo) y las devuelve."""
+    dias = _dias_ventana(con)
+    if not dias:
+        con.execute("DELETE FROM tasas_consumo")
+        return pd.DataFrame(columns=COLUMNAS_TASAS)
+    hasta = dias[-1]
+    con.execute('DELETE FROM tasas_consumo WHERE "Hasta" IS NOT ?', (hasta,))
+    consumo = pd.read_sql_query(
+        'SELECT "Item", "Ubicación", dia, "Cantidad" FROM consumo_diario WHERE dia >= ? '
+        'AND NOT EXISTS (SELECT 1 FROM tasas_consumo t WHERE t."Item" = consumo_diario."Item" '
+        'AND t."Ubicación" = consumo_diario."Ubicación")',
+        con, params=[dias[0]],
+    )
+    nuevas = calcular_tasas(consumo, dias)
+    if not nuevas.empty:
+        con.executemany(
+            "INSERT INTO tasas_consumo VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            nuevas.assign(Hasta=hasta)[COLUMNAS_TASAS].astype(object).itertuples(index=False, name=None),
+        )
+    return pd.read_sql_query("SELECT * FROM tasas_consumo", con)
+
+
+def leer_tasas():
+    """Tasas de consumo diario en ml por (Item, Ubicación).
+
+    Sólo se recalculan las de los pares con ventas nuevas, o todas si llegó
+    un día nuevo; si nada cambió es una lectura de la tabla.
+    """
+    event_store.sincronizar(["ventas_procesadas"])
+
+    def consultar():
+        with perf.medir("consumo.tasas"):
+            return event_store.transaccion(actualizar_tasas)
+
+    return cache.obtener(("tasas", event_store.DB_PATH), event_store.firma(), consultar)
+
+
+event_store.registrar_derivado("utils.consumo", asegurar_tabla, aplicar, reconstruir)
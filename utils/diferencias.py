@@ -0,0 +1,98 @@
+"""Diferencias de las auditorías de apertura y cierre leídas del almacén.
+
+Junta en un solo DataFrame las filas de las tablas de auditoría (ver
+:data:`AUDITORIAS`) para el análisis de mermas (``core.mermas``). Las filas
+leídas quedan en memoria junto con la versión de cada archivo diario
+(``event_store.versiones``); en las lecturas siguientes sólo se vuelven a
+leer los días de auditoría que cambiaron.
+"""
+import threading
+
+import pandas as pd
+
+from utils import event_store, perf
+
+# Tipo de auditoría -> (tabla, columna de lo esperado, columna de lo contado)
+AUDITORIAS = {
+    "Apertura": ("auditoria_apertura", "Cierre anterior", "Conteo Apertura"),
+    "Cierre": ("auditoria_cierre", "Teorico", "Físico Cierre"),
+}
+
+_lock = threading.Lock()
+_leidas = {}  # DB_PATH -> (versiones de los archivos de auditoría, filas leídas)
+
+
+def _q(nombre):
+    return '"' + nombre.replace('"', '""') + '"'
+
+
+def _leer_auditorias(con, archivos=None):
+    """Filas de las auditorías (todas o sólo las de ``archivos``) con columnas comunes."""
+    partes = []
+    for tipo, (tabla, esperado, contado) in AUDITORIAS.items():
+        sql = (
+            f'SELECT _archivo, _dia AS "Fecha", \'{tipo}\' AS "Tipo", "Item", "Ubicación", '
+            f'{_q(esperado)} AS "Esperado", {_q(contado)} AS "Contado", "Diferencia" '
+            f'FROM {_q(tabla)} WHERE "Item" IS NOT NULL AND "Ubicación" IS NOT NULL'
+        )
+        params = []
+        if archivos is not None:
+            params = [a for t, a in archivos if t == tabla]
+            if not params:
+                continue
+            sql += " AND _archivo IN (" + ", ".join("?" * len(params)) + ")"
+        df = pd.read_sql_query(sql + " ORDER BY _archivo, _fila", con, params=params)
+        df["Fecha"] = pd.to_datetime(df["Fecha"], format="%Y-%m-%d", errors="coerce")
+        for col in ("Esperado", "Contado", "Diferencia"):
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(float)
+        partes.append(df)
+    return partes
+
+
+def leer():
+    """Diferencias de todas las auditorías de apertura y cierre en un solo DataFrame.
+
+    Una fila por fila de auditoría, con la fecha, el tipo, el par y lo
+    esperado, lo contado y la diferencia en ml. ``Fecha`` es una fecha y
+    ``Tipo``, ``Item`` y ``Ubicación`` son categorías. Se omiten los días aún
+    guardados en botellas (legado de ``auditorias_ml``).
+    """
+    tablas = [tabla for tabla, _, _ in AUDITORIAS.values()]
+    event_store.sincronizar(tablas)
+    with perf.medir("almacen.diferencias") as registro:
+        con = event_store.conectar()
+        try:
+            versiones = event_store.versiones(tablas, con)
+            with _lock:
+                previas, df = _leidas.get(event_store.DB_PATH, ({}, None))
+            cambiados = [k for k, v in versiones.items() if previas.get(k) != v]
+            quitados = [k for k in previas if k not in versiones]
+            if df is None:
+                partes = _leer_auditorias(con)
+            elif cambiados or quitados:
+                fuera = {a for _, a in cambiados + quitados}
+                partes = [df[~df["_archivo"].isin(fuera)], *_leer_auditorias(con, cambiados)]
+            else:
+                partes = None
+        finally:
+            con.close()
+        if partes is not None:
+            df = pd.concat(partes, ignore_index=True).sort_values(
+                ["Fecha", "Tipo"], kind="stable", ignore_index=True
+            )
+            with _lock:
+                _leidas[event_store.DB_PATH] = (versiones, df)
+        registro["archivos"] = len(cambiados) + len(quitados)
+        registro["filas"] = len(df)
+    legado = set(event_store.legado("auditorias_ml"))
+    if legado:
+        en_botellas = [
+            (AUDITORIAS[tipo][0], archivo) in legado
+            for tipo, archivo in zip(df["Tipo"], df["_archivo"])
+        ]
+        df = df[~pd.Series(en_botellas, index=df.index, dtype=bool)]
+    resultado = df.drop(columns="_archivo")
+    resultado["Tipo"] = pd.Categorical(resultado["Tipo"], categories=list(AUDITORIAS))
+    for col in ("Item", "Ubicación"):
+        resultado[col] = resultado[col].astype("category")
+    return resultado
@@ -0,0 +1,214 @@
+"""Escritor único del proceso para archivos y transacciones del almacén.
+
+Todas las sesiones de Streamlit comparten un mismo hilo escritor que atiende
+una cola de tareas: las transacciones de SQLite se aplican de a una (sin
+esperas por bloqueo entre sesiones) y los archivos se escriben de forma
+atómica (temporal en la misma carpeta + ``os.replace``) bajo un candado por
+archivo. Si se encolan varias escrituras del mismo archivo antes de que el
+hilo llegue a ellas, sólo se escribe la última y las anteriores terminan
+junto con ella.
+
+Las funciones públicas esperan el resultado por defecto, de modo que los
+errores llegan a quien escribió; :func:`metricas` expone la profundidad de
+la cola y las latencias de espera y escritura.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future
+
+from utils import perf
+
+MUESTRAS = 1000
+TEMPORAL_VIEJO = 3600  # s; un temporal más viejo no es de una escritura en curso
+PREFIJO_TEMPORAL = ".tmp_"
+
+_cola = queue.Queue()
+_lock = threading.Lock()
+_candados = {}  # ruta -> threading.Lock
+_ultima = {}  # ruta -> (secuencia, Future) de la escritura más reciente encolada
+_secuencia = 0
+_hilo = None
+_esperas = deque(maxlen=MUESTRAS)
+_duraciones = deque(maxlen=MUESTRAS)
+_contadores = {"completadas": 0, "coalescidas": 0, "errores": 0}
+_FIN = object()
+
+
+def _candado(ruta):
+    with _lock:
+        return _candados.setdefault(ruta, threading.Lock())
+
+
+def escribir_atomico(ruta, contenido):
+    """Escribe ``contenido`` (bytes) en ``ruta`` sin dejar archivos a medias."""
+    carpeta = os.path.dirname(ruta) or "."
+    os.makedirs(carpeta, exist_ok=True)
+    # Nombre propio de cada escritura: otro proceso sobre la misma carpeta
+    # (la app y el CLI) nunca comparte ni pisa el temporal
+    temporal = os.path.join(
+        carpeta, f"{PREFIJO_TEMPORAL}{os.getpid()}_{uuid.uuid4().hex[:8]}_{os.path.basename(ruta)}"
+    )
+    with _candado(os.path.abspath(ruta)):
+        try:
+            with open(temporal, "wb") as f:
+                f.write(contenido)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporal, ruta)
+        except BaseException:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+    return ruta
+
+
+def limpiar_temporales(carpeta, extension="", antiguedad=TEMPORAL_VIEJO):
+    """Borra los temporales de escrituras interrumpidas en ``carpeta``.
+
+    Sólo cuentan los que no se tocan hace más de ``antiguedad`` segundos: uno
+    reciente puede ser de una escritura en curso de este u otro proceso.
+    Devuelve cuántos se borraron.
+    """
+    if not os.path.isdir(carpeta):
+        return 0
+    limite = time.time() - antiguedad
+    borrados = 0
+    for entrada in os.scandir(carpeta):
+        if not (entrada.name.startswith(PREFIJO_TEMPORAL) and entrada.name.endswith(extension)):
+            continue
+        try:
+            if entrada.stat().st_mtime < limite:
+                os.remove(entrada.path)
+                borrados += 1
+        except FileNotFoundError:
+            continue  # la escritura terminó (o alguien más lo borró) entretanto
+    return borrados
+
+
+def _trabajar():
+    while True:
+        tarea = _cola.get()
+        if tarea is _FIN:
+            return
+        funcion, futuro, encolada, ruta, secuencia = tarea
+        if not futuro.set_running_or_notify_cancel():
+            continue
+        if ruta is not None:
+            with _lock:
+                vigente = _ultima.get(ruta)
+            if vigente is not None and vigente[0] != secuencia:
+                # Una escritura posterior del mismo archivo la reemplaza
+                vigente[1].add_done_callback(lambda f, destino=futuro: _copiar(f, destino))
+                _contadores["coalescidas"] += 1
+                continue
+        inicio = time.perf_counter()
+        try:
+            resultado = funcion()
+        except BaseException as e:
+            _contadores["errores"] += 1
+            futuro.set_exception(e)
+        else:
+            futuro.set_result(resultado)
+        finally:
+            fin = time.perf_counter()
+            _esperas.append(inicio - encolada)
+            _duraciones.append(fin - inicio)
+            _contadores["completadas"] += 1
+            if ruta is not None:
+                with _lock:
+                    if _ultima.get(ruta, (None,))[0] == secuencia:
+                        del _ultima[ruta]
+
+
+def _copiar(origen, destino):
+    if origen.exception() is not None:
+        destino.set_exception(origen.exception())
+    else:
+        destino.set_result(origen.result())
+
+
+def _iniciar():
+    global _hilo
+    with _lock:
+        if _hilo is None or not _hilo.is_alive():
+            _hilo = threading.Thread(target=_trabajar, name="escritor", daemon=True)
+            _hilo.start()
+
+
+def en_hilo_escritor():
+    return _hilo is not None and threading.current_thread() is _hilo
+
+
+def enviar(funcion, ruta=None):
+    """Encola ``funcion`` para el hilo escritor y devuelve un ``Future``.
+
+    ``ruta`` identifica el archivo que escribe la tarea, para coalescer
+    escrituras sucesivas del mismo destino.
+    """
+    global _secuencia
+    futuro = Future()
+    if en_hilo_escritor():
+        # Una tarea que encola otra se ejecuta en línea para no bloquearse
+        futuro.set_running_or_notify_cancel()
+        try:
+            futuro.set_result(funcion())
+        except BaseException as e:
+            futuro.set_exception(e)
+        return futuro
+    _iniciar()
+    with _lock:
+        _secuencia += 1
+        secuencia = _secuencia
+        if ruta is not None:
+            ruta = os.path.abspath(ruta)
+            _ultima[ruta] = (secuencia, futuro)
+    _cola.put((funcion, futuro, time.perf_counter(), ruta, secuencia))
+    return futuro
+
+
+def ejecutar(funcion):
+    """Ejecuta ``funcion`` en el hilo escritor y devuelve su resultado."""
+    return enviar(funcion).result()
+
+
+def escribir(ruta, contenido, esperar=True):
+    """Escribe ``contenido`` en ``ruta`` desde el hilo escritor, atómicamente."""
+    futuro = enviar(lambda: escribir_atomico(ruta, contenido), ruta=ruta)
+    if not esperar:
+        return futuro
+    with perf.medir("archivo.escribir", archivo=os.path.basename(ruta), bytes=len(contenido)):
+        return futuro.result()
+
+
+def metricas():
+    """Profundidad de la cola, contadores y latencias recientes (ms)."""
+    esperas = sorted(_esperas)
+    duraciones = sorted(_duraciones)
+
+    def media(valores):
+        return 1000 * sum(valores) / len(valores) if valores else 0.0
+
+    def p95(valores):
+        return 1000 * valores[int(0.95 * (len(valores) - 1))] if valores else 0.0
+
+    return {
+        "en_cola": _cola.qsize(),
+        **_contadores,
+        "espera_media_ms": media(esperas),
+        "espera_p95_ms": p95(esperas),
+        "escritura_media_ms": media(duraciones),
+        "escritura_p95_ms": p95(duraciones),
+    }
+
+
+@atexit.register
+def _drenar():
+    # Al cerrar el proceso se terminan las escrituras ya encoladas
+    if _hilo is not None and _hilo.is_alive():
+        _cola.put(_FIN)
+        _hilo.join(timeout=30)
@@ -0,0 +1,918 @@
+"""Almacén de movimientos y auditorías en SQLite.
+
+Cada tipo de registro (entradas, transferencias, ventas procesadas y
+auditorías) vive en una tabla tipada dentro de ``data/inventario.db``. Las
+filas conservan el archivo diario de origen (``<prefijo>_YYYY-MM-DD.xlsx``),
+de modo que el Excel de cada día puede regenerarse como exportación.
+
+Las escrituras sólo agregan filas a SQLite (una transacción por registro) y
+marcan el día como pendiente de exportar. La compactación materializa el
+Excel del día de forma atómica (archivo temporal + ``os.replace``) y sólo
+entonces quita la marca, así que un corte a mitad de escritura deja o bien la
+transacción revertida o bien el día pendiente, que :func:`recuperar` vuelve a
+compactar al iniciar la app.
+
+Las tablas derivadas (acumulados por día, consumo diario, alias del POS)
+viven en sus propios módulos, que se registran con
+:func:`registrar_derivado`: cada escritura de un archivo diario les pasa el
+efecto sobre el saldo antes y después, en la misma transacción. El almacén
+carga los módulos de :data:`DERIVADOS` antes de crear el esquema, así que
+ninguna escritura los saltea.
+
+Uso desde consola para la importación inicial del árbol de Excel y para
+materializar los días pendientes::
+
+    python -m utils.event_store importar
+    python -m utils.event_store compactar
+"""
+import importlib
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import pandas as pd
+
+from utils import cache, escritor, ingesta, perf, saldos
+from utils.excel_tools import to_excel_bytes
+from utils.path_utils import (
+    DATA_DIR,
+    ENTRADAS_DIR,
+    TRANSFERENCIAS_DIR,
+    VENTAS_PROCESADAS_DIR,
+    AUDITORIA_AP_DIR,
+    AUDITORIA_CI_DIR,
+    CIERRES_CONFIRMADOS_DIR,
+    asegurar_estructura,
+)
+
+DB_PATH = os.path.join(DATA_DIR, "inventario.db")
+
+TABLAS = {
+    "entradas": {
+        "carpeta": ENTRADAS_DIR,
+        "prefijo": "entradas",
+        "columnas": {
+            "Fecha": "TEXT",
+            "Item": "TEXT",
+            "Subcategoría": "TEXT",
+            "Ubicación destino": "TEXT",
+            "Cantidad": "REAL",
+        },
+    },
+    "transferencias": {
+        "carpeta": TRANSFERENCIAS_DIR,
+        "prefijo": "transferencias",
+        "columnas": {
+            "Fecha": "TEXT",
+            "Item": "TEXT",
+            "Desde": "TEXT",
+            "Hacia": "TEXT",
+            "Cantidad": "REAL",
+        },
+    },
+    "ventas_procesadas": {
+        "carpeta": VENTAS_PROCESADAS_DIR,
+        "prefijo": "ventas_procesadas",
+        "columnas": {
+            "Fecha": "TEXT",
+            "Producto vendido": "TEXT",
+            "Item usado": "TEXT",
+            "Subcategoría": "TEXT",
+            "Cantidad teórica consumida": "REAL",
+            "Ubicación de salida": "TEXT",
+            "Unidad": "TEXT",
+        },
+    },
+    "auditoria_apertura": {
+        "carpeta": AUDITORIA_AP_DIR,
+        "prefijo": "auditoria_apertura",
+        "columnas": {
+            "Item": "TEXT",
+            "Ubicación": "TEXT",
+            "Cierre anterior": "REAL",
+            "Conteo Apertura": "REAL",
+            "Diferencia": "REAL",
+        },
+    },
+    "auditoria_cierre": {
+        "carpeta": AUDITORIA_CI_DIR,
+        "prefijo": "auditoria_cierre",
+        "columnas": {
+            "Item": "TEXT",
+            "Ubicación": "TEXT",
+            "Físico Cierre": "REAL",
+            "Teorico": "REAL",
+            "Diferencia": "REAL",
+        },
+    },
+    "cierres_confirmados": {
+        "carpeta": CIERRES_CONFIRMADOS_DIR,
+        "prefijo": "auditoria_cierre",
+        "columnas": {
+            "Item": "TEXT",
+            "Ubicación": "TEXT",
+            "Físico Cierre": "REAL",
+            "Teorico": "REAL",
+            "Diferencia": "REAL",
+        },
+    },
+}
+
+# Nombres de columnas usados por versiones anteriores de los archivos.
+COLUMNAS_LEGADAS = {
+    "ventas_procesadas": {
+        "Producto_vendido": "Producto vendido",
+        "Ingrediente": "Item usado",
+        "Cantidad_consumida": "Cantidad teórica consumida",
+    },
+    "cierres_confirmados": {"Conteo Cierre": "Físico Cierre"},
+    "auditoria_cierre": {"Conteo Cierre": "Físico Cierre"},
+}
+
+# Módulos con tablas derivadas; se registran al importarse
+DERIVADOS = ("utils.acumulados", "utils.consumo", "utils.alias_pos")
+
+# Conversiones de datos guardados en un formato anterior: nombre -> tablas.
+# Al registrarse una conversión, los archivos que ya había en esas tablas (y
+# los Excel más viejos que se importen mientras siga pendiente) quedan como
+# legado hasta que se conviertan o se vuelvan a escribir.
+MIGRACIONES = {
+    "ventas_bot_ml": ("ventas_procesadas",),  # ventas BOT en botellas
+    # Conteos de auditoría guardados en botellas
+    "auditorias_ml": ("auditoria_apertura", "auditoria_cierre", "cierres_confirmados"),
+}
+
+_lock = threading.Lock()
+_esquema_listo = set()
+_mtime_carpetas = {}
+_version = 0  # escrituras hechas por este proceso, parte de la firma de caché
+_recuperado = set()
+_derivados = {}  # módulo -> (asegurar_tabla, aplicar, reconstruir)
+_fallidos = {}  # (tabla, archivo) -> error de la última importación
+
+
+def _firma_almacen():
+    return cache.firma(DB_PATH, DB_PATH + "-wal") + (_version,)
+
+
+def firma():
+    """Firma actual del almacén, para claves de caché de datos derivados."""
+    return _firma_almacen()
+
+
+def _almacen_modificado():
+    global _version
+    with _lock:
+        _version += 1
+    cache.invalidar(DB_PATH)
+
+
+def _q(nombre):
+    return '"' + nombre.replace('"', '""') + '"'
+
+
+def conectar(db_path=None):
+    """Abre una conexión al almacén y garantiza que el esquema exista."""
+    db_path = db_path or DB_PATH
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    con = sqlite3.connect(db_path, timeout=30)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    if db_path not in _esquema_listo:
+        _cargar_derivados()
+    with _lock:
+        if db_path not in _esquema_listo:
+            _crear_esquema(con)
+            _esquema_listo.add(db_path)
+    return con
+
+
+def registrar_derivado(nombre, asegurar_tabla, aplicar=None, reconstruir=None):
+    """Registra las tablas derivadas del módulo ``nombre``.
+
+    ``asegurar_tabla(con)`` crea las tablas y devuelve True si no existían;
+    entonces se llama ``reconstruir(con)``, que también corre al reconstruir
+    el saldo (:func:`verificar_saldos`). ``aplicar(con, tabla, dia, antes,
+    despues)`` recibe cada escritura de un archivo diario con su efecto por
+    par antes y después (``utils.saldos``).
+    """
+    with _lock:
+        _derivados[nombre] = (asegurar_tabla, aplicar, reconstruir)
+        # Un registro tardío crea sus tablas en la próxima conexión
+        _esquema_listo.clear()
+
+
+def _cargar_derivados():
+    for modulo in DERIVADOS:
+        importlib.import_module(modulo)
+
+
+def _aplicar_derivados(con, tabla, dia, antes, despues):
+    saldos.aplicar(con, antes, despues)
+    for _, aplicar, _ in list(_derivados.values()):
+        if aplicar is not None:
+            aplicar(con, tabla, dia, antes, despues)
+
+
+def _reconstruir_derivados(con):
+    saldos.reconstruir(con)
+    for _, _, reconstruir in list(_derivados.values()):
+        if reconstruir is not None:
+            reconstruir(con)
+
+
+def consultar(funcion):
+    """Devuelve ``funcion(con)`` con una conexión de lectura que después se cierra."""
+    con = conectar()
+    try:
+        return funcion(con)
+    finally:
+        con.close()
+
+
+def transaccion(funcion):
+    """Ejecuta ``funcion(con)`` dentro de una transacción en el hilo escritor.
+
+    Las escrituras de todas las sesiones pasan de a una por el mismo hilo, así
+    que nunca compiten por el bloqueo de SQLite.
+    """
+    def tarea():
+        con = conectar()
+        try:
+            with con:
+                return funcion(con)
+        finally:
+            con.close()
+    return escritor.ejecutar(tarea)
+
+
+def escribir(funcion):
+    """Como :func:`transaccion`, para cambios que deben verse en las lecturas.
+
+    Al terminar invalida las cachés que dependen de la firma del almacén.
+    """
+    try:
+        return transaccion(funcion)
+    finally:
+        _almacen_modificado()
+
+
+def _crear_esquema(con):
+    for tabla, spec in TABLAS.items():
+        cols = ", ".join(f"{_q(c)} {t}" for c, t in spec["columnas"].items())
+        con.execute(
+            f"CREATE TABLE IF NOT EXISTS {_q(tabla)} "
+            f"(_archivo TEXT NOT NULL, _dia TEXT, _fila INTEGER, {cols})"
+        )
+        con.execute(
+            f"CREATE INDEX IF NOT EXISTS {_q('ix_' + tabla + '_archivo')} "
+            f"ON {_q(tabla)} (_archivo, _fila)"
+        )
+        con.execute(
+            f"CREATE INDEX IF NOT EXISTS {_q('ix_' + tabla + '_dia')} ON {_q(tabla)} (_dia)"
+        )
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS _importados "
+        "(tabla TEXT, archivo TEXT, mtime_ns INTEGER, size INTEGER, "
+        "PRIMARY KEY (tabla, archivo))"
+    )
+    # Días cuyo Excel quedó desactualizado respecto del almacén. ``version``
+    # crece con cada escritura para no perder una que llegue durante la
+    # compactación.
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS _pendientes "
+        "(tabla TEXT, archivo TEXT, dia TEXT, version INTEGER NOT NULL DEFAULT 1, "
+        "PRIMARY KEY (tabla, archivo))"
+    )
+    # Versión de cada archivo diario: crece con cada escritura y no se borra
+    # al compactar, así lo derivado de un día se recalcula sólo si cambió
+    existe = con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = '_versiones'"
+    ).fetchone()
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS _versiones "
+        "(tabla TEXT, archivo TEXT, dia TEXT, version INTEGER NOT NULL DEFAULT 1, "
+        "PRIMARY KEY (tabla, archivo))"
+    )
+    if existe is None:
+        for tabla in TABLAS:
+            con.execute(
+                f"INSERT OR IGNORE INTO _versiones (tabla, archivo, dia) "
+                f"SELECT DISTINCT ?, _archivo, _dia FROM {_q(tabla)}",
+                (tabla,),
+            )
+    _registrar_migraciones(con)
+    if saldos.asegurar_tabla(con):
+        # Almacenes creados antes de existir el saldo: se calcula una vez
+        saldos.reconstruir(con)
+    for asegurar_tabla, _, reconstruir in list(_derivados.values()):
+        if asegurar_tabla(con) and reconstruir is not None:
+            reconstruir(con)
+    con.commit()
+
+
+def nombre_archivo(tabla, fecha):
+    """Nombre del archivo diario asociado a ``tabla`` para ``fecha``."""
+    return f"{TABLAS[tabla]['prefijo']}_{fecha}.xlsx"
+
+
+def dia_de_archivo(tabla, archivo):
+    """Fecha (``YYYY-MM-DD``) del archivo diario ``archivo`` de ``tabla``."""
+    base = os.path.basename(archivo).replace(".xlsx", "")
+    return base.replace(f"{TABLAS[tabla]['prefijo']}_", "", 1)
+
+
+def normalizar(tabla, df):
+    """Devuelve ``df`` con las columnas y tipos del esquema de ``tabla``."""
+    columnas = TABLAS[tabla]["columnas"]
+    df = df.rename(columns=lambda c: str(c).strip())
+    legadas = {
+        k: v for k, v in COLUMNAS_LEGADAS.get(tabla, {}).items()
+        if k in df.columns and v not in df.columns
+    }
+    df = df.rename(columns=legadas).reindex(columns=list(columnas))
+    for col, tipo in columnas.items():
+        if tipo == "REAL":
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+        elif col == "Fecha":
+            fechas = pd.to_datetime(df[col], errors="coerce")
+            texto = df[col].astype(object).where(df[col].notna(), None)
+            df[col] = fechas.dt.strftime("%Y-%m-%d").where(fechas.notna(), texto)
+            df[col] = df[col].astype(object)
+        else:
+            df[col] = df[col].astype(object).where(df[col].notna(), None)
+            df[col] = df[col].map(lambda v: v if v is None else str(v))
+    return df.reset_index(drop=True)
+
+
+def _insertar(con, tabla, df, archivo, dia, inicio=0):
+    columnas = list(TABLAS[tabla]["columnas"])
+    sql = (
+        f"INSERT INTO {_q(tabla)} (_archivo, _dia, _fila, "
+        + ", ".join(_q(c) for c in columnas)
+        + ") VALUES (" + ", ".join("?" * (len(columnas) + 3)) + ")"
+    )
+    valores = df[columnas].astype(object).where(df[columnas].notna(), None)
+    filas = (
+        (archivo, dia, inicio + i, *fila)
+        for i, fila in enumerate(valores.itertuples(index=False, name=None))
+    )
+    con.executemany(sql, filas)
+
+
+def _siguiente_fila(con, tabla, archivo):
+    fila = con.execute(
+        f"SELECT COALESCE(MAX(_fila) + 1, 0) FROM {_q(tabla)} WHERE _archivo = ?",
+        (archivo,),
+    ).fetchone()
+    return fila[0]
+
+
+def _filas_nuevas(con, tabla, df, archivo, columnas):
+    """Filas de ``df`` que no repiten (en ``columnas``) otra del día ni del lote."""
+    df = df.drop_duplicates(subset=columnas, keep="first")
+    existentes = {
+        tuple(f) for f in con.execute(
+            "SELECT " + ", ".join(_q(c) for c in columnas)
+            + f" FROM {_q(tabla)} WHERE _archivo = ?",
+            (archivo,),
+        )
+    }
+    if not existentes:
+        return df
+    claves = df[columnas].astype(object).where(df[columnas].notna(), None)
+    nuevas = [fila not in existentes for fila in claves.itertuples(index=False, name=None)]
+    return df[nuevas]
+
+
+def _nueva_version(con, tabla, archivo, dia):
+    con.execute(
+        "INSERT INTO _versiones (tabla, archivo, dia) VALUES (?, ?, ?) "
+        "ON CONFLICT (tabla, archivo) DO UPDATE SET version = version + 1",
+        (tabla, archivo, dia),
+    )
+
+
+def _registrar_migraciones(con):
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS _migraciones "
+        "(nombre TEXT PRIMARY KEY, registrada INTEGER NOT NULL, aplicada TEXT)"
+    )
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS _legado "
+        "(migracion TEXT, tabla TEXT, archivo TEXT, PRIMARY KEY (migracion, tabla, archivo))"
+    )
+    for nombre, tablas in MIGRACIONES.items():
+        nueva = con.execute(
+            "INSERT OR IGNORE INTO _migraciones (nombre, registrada) VALUES (?, ?)",
+            (nombre, time.time_ns()),
+        ).rowcount
+        if nueva:
+            # Todo lo guardado hasta ahora se escribió con el formato anterior
+            con.execute(
+                "INSERT OR IGNORE INTO _legado SELECT ?, tabla, archivo FROM _versiones "
+                "WHERE tabla IN (" + ", ".join("?" * len(tablas)) + ")",
+                (nombre, *tablas),
+            )
+
+
+def _marcar_legado_importado(con, tabla, archivo, mtime_ns):
+    """Un Excel anterior a una conversión pendiente de su tabla queda como legado.
+
+    Reimportar un día que ya era legado no lo desmarca: sólo lo hace volver a
+    escribirlo desde la app o aplicar la conversión.
+    """
+    for nombre, tablas in MIGRACIONES.items():
+        if tabla in tablas:
+            con.execute(
+                "INSERT OR IGNORE INTO _legado SELECT nombre, ?, ? FROM _migraciones "
+                "WHERE nombre = ? AND aplicada IS NULL AND registrada > ?",
+                (tabla, archivo, nombre, mtime_ns),
+            )
+
+
+def legado(migracion):
+    """Archivos diarios ``(tabla, archivo)`` que la conversión ``migracion`` aún debe convertir."""
+    return consultar(lambda con: con.execute(
+        "SELECT tabla, archivo FROM _legado WHERE migracion = ? ORDER BY tabla, archivo",
+        (migracion,),
+    ).fetchall())
+
+
+def es_legado(tabla, archivo):
+    """True si el archivo diario sigue en el formato anterior a alguna conversión."""
+    return consultar(lambda con: con.execute(
+        "SELECT 1 FROM _legado WHERE tabla = ? AND archivo = ?", (tabla, archivo)
+    ).fetchone() is not None)
+
+
+def migracion_aplicada(migracion):
+    """Fecha y hora en que se aplicó ``migracion`` (None si sigue pendiente)."""
+    fila = consultar(lambda con: con.execute(
+        "SELECT aplicada FROM _migraciones WHERE nombre = ?", (migracion,)
+    ).fetchone())
+    return fila[0] if fila else None
+
+
+def migrar(migracion, registros):
+    """Aplica una conversión de una vez: registra ``registros`` y la da por hecha.
+
+    ``registros`` son ``(tabla, df, fecha, modo)`` como en :func:`guardar_varios`,
+    ya convertidos. En la misma transacción se quitan las marcas de legado de
+    la conversión y se anota cuándo se aplicó, así que no vuelve a ofrecerse.
+    """
+    escrituras = [_escritura(*registro) for registro in registros]
+    ahora = time.strftime("%Y-%m-%d %H:%M:%S")
+
+    def escribir(con):
+        for _, _, funcion in escrituras:
+            funcion(con)
+        con.execute("DELETE FROM _legado WHERE migracion = ?", (migracion,))
+        con.execute("UPDATE _migraciones SET aplicada = ? WHERE nombre = ?", (ahora, migracion))
+
+    try:
+        with perf.medir("almacen.migrar", migracion=migracion, registros=len(escrituras)):
+            transaccion(escribir)
+    finally:
+        _almacen_modificado()
+    return [archivo for archivo, _, _ in escrituras]
+
+
+def _marcar_pendiente(con, tabla, archivo, dia):
+    con.execute(
+        "INSERT INTO _pendientes (tabla, archivo, dia) VALUES (?, ?, ?) "
+        "ON CONFLICT (tabla, archivo) DO UPDATE SET version = version + 1",
+        (tabla, archivo, dia),
+    )
+
+
+def _escritura(tabla, df, fecha, modo="agregar", unicos=None):
+    """Normaliza ``df`` y arma la función que lo escribe dentro de una transacción."""
+    archivo = nombre_archivo(tabla, fecha)
+    df = normalizar(tabla, df)
+
+    def escribir(con):
+        filas = df
+        if unicos:
+            filas = _filas_nuevas(con, tabla, filas, archivo, unicos)
+        if modo == "reemplazar" or tabla == "cierres_confirmados":
+            antes = saldos.estado(con, tabla, archivo)
+        else:
+            # Agregar filas suma exactamente su efecto: no hace falta
+            # releer el día completo.
+            antes = saldos.efecto(tabla, pd.DataFrame())
+        if modo == "reemplazar":
+            con.execute(f"DELETE FROM {_q(tabla)} WHERE _archivo = ?", (archivo,))
+            inicio = 0
+        else:
+            inicio = _siguiente_fila(con, tabla, archivo)
+        _insertar(con, tabla, filas, archivo, fecha, inicio)
+        if modo == "reemplazar" or tabla == "cierres_confirmados":
+            despues = saldos.estado(con, tabla, archivo)
+        else:
+            despues = saldos.efecto(tabla, filas)
+        _aplicar_derivados(con, tabla, fecha, antes, despues)
+        _nueva_version(con, tabla, archivo, fecha)
+        if modo == "reemplazar":
+            # El día entero queda escrito con el formato actual
+            con.execute("DELETE FROM _legado WHERE tabla = ? AND archivo = ?", (tabla, archivo))
+        _marcar_pendiente(con, tabla, archivo, fecha)
+
+    return archivo, df, escribir
+
+
+def guardar(tabla, df, fecha, modo="agregar", exportar=False, unicos=None):
+    """Registra ``df`` como movimientos de ``fecha`` en ``tabla``.
+
+    ``modo="agregar"`` añade las filas al día; ``modo="reemplazar"`` sustituye
+    todas las filas existentes del día. Con ``unicos`` (lista de columnas) se
+    omiten las filas que repiten otra ya registrada ese día. El Excel diario
+    queda pendiente de compactar; si ``exportar`` es verdadero se materializa
+    en el momento.
+    """
+    archivo, df, escribir = _escritura(tabla, df, fecha, modo, unicos)
+    try:
+        with perf.medir("almacen.guardar", tabla=tabla, filas=len(df)):
+            transaccion(escribir)
+    finally:
+        _almacen_modificado()
+    if exportar:
+        compactar(tabla, fecha)
+    return archivo
+
+
+def guardar_varios(registros):
+    """Registra varios ``(tabla, df, fecha, modo)`` en una sola transacción.
+
+    Si alguno falla no queda ninguno escrito. Devuelve los nombres de los
+    archivos diarios, en el mismo orden; quedan pendientes de compactar.
+    """
+    escrituras = [_escritura(*registro) for registro in registros]
+
+    def escribir(con):
+        for _, _, funcion in escrituras:
+            funcion(con)
+
+    try:
+        with perf.medir(
+            "almacen.guardar_varios", registros=len(escrituras),
+            filas=sum(len(df) for _, df, _ in escrituras),
+        ):
+            transaccion(escribir)
+    finally:
+        _almacen_modificado()
+    return [archivo for archivo, _, _ in escrituras]
+
+
+def leer(tabla, fecha=None, archivos=None, incluir_origen=False):
+    """Lee las filas de ``tabla`` (opcionalmente sólo un día o ciertos archivos)."""
+    _sincronizar_si_cambio(tabla)
+    archivos = None if archivos is None else tuple(archivos)
+    clave = ("almacen", DB_PATH, tabla, fecha, archivos, incluir_origen)
+    with perf.medir("almacen.leer", tabla=tabla) as registro:
+        df = cache.obtener(
+            clave, _firma_almacen(), lambda: _consultar(tabla, fecha, archivos, incluir_origen)
+        )
+        registro["filas"] = len(df)
+    return df
+
+
+def _consultar(tabla, fecha, archivos, incluir_origen):
+    columnas = list(TABLAS[tabla]["columnas"])
+    select = ", ".join(_q(c) for c in columnas)
+    if incluir_origen:
+        select = "_archivo, " + select
+    sql = f"SELECT {select} FROM {_q(tabla)}"
+    params = []
+    if fecha is not None:
+        sql += " WHERE _archivo = ?"
+        params.append(nombre_archivo(tabla, fecha))
+    elif archivos is not None:
+        archivos = list(archivos)
+        if not archivos:
+            return _vacio(tabla, incluir_origen)
+        sql += " WHERE _archivo IN (" + ", ".join("?" * len(archivos)) + ")"
+        params.extend(archivos)
+    sql += " ORDER BY _archivo, _fila"
+    con = conectar()
+    try:
+        df = pd.read_sql_query(sql, con, params=params)
+    finally:
+        con.close()
+    return _tipar(tabla, df)
+
+
+def _vacio(tabla, incluir_origen=False):
+    columnas = list(TABLAS[tabla]["columnas"])
+    if incluir_origen:
+        columnas = ["_archivo"] + columnas
+    return _tipar(tabla, pd.DataFrame(columns=columnas))
+
+
+def _tipar(tabla, df):
+    for col, tipo in TABLAS[tabla]["columnas"].items():
+        if tipo == "REAL":
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(float)
+        else:
+            df[col] = df[col].astype(object)
+    return df
+
+
+def archivos(tabla):
+    """Lista ordenada de archivos diarios con filas en ``tabla``."""
+    _sincronizar_si_cambio(tabla)
+
+    def consultar():
+        con = conectar()
+        try:
+            filas = con.execute(
+                f"SELECT DISTINCT _archivo FROM {_q(tabla)} ORDER BY _archivo"
+            ).fetchall()
+        finally:
+            con.close()
+        return tuple(f[0] for f in filas)
+
+    return list(cache.obtener(("archivos", DB_PATH, tabla), _firma_almacen(), consultar))
+
+
+def leer_saldos():
+    """Saldo corriente persistido en ml, indexado por (Item, Ubicación)."""
+    for tabla in saldos.TABLAS_CON_EFECTO:
+        _sincronizar_si_cambio(tabla)
+
+    def consultar():
+        con = conectar()
+        try:
+            return saldos.leer_saldos(con)
+        finally:
+            con.close()
+
+    return cache.obtener(("saldos", DB_PATH), _firma_almacen(), consultar)
+
+
+def versiones(tablas, con=None):
+    """Versión de cada archivo diario de ``tablas``: dict (tabla, archivo) -> versión.
+
+    La versión crece con cada escritura del archivo, así que lo derivado de
+    un día puede recalcularse sólo cuando cambió.
+    """
+    tablas = list(tablas)
+
+    def leer_versiones(con):
+        return {
+            (t, a): v for t, a, v in con.execute(
+                "SELECT tabla, archivo, version FROM _versiones WHERE tabla IN ("
+                + ", ".join("?" * len(tablas)) + ")",
+                tablas,
+            )
+        }
+
+    return consultar(leer_versiones) if con is None else leer_versiones(con)
+
+
+def verificar_saldos(reconstruir=False):
+    """Compara el saldo incremental con un recálculo completo.
+
+    Devuelve los pares que difieren; con ``reconstruir`` el saldo y las
+    tablas derivadas registradas (acumulados, consumo por día) se regeneran
+    desde cero después de la comparación.
+    """
+    con = conectar()
+    try:
+        diferencias = saldos.verificar(con)
+    finally:
+        con.close()
+    if reconstruir:
+        escribir(_reconstruir_derivados)
+    return diferencias
+
+
+def leer_ultimo(tabla):
+    """Devuelve (DataFrame, archivo) del día más reciente de ``tabla``."""
+    nombres = archivos(tabla)
+    if not nombres:
+        return _vacio(tabla), None
+    return leer(tabla, archivos=[nombres[-1]]), nombres[-1]
+
+
+def exportar_excel(tabla, fecha, destino=None):
+    """Escribe el Excel diario de ``tabla`` a partir del almacén.
+
+    El archivo se escribe desde el hilo escritor en un temporal de la misma
+    carpeta que luego reemplaza al definitivo, de modo que nunca queda un
+    Excel a medio escribir.
+    """
+    archivo = nombre_archivo(tabla, fecha)
+    destino = destino or os.path.join(TABLAS[tabla]["carpeta"], archivo)
+    escritor.escribir(destino, to_excel_bytes(leer(tabla, fecha=fecha)))
+    cache.invalidar(destino)
+    _registrar_importado(tabla, destino)
+    return destino
+
+
+def pendientes(tabla=None):
+    """Lista de (tabla, día) cuyo Excel aún no refleja el almacén."""
+    con = conectar()
+    try:
+        sql = "SELECT tabla, dia FROM _pendientes"
+        params = ()
+        if tabla is not None:
+            sql += " WHERE tabla = ?"
+            params = (tabla,)
+        return con.execute(sql + " ORDER BY tabla, dia", params).fetchall()
+    finally:
+        con.close()
+
+
+def compactar(tabla=None, fecha=None):
+    """Materializa los Excel diarios pendientes (opcionalmente filtrados).
+
+    La marca de pendiente se quita sólo si nadie escribió el día mientras se
+    exportaba; si la exportación falla la marca se conserva y el día se
+    reintenta en la siguiente compactación. Devuelve las rutas escritas.
+    """
+    where, params = [], []
+    if tabla is not None:
+        where.append("tabla = ?")
+        params.append(tabla)
+    if fecha is not None:
+        where.append("dia = ?")
+        params.append(str(fecha))
+    sql = "SELECT tabla, archivo, dia, version FROM _pendientes"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    con = conectar()
+    try:
+        lote = con.execute(sql + " ORDER BY tabla, dia", params).fetchall()
+        escritos = []
+        for t, archivo, dia, version in lote:
+            escritos.append(exportar_excel(t, dia))
+            transaccion(lambda c, clave=(t, archivo, version): c.execute(
+                "DELETE FROM _pendientes WHERE tabla = ? AND archivo = ? AND version = ?", clave
+            ))
+    finally:
+        con.close()
+    return escritos
+
+
+def recuperar():
+    """Completa lo que un corte pudo dejar a medias (una vez por proceso).
+
+    Borra los temporales viejos de exportaciones interrumpidas (los recientes
+    pueden ser de una escritura en curso de otro proceso, como la app mientras
+    corre el CLI) y compacta los días
+    pendientes. Los errores de compactación se ignoran: el día sigue marcado y
+    se reintenta más adelante.
+    """
+    with _lock:
+        if DB_PATH in _recuperado:
+            return
+        _recuperado.add(DB_PATH)
+    for spec in TABLAS.values():
+        escritor.limpiar_temporales(spec["carpeta"], ".xlsx")
+    for tabla, dia in pendientes():
+        try:
+            compactar(tabla, dia)
+        except Exception:
+            continue
+
+
+def _registrar_importado(tabla, ruta, con=None):
+    info = os.stat(ruta)
+    fila = (tabla, os.path.basename(ruta), info.st_mtime_ns, info.st_size)
+
+    def registrar(con):
+        con.execute("INSERT OR REPLACE INTO _importados VALUES (?, ?, ?, ?)", fila)
+
+    if con is None:
+        transaccion(registrar)
+    else:
+        registrar(con)
+
+
+def _reemplazar_archivo(con, tabla, ruta, df):
+    archivo = os.path.basename(ruta)
+    dia = dia_de_archivo(tabla, archivo)
+    antes = saldos.estado(con, tabla, archivo)
+    con.execute(f"DELETE FROM {_q(tabla)} WHERE _archivo = ?", (archivo,))
+    _insertar(con, tabla, df, archivo, dia)
+    despues = saldos.estado(con, tabla, archivo)
+    _aplicar_derivados(con, tabla, dia, antes, despues)
+    _nueva_version(con, tabla, archivo, dia)
+    _marcar_legado_importado(con, tabla, archivo, os.stat(ruta).st_mtime_ns)
+    _registrar_importado(tabla, ruta, con)
+
+
+def _columnas_de(tabla):
+    return ingesta.Columnas(
+        list(TABLAS[tabla]["columnas"]) + list(COLUMNAS_LEGADAS.get(tabla, {}))
+    )
+
+
+def _candidatos(con, tabla, forzar):
+    carpeta = TABLAS[tabla]["carpeta"]
+    prefijo = TABLAS[tabla]["prefijo"]
+    if not os.path.isdir(carpeta):
+        return []
+    conocidos = {
+        a: (m, s) for a, m, s in con.execute(
+            "SELECT archivo, mtime_ns, size FROM _importados WHERE tabla = ?",
+            (tabla,),
+        )
+    }
+    # Mientras un día está pendiente el almacén tiene filas que el
+    # Excel todavía no refleja: manda el almacén.
+    en_espera = {
+        a for (a,) in con.execute(
+            "SELECT archivo FROM _pendientes WHERE tabla = ?", (tabla,)
+        )
+    }
+    rutas = []
+    for entrada in sorted(os.scandir(carpeta), key=lambda e: e.name):
+        if not (entrada.name.startswith(f"{prefijo}_") and entrada.name.endswith(".xlsx")):
+            continue
+        if entrada.name in en_espera:
+            continue
+        info = entrada.stat()
+        if not forzar and conocidos.get(entrada.name) == (info.st_mtime_ns, info.st_size):
+            continue
+        rutas.append(entrada.path)
+    return rutas
+
+
+def importar_desde_excel(tablas=None, forzar=False):
+    """Importa al almacén los Excel diarios existentes.
+
+    Sólo se procesan archivos nuevos o modificados desde la última
+    importación, salvo que ``forzar`` sea verdadero. Los archivos de cada
+    tabla se leen en paralelo; los que no se pueden leer quedan en
+    :func:`fallidos` y se reintentan en la siguiente importación. Devuelve la
+    cantidad de archivos importados.
+    """
+    importados = 0
+    con = conectar()
+    try:
+        for tabla in tablas or TABLAS:
+            rutas = _candidatos(con, tabla, forzar)
+            if not rutas:
+                continue
+            leidos, errores = ingesta.leer_excels(rutas, usecols=_columnas_de(tabla))
+            with _lock:
+                for ruta in leidos:
+                    _fallidos.pop((tabla, os.path.basename(ruta)), None)
+                for fallo in errores:
+                    _fallidos[(tabla, os.path.basename(fallo["archivo"]))] = fallo["error"]
+            for ruta, df in leidos.items():
+                df = normalizar(tabla, df)
+                transaccion(lambda c, t=tabla, r=ruta, d=df: _reemplazar_archivo(c, t, r, d))
+                importados += 1
+    finally:
+        con.close()
+        if importados:
+            _almacen_modificado()
+    return importados
+
+
+def fallidos():
+    """Archivos que no se pudieron importar: lista de dicts tabla/archivo/error."""
+    with _lock:
+        return [
+            {"tabla": t, "archivo": a, "error": e} for (t, a), e in sorted(_fallidos.items())
+        ]
+
+
+def _sincronizar_si_cambio(tabla):
+    """Importa Excel copiados a mano a la carpeta si ésta cambió."""
+    carpeta = TABLAS[tabla]["carpeta"]
+    try:
+        mtime = os.stat(carpeta).st_mtime_ns
+    except FileNotFoundError:
+        return
+    if _mtime_carpetas.get((DB_PATH, tabla)) == mtime:
+        return
+    importar_desde_excel([tabla])
+    _mtime_carpetas[(DB_PATH, tabla)] = mtime
+
+
+def sincronizar(tablas=None):
+    """Importa los Excel nuevos o modificados de las carpetas de ``tablas`` (o todas)."""
+    for tabla in TABLAS if tablas is None else tablas:
+        _sincronizar_si_cambio(tabla)
+
+
+if __name__ == "__main__":
+    asegurar_estructura()
+    comando = sys.argv[1] if len(sys.argv) > 1 else ""
+    if comando == "importar":
+        total = importar_desde_excel(forzar="--forzar" in sys.argv[2:])
+        print(f"Archivos importados: {total}")
+        for fallo in fallidos():
+            print(f"No se pudo leer {fallo['archivo']} ({fallo['tabla']}): {fallo['error']}")
+    elif comando == "compactar":
+        escritos = compactar()
+        print(f"Archivos materializados: {len(escritos)}")
+    else:
+        print("Uso: python -m utils.event_store [importar [--forzar]|compactar]")
+        sys.exit(1)
@@ -1,6 +1,8 @@
 import io
 import pandas as pd
 
+from utils import cache
+
 
 def to_excel_bytes(df):
     output = io.BytesIO()
@@ -18,3 +20,18 @@ def to_excel_bytes_multiple_sheets(sheets: dict):
             df.to_excel(writer, index=False, sheet_name=name)
     return output.getvalue()
 
+
+def excel_diferido(df):
+    """Callable para ``st.download_button`` que arma el Excel al descargar.
+
+    El resultado se memoiza por el contenido de ``df``.
+    """
+    return lambda: cache.memoizar_artefacto("excel", df, lambda: to_excel_bytes(df))
+
+
+def archivo_diferido(ruta):
+    """Callable para ``st.download_button`` que lee ``ruta`` al descargar."""
+    def leer():
+        with open(ruta, "rb") as f:
+            return f.read()
+    return leer
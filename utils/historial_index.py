@@ -0,0 +1,195 @@
+"""Índice consolidado del historial de movimientos y auditorías.
+
+El historial es una vista SQL (``historial``) sobre las tablas del almacén con
+columnas normalizadas: Fecha, Item, Ubicación, Subcategoría, Cantidad, Tipo
+operación y Origen archivo. Como el almacén importa cada Excel nuevo o
+modificado una sola vez, el índice se mantiene al día de forma incremental.
+Los filtros de fecha, ítem, ubicación y subcategoría se resuelven dentro de
+la consulta y los resultados se leen por páginas.
+
+Una página no ordena todo el historial filtrado: cada tabla entrega sólo sus
+primeras ``(página + 1) * por_pagina`` filas, recorriendo su índice por
+``(_dia DESC, _fila)``, y se ordena la unión de esos recortes. El costo crece
+con el número de página, no con el tamaño del historial.
+"""
+import threading
+
+import pandas as pd
+
+from utils import cache, event_store
+
+# Tipo de operación mostrado -> (tabla, columna Item, Ubicación, Subcategoría, Cantidad)
+FUENTES = {
+    "Entradas": ("entradas", "Item", "Ubicación destino", "Subcategoría", "Cantidad"),
+    "Transferencias": ("transferencias", "Item", "Hacia", None, "Cantidad"),
+    "Ventas procesadas": (
+        "ventas_procesadas", "Producto vendido", "Ubicación de salida", "Subcategoría",
+        "Cantidad teórica consumida",
+    ),
+    "Auditoría apertura": ("auditoria_apertura", "Item", "Ubicación", None, "Conteo Apertura"),
+    "Auditoría cierre": ("auditoria_cierre", "Item", "Ubicación", None, "Físico Cierre"),
+    "Cierres confirmados": ("cierres_confirmados", "Item", "Ubicación", None, "Físico Cierre"),
+}
+
+COLUMNAS = [
+    "Fecha",
+    "Item",
+    "Ubicación",
+    "Subcategoría",
+    "Cantidad",
+    "Tipo operación",
+    "Origen archivo",
+]
+
+_lock = threading.Lock()
+_vista_lista = set()
+
+
+def _q(nombre):
+    return '"' + nombre.replace('"', '""') + '"'
+
+
+def _seleccion(tipo):
+    """SELECT de la tabla de ``tipo`` con las columnas normalizadas del historial."""
+    tabla, c_item, c_ubic, c_subcat, c_cant = FUENTES[tipo]
+    fecha = "COALESCE(\"Fecha\", _dia)" if "Fecha" in event_store.TABLAS[tabla]["columnas"] else "_dia"
+    subcat = _q(c_subcat) if c_subcat else "NULL"
+    return (
+        f"SELECT _dia, _fila, {fecha} AS \"Fecha\", {_q(c_item)} AS \"Item\", "
+        f"{_q(c_ubic)} AS \"Ubicación\", {subcat} AS \"Subcategoría\", "
+        f"{_q(c_cant)} AS \"Cantidad\", '{tipo}' AS \"Tipo operación\", "
+        f"_archivo AS \"Origen archivo\" FROM {_q(tabla)}"
+    )
+
+
+def _crear_vista(con):
+    partes = []
+    for tipo, (tabla, c_item, c_ubic, _, _) in FUENTES.items():
+        partes.append(_seleccion(tipo))
+        # Recorrido de las páginas (más recientes primero) sin ordenar la tabla
+        con.execute(
+            f"CREATE INDEX IF NOT EXISTS {_q('ix_' + tabla + '_dia_fila')} "
+            f"ON {_q(tabla)} (_dia DESC, _fila)"
+        )
+        con.execute(
+            f"CREATE INDEX IF NOT EXISTS {_q('ix_' + tabla + '_item')} "
+            f"ON {_q(tabla)} ({_q(c_item)}, _dia)"
+        )
+        con.execute(
+            f"CREATE INDEX IF NOT EXISTS {_q('ix_' + tabla + '_ubic')} "
+            f"ON {_q(tabla)} ({_q(c_ubic)}, _dia)"
+        )
+    con.execute("DROP VIEW IF EXISTS historial")
+    con.execute("CREATE VIEW historial AS " + " UNION ALL ".join(partes))
+    con.commit()
+
+
+def _conectar():
+    con = event_store.conectar()
+    with _lock:
+        if event_store.DB_PATH not in _vista_lista:
+            _crear_vista(con)
+            _vista_lista.add(event_store.DB_PATH)
+    return con
+
+
+def _condiciones(tipos=None, desde=None, hasta=None, item=None, ubicacion=None, subcategoria=None):
+    where, params = [], []
+    if tipos:
+        where.append('"Tipo operación" IN (' + ", ".join("?" * len(tipos)) + ")")
+        params.extend(tipos)
+    if desde:
+        where.append("_dia >= ?")
+        params.append(str(desde))
+    if hasta:
+        where.append("_dia <= ?")
+        params.append(str(hasta))
+    for col, valor in (("Item", item), ("Ubicación", ubicacion), ("Subcategoría", subcategoria)):
+        if valor is not None:
+            where.append(f"{_q(col)} = ?")
+            params.append(valor)
+    return (" WHERE " + " AND ".join(where) if where else ""), params
+
+
+def _sincronizar(tipos=None):
+    """Importa los Excel copiados a mano antes de calcular la clave de caché.
+
+    La firma del almacén no cambia al copiar un archivo a una carpeta: si se
+    sincronizara sólo al no encontrar la consulta en caché, el resultado
+    guardado se serviría indefinidamente.
+    """
+    event_store.sincronizar([FUENTES[t][0] for t in (tipos or FUENTES)])
+
+
+def _ejecutar(sql, params):
+    con = _conectar()
+    try:
+        return pd.read_sql_query(sql, con, params=params)
+    finally:
+        con.close()
+
+
+def contar(**filtros):
+    """Cantidad de registros que cumplen los filtros."""
+    _sincronizar(filtros.get("tipos"))
+    where, params = _condiciones(**filtros)
+    clave = ("historial_contar", event_store.DB_PATH, where, tuple(params))
+    df = cache.obtener(
+        clave, event_store.firma(),
+        lambda: _ejecutar(f"SELECT COUNT(*) AS n FROM historial{where}", params),
+    )
+    return int(df["n"].iloc[0])
+
+
+def consultar(pagina=0, por_pagina=200, **filtros):
+    """Registros del historial (más recientes primero) de la página indicada.
+
+    ``por_pagina=None`` devuelve todos los registros filtrados.
+    """
+    _sincronizar(filtros.get("tipos"))
+    orden = ' ORDER BY _dia DESC, "Tipo operación", _fila'
+    columnas = ", ".join(_q(c) for c in COLUMNAS)
+    if por_pagina is None:
+        where, params = _condiciones(**filtros)
+        sql = f"SELECT {columnas} FROM historial{where}{orden}"
+    else:
+        # Las primeras filas de la unión salen de las primeras de cada tabla
+        tipos = filtros.pop("tipos", None) or list(FUENTES)
+        where, condiciones = _condiciones(**filtros)
+        tope = (int(pagina) + 1) * int(por_pagina)
+        ramas, params = [], []
+        for tipo in tipos:
+            ramas.append(
+                f"SELECT * FROM (SELECT * FROM ({_seleccion(tipo)}){where} "
+                "ORDER BY _dia DESC, _fila LIMIT ?)"
+            )
+            params += condiciones + [tope]
+        sql = (
+            f"SELECT {columnas} FROM ({' UNION ALL '.join(ramas)}){orden} LIMIT ? OFFSET ?"
+        )
+        params += [int(por_pagina), int(pagina) * int(por_pagina)]
+    clave = ("historial_consultar", event_store.DB_PATH, sql, tuple(params))
+    df = cache.obtener(clave, event_store.firma(), lambda: _ejecutar(sql, params))
+    df["Cantidad"] = pd.to_numeric(df["Cantidad"], errors="coerce")
+    return df
+
+
+def opciones(tipos=None):
+    """Valores distintos de Ubicación, Item y Subcategoría y rango de fechas."""
+    _sincronizar(tipos)
+    where, params = _condiciones(tipos=tipos)
+
+    def calcular():
+        resultado = {}
+        for col in ("Ubicación", "Item", "Subcategoría"):
+            df = _ejecutar(
+                f"SELECT DISTINCT {_q(col)} AS v FROM historial{where} ORDER BY v", params
+            )
+            resultado[col] = [v for v in df["v"] if v is not None]
+        rango = _ejecutar(f"SELECT MIN(_dia) AS desde, MAX(_dia) AS hasta FROM historial{where}", params)
+        resultado["desde"] = rango["desde"].iloc[0]
+        resultado["hasta"] = rango["hasta"].iloc[0]
+        return resultado
+
+    clave = ("historial_opciones", event_store.DB_PATH, where, tuple(params))
+    return cache.obtener(clave, event_store.firma(), calcular)
@@ -0,0 +1,72 @@
+"""Lectura en paralelo de muchos Excel con un esquema común.
+
+:func:`leer_excels` reparte los archivos entre varios procesos (openpyxl es
+Python puro, así que los hilos no escalan con los núcleos) y usa el motor
+``calamine`` cuando ``python-calamine`` está instalado. Los archivos que no
+se pueden leer no se descartan en silencio: se devuelven en una lista de
+fallos con el archivo y el error.
+"""
+import importlib.util
+import os
+
+import pandas as pd
+
+from utils import paralelo, perf
+
+MOTOR = "calamine" if importlib.util.find_spec("python_calamine") else "openpyxl"
+MIN_ARCHIVOS_PROCESOS = 8  # por debajo de esto no compensa arrancar procesos
+
+
+class Columnas:
+    """``usecols`` que acepta una columna si su nombre (sin espacios) está en ``nombres``.
+
+    Es una clase y no una lambda para poder enviarse a otros procesos.
+    """
+
+    def __init__(self, nombres):
+        self.nombres = frozenset(nombres)
+
+    def __call__(self, columna):
+        return str(columna).strip() in self.nombres
+
+
+def _leer(ruta, motor, usecols, dtype):
+    try:
+        return ruta, pd.read_excel(ruta, engine=motor, usecols=usecols, dtype=dtype), None
+    except Exception as e:
+        return ruta, None, f"{type(e).__name__}: {e}"
+
+
+def leer_excels(rutas, usecols=None, dtype=None, motor=None, trabajadores=None, procesos=None):
+    """Lee ``rutas`` en paralelo.
+
+    Devuelve ``(leidos, fallidos)``: ``leidos`` es un dict ruta -> DataFrame
+    en el orden de ``rutas`` y ``fallidos`` una lista de dicts con
+    ``archivo`` y ``error``. ``usecols`` y ``dtype`` se pasan a
+    ``pd.read_excel`` para cada archivo.
+    """
+    rutas = list(rutas)
+    with perf.medir("excel.leer_lote", archivos=len(rutas)) as registro:
+        leidos, fallidos = _leer_todos(rutas, usecols, dtype, motor, trabajadores, procesos)
+        registro["filas"] = sum(len(df) for df in leidos.values())
+        registro["bytes"] = sum(os.path.getsize(r) for r in leidos)
+    return leidos, fallidos
+
+
+def _leer_todos(rutas, usecols, dtype, motor, trabajadores, procesos):
+    motor = motor or MOTOR
+    trabajadores = trabajadores or os.cpu_count() or 1
+    if procesos is None:
+        procesos = trabajadores > 1 and len(rutas) >= MIN_ARCHIVOS_PROCESOS
+    n = len(rutas)
+    resultados = paralelo.mapear(
+        _leer, rutas, [motor] * n, [usecols] * n, [dtype] * n,
+        trabajadores=trabajadores, procesos=procesos,
+    )
+    leidos, fallidos = {}, []
+    for ruta, df, error in resultados:
+        if error is None:
+            leidos[ruta] = df
+        else:
+            fallidos.append({"archivo": ruta, "error": error})
+    return leidos, fallidos
@@ -0,0 +1,14 @@
+import pandas as pd
+
+
+def sumar_por_par(df, col_item, col_ubic, col_cant, indice):
+    """Suma ``col_cant`` agrupando por (ítem, ubicación) alineado a ``indice``.
+
+    ``indice`` es un MultiIndex (Item, Ubicación) que puede tener pares
+    repetidos; los pares sin movimientos quedan en cero.
+    """
+    if df.empty or col_item not in df.columns or col_ubic not in df.columns:
+        return pd.Series(0.0, index=indice)
+    cantidades = pd.to_numeric(df[col_cant], errors="coerce")
+    sumas = cantidades.groupby([df[col_item], df[col_ubic]]).sum()
+    return sumas.reindex(indice, fill_value=0.0).astype(float)
@@ -0,0 +1,33 @@
+"""Reparto de trabajo independiente entre procesos, con hilos como respaldo."""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+def mapear(funcion, *iterables, trabajadores=None, procesos=True):
+    """Como ``map(funcion, *iterables)`` pero en paralelo; devuelve una lista.
+
+    Con ``procesos`` se usa un pool de procesos (``funcion`` y sus argumentos
+    deben poder serializarse) y, si el entorno no permite procesos hijos, se
+    reintenta con hilos. Con un solo trabajador o un solo elemento se ejecuta
+    en línea.
+    """
+    argumentos = [list(i) for i in iterables]
+    total = len(argumentos[0]) if argumentos else 0
+    trabajadores = trabajadores or os.cpu_count() or 1
+    if total <= 1 or trabajadores == 1:
+        return [funcion(*a) for a in zip(*argumentos)]
+    n = min(trabajadores, total)
+    if procesos:
+        # spawn: la app ya tiene hilos propios (escritor, trabajos) y
+        # hacer fork con hilos vivos puede dejar candados tomados
+        try:
+            with ProcessPoolExecutor(n, mp_context=multiprocessing.get_context("spawn")) as ejecutor:
+                return list(ejecutor.map(
+                    funcion, *argumentos, chunksize=max(1, total // (4 * n))
+                ))
+        except BrokenProcessPool:
+            pass  # entorno sin procesos hijos: se usan hilos
+    with ThreadPoolExecutor(n) as ejecutor:
+        return list(ejecutor.map(funcion, *argumentos))
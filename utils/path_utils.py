@@ -1,7 +1,8 @@
 import os
 from glob import glob
 
-DATA_DIR = "data"
+# INVENTARIO_DATA_DIR permite apuntar la app (o los benchmarks) a otro árbol
+DATA_DIR = os.environ.get("INVENTARIO_DATA_DIR", "data")
 CATALOGO_DIR = os.path.join(DATA_DIR, "catalogo")
 RECETAS_DIR = os.path.join(DATA_DIR, "recetas")
 PLANTILLAS_DIR = os.path.join(DATA_DIR, "plantillas")
@@ -12,11 +13,9 @@ AUDITORIA_AP_DIR = os.path.join(DATA_DIR, "auditorias", "apertura")
 AUDITORIA_CI_DIR = os.path.join(DATA_DIR, "auditorias", "cierre")
 CIERRES_CONFIRMADOS_DIR = os.path.join(DATA_DIR, "cierres_confirmados")
 REPORTES_PDF_DIR = os.path.join(DATA_DIR, "reportes_pdf")
+LOGS_DIR = os.path.join(DATA_DIR, "logs")
 
-# Ensure expected directory structure exists so other modules can safely
-# list or write files without triggering FileNotFoundError when the app
-# runs for the first time.
-for _dir in [
+CARPETAS = [
     CATALOGO_DIR,
     RECETAS_DIR,
     PLANTILLAS_DIR,
@@ -27,8 +26,25 @@ for _dir in [
     AUDITORIA_CI_DIR,
     CIERRES_CONFIRMADOS_DIR,
     REPORTES_PDF_DIR,
-]:
-    os.makedirs(_dir, exist_ok=True)
+    LOGS_DIR,
+]
+
+_estructura_lista = set()
+
+
+def asegurar_estructura():
+    """Crea las carpetas de ``data/`` que falten; sólo la primera vez por árbol.
+
+    Se llama al arrancar la app (y las herramientas de consola) para que los
+    módulos puedan listar o escribir archivos sin FileNotFoundError en la
+    primera ejecución. Importar este módulo no crea nada.
+    """
+    if DATA_DIR in _estructura_lista:
+        return
+    for carpeta in CARPETAS:
+        os.makedirs(carpeta, exist_ok=True)
+    _estructura_lista.add(DATA_DIR)
+
 
 def latest_file(folder, prefix):
     """Return the newest Excel file matching prefix_YYYY-MM-DD.xlsx in folder."""
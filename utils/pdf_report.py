@@ -2,6 +2,7 @@ from fpdf import FPDF
 import pandas as pd
 import os
 from datetime import datetime
+from utils import escritor, perf
 from utils.path_utils import REPORTES_PDF_DIR
 
 LOGO_PATH = os.path.join(REPORTES_PDF_DIR, "logo.png")  # Cambia esto si tu logo está en otra ubicación
@@ -17,6 +18,13 @@ def _safe_text(text) -> str:
 
     return str(text).encode("latin-1", "replace").decode("latin-1")
 
+def _pdf_bytes(pdf) -> bytes:
+    """Bytes del documento; fpdf2 devuelve bytearray y pyfpdf una cadena."""
+    salida = pdf.output(dest="S")
+    if isinstance(salida, str):
+        return salida.encode("latin-1", "replace")
+    return bytes(salida)
+
 class PDF(FPDF):
     def header(self):
         # Logo (opcional)
@@ -32,24 +40,45 @@ class PDF(FPDF):
         footer_text = f'Página {self.page_no()} - {datetime.today().strftime("%Y-%m-%d %H:%M")}'
         self.cell(0, 10, _safe_text(footer_text), 0, 0, 'C')
 
-    def tabla(self, dataframe: pd.DataFrame):
+    def tabla(self, dataframe: pd.DataFrame, alto_fila: float = 8):
+        """Dibuja ``dataframe`` como tabla, repitiendo el encabezado en cada página.
+
+        Los textos y anchos se calculan por columna antes de dibujar, de modo
+        que tablas de miles de filas no pasan por ``iterrows``.
+        """
         self.set_font("Arial", size=9)
-        # Ancho de columna automático
+        columnas = list(dataframe.columns)
+        # Textos por columna (truncados) y ancho automático
+        textos = []
         col_widths = []
-        for col in dataframe.columns:
-            max_content = max(dataframe[col].astype(str).apply(len).max(), len(str(col)))
+        for col in columnas:
+            serie = dataframe[col].astype(str)
+            max_content = max(int(serie.str.len().max()) if len(serie) else 0, len(str(col)))
             col_widths.append(max(18, min(40, max_content*4.2)))
-        # Encabezado
-        for i, col in enumerate(dataframe.columns):
-            self.cell(col_widths[i], 8, _safe_text(col), 1, 0, "C", fill=True)
-        self.ln()
-        # Filas
-        for idx, row in dataframe.iterrows():
-            for i, col in enumerate(dataframe.columns):
-                val = _safe_text(row[col])
-                self.cell(col_widths[i], 8, val[:25], 1, 0, "C")
+            textos.append(serie.map(_safe_text).str[:25].tolist())
+        encabezados = [_safe_text(col) for col in columnas]
+
+        def encabezado():
+            for ancho, texto in zip(col_widths, encabezados):
+                self.cell(ancho, alto_fila, texto, 1, 0, "C", fill=True)
             self.ln()
 
+        encabezado()
+        auto_salto = self.auto_page_break
+        self.set_auto_page_break(False, margin=self.b_margin)
+        try:
+            for fila in zip(*textos):
+                if self.get_y() + alto_fila > self.page_break_trigger:
+                    self.add_page()
+                    self.set_font("Arial", size=9)
+                    encabezado()
+                for ancho, val in zip(col_widths, fila):
+                    self.cell(ancho, alto_fila, val, 1, 0, "C")
+                self.ln()
+        finally:
+            self.set_auto_page_break(auto_salto, margin=self.b_margin)
+
+@perf.medido("pdf.apertura")
 def generar_pdf_apertura(df, ruta_pdf=None):
     pdf = PDF()
     pdf.title = "Auditoría de Apertura de Inventario"
@@ -62,12 +91,12 @@ def generar_pdf_apertura(df, ruta_pdf=None):
     pdf.ln(6)
     pdf.set_font("Arial", "I", 10)
     pdf.cell(0, 10, _safe_text("Auditoría generada automáticamente por el sistema de inventario."), ln=1)
-    pdf_bytes = pdf.output(dest="S").encode("latin-1", "replace")
+    pdf_bytes = _pdf_bytes(pdf)
     if ruta_pdf:
-        with open(ruta_pdf, "wb") as f:
-            f.write(pdf_bytes)
+        escritor.escribir(ruta_pdf, pdf_bytes)
     return pdf_bytes
 
+@perf.medido("pdf.cierre")
 def generar_pdf_cierre(df, ruta_pdf=None):
     pdf = PDF()
     pdf.title = "Auditoría de Cierre de Inventario"
@@ -84,13 +113,13 @@ def generar_pdf_cierre(df, ruta_pdf=None):
     pdf.ln(6)
     pdf.set_font("Arial", "I", 10)
     pdf.cell(0, 10, _safe_text("Auditoría generada automáticamente por el sistema de inventario."), ln=1)
-    pdf_bytes = pdf.output(dest="S").encode("latin-1", "replace")
+    pdf_bytes = _pdf_bytes(pdf)
     if ruta_pdf:
-        with open(ruta_pdf, "wb") as f:
-            f.write(pdf_bytes)
+        escritor.escribir(ruta_pdf, pdf_bytes)
     return pdf_bytes
 
 
+@perf.medido("pdf.stock")
 def generar_pdf_stock(df, ruta_pdf=None):
     """Genera un reporte PDF genérico para el módulo de stock."""
     pdf = PDF()
@@ -104,8 +133,8 @@ def generar_pdf_stock(df, ruta_pdf=None):
     pdf.ln(6)
     pdf.set_font("Arial", "I", 10)
     pdf.cell(0, 10, _safe_text("Reporte generado automáticamente por el sistema de inventario."), ln=1)
-    pdf_bytes = pdf.output(dest="S").encode("latin-1", "replace")
+    pdf_bytes = _pdf_bytes(pdf)
     if ruta_pdf:
-        with open(ruta_pdf, "wb") as f:
-            f.write(pdf_bytes)
+        escritor.escribir(ruta_pdf, pdf_bytes)
     return pdf_bytes
+
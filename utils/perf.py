@@ -0,0 +1,126 @@
+"""Instrumentación liviana de las operaciones costosas.
+
+:func:`medir` (context manager) y :func:`medido` (decorador) registran el
+tiempo de pared, las filas procesadas, los bytes leídos o escritos y los
+aciertos de caché de cada operación. Los registros se acumulan por hilo, de
+modo que cada ejecución del script de Streamlit ve sólo los suyos
+(:func:`iniciar_rerun` los reinicia; los hilos que nunca lo llaman, como
+los del pool, la ingesta o el CLI, conservan sólo los últimos
+:data:`MAX_REGISTROS`), y además se escriben como JSON en un
+log rotativo (``data/logs/perf.log``) para revisarlos en producción.
+"""
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+from utils.path_utils import LOGS_DIR
+
+LOG_PATH = os.path.join(LOGS_DIR, "perf.log")
+LOG_MAX_BYTES = 1024 * 1024
+LOG_RESPALDOS = 5
+MAX_REGISTROS = 1000  # por hilo
+
+_local = threading.local()
+_logger = logging.getLogger("inventario.perf")
+_logger.setLevel(logging.INFO)
+_logger.propagate = False
+_lock = threading.Lock()
+
+
+def _log():
+    with _lock:
+        if not _logger.handlers:
+            os.makedirs(LOGS_DIR, exist_ok=True)
+            handler = RotatingFileHandler(
+                LOG_PATH, maxBytes=LOG_MAX_BYTES, backupCount=LOG_RESPALDOS, encoding="utf-8"
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            _logger.addHandler(handler)
+    return _logger
+
+
+def _registros_hilo():
+    if not hasattr(_local, "registros"):
+        _local.registros = deque(maxlen=MAX_REGISTROS)
+        _local.nivel = 0
+        _local.rerun = None
+    return _local.registros
+
+
+def iniciar_rerun(nombre=None):
+    """Descarta los registros del hilo actual; llamar al inicio de cada rerun."""
+    _registros_hilo().clear()
+    _local.nivel = 0
+    _local.rerun = nombre
+
+
+def registros():
+    """Registros del hilo actual en orden de inicio."""
+    return sorted(_registros_hilo(), key=lambda r: r["inicio"])
+
+
+def _aciertos_cache():
+    from utils import cache
+    return cache.estadisticas()["hits"]
+
+
+def contar_filas(valor):
+    """Filas de un DataFrame (o del primero de una tupla), si corresponde."""
+    if isinstance(valor, tuple) and valor:
+        valor = valor[0]
+    try:
+        return len(valor.index)
+    except AttributeError:
+        return None
+
+
+@contextmanager
+def medir(nombre, **datos):
+    """Mide el bloque; el dict entregado admite ``filas`` y ``bytes`` u otros datos."""
+    registros_hilo = _registros_hilo()
+    registro = {"operacion": nombre, "filas": None, "bytes": None, **datos}
+    registro["nivel"] = _local.nivel
+    registro["hilo"] = threading.current_thread().name
+    aciertos = _aciertos_cache()
+    inicio = time.perf_counter()
+    registro["inicio"] = time.time()
+    _local.nivel += 1
+    try:
+        yield registro
+    except BaseException as e:
+        registro["error"] = type(e).__name__
+        raise
+    finally:
+        _local.nivel -= 1
+        registro["segundos"] = time.perf_counter() - inicio
+        registro["aciertos_cache"] = _aciertos_cache() - aciertos
+        registro["rerun"] = _local.rerun
+        registros_hilo.append(registro)
+        try:
+            _log().info(json.dumps(registro, ensure_ascii=False, default=str))
+        except OSError:
+            pass  # sin log en disco se conserva el registro en memoria
+
+
+def medido(nombre=None):
+    """Decorador que mide cada llamada y cuenta las filas del resultado."""
+    def decorador(funcion):
+        etiqueta = nombre or funcion.__qualname__
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with medir(etiqueta) as registro:
+                resultado = funcion(*args, **kwargs)
+                if isinstance(resultado, (bytes, bytearray)):
+                    registro["bytes"] = len(resultado)
+                else:
+                    registro["filas"] = contar_filas(resultado)
+                return resultado
+        return envoltura
+    return decorador
@@ -0,0 +1,179 @@
+"""Saldo corriente de inventario por (Item, Ubicación).
+
+El saldo se guarda en la tabla ``saldos`` del almacén y se actualiza con
+deltas cada vez que se escribe un día de entradas, transferencias, ventas
+procesadas o un cierre confirmado. Equivale a la fórmula de
+``calcular_stock_actual``: último cierre confirmado + entradas +
+transferencias netas - consumo en Barra/Vinera, todo en ml.
+
+Para comprobar o regenerar el saldo desde cero::
+
+    python -m utils.saldos verificar
+    python -m utils.saldos reconstruir
+"""
+import sys
+
+import pandas as pd
+
+TABLAS_CON_EFECTO = {"entradas", "transferencias", "ventas_procesadas", "cierres_confirmados"}
+UBICACIONES_CONSUMO = ["Barra", "Vinera"]
+TOLERANCIA = 1e-6
+
+
+def _q(nombre):
+    return '"' + nombre.replace('"', '""') + '"'
+
+
+def asegurar_tabla(con):
+    """Crea la tabla de saldos; devuelve True si no existía."""
+    existe = con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'saldos'"
+    ).fetchone()
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS saldos ("
+        '"Item" TEXT NOT NULL, "Ubicación" TEXT NOT NULL, "Cantidad" REAL NOT NULL, '
+        'PRIMARY KEY ("Item", "Ubicación"))'
+    )
+    return existe is None
+
+
+def _delta(df, col_item, col_ubic, valores):
+    return pd.DataFrame({
+        "Item": df[col_item].to_numpy(),
+        "Ubicación": df[col_ubic].to_numpy(),
+        "Cantidad": pd.to_numeric(valores, errors="coerce").to_numpy(dtype=float),
+    })
+
+
+def efecto(tabla, df):
+    """Efecto en ml de las filas ``df`` de ``tabla`` sobre el saldo por par."""
+    if df.empty:
+        partes = []
+    elif tabla == "entradas":
+        partes = [_delta(df, "Item", "Ubicación destino", df["Cantidad"])]
+    elif tabla == "transferencias":
+        partes = [
+            _delta(df, "Item", "Hacia", df["Cantidad"]),
+            _delta(df, "Item", "Desde", -pd.to_numeric(df["Cantidad"], errors="coerce")),
+        ]
+    elif tabla == "ventas_procesadas":
+        consumo = df[df["Ubicación de salida"].isin(UBICACIONES_CONSUMO)]
+        partes = [_delta(
+            consumo, "Item usado", "Ubicación de salida",
+            -pd.to_numeric(consumo["Cantidad teórica consumida"], errors="coerce"),
+        )]
+    elif tabla == "cierres_confirmados":
+        # Igual que el cálculo completo: se usa la primera fila de cada par
+        cierre = df.drop_duplicates(subset=["Item", "Ubicación"])
+        partes = [_delta(cierre, "Item", "Ubicación", cierre["Físico Cierre"])]
+    else:
+        partes = []
+    if not partes:
+        return pd.Series(dtype=float, index=pd.MultiIndex.from_tuples([], names=["Item", "Ubicación"]))
+    todo = pd.concat(partes, ignore_index=True).dropna(subset=["Item", "Ubicación"])
+    return todo.groupby(["Item", "Ubicación"])["Cantidad"].sum()
+
+
+def _leer(con, tabla, archivos=None):
+    sql = f"SELECT * FROM {_q(tabla)}"
+    params = []
+    if archivos is not None:
+        sql += " WHERE _archivo IN (" + ", ".join("?" * len(archivos)) + ")"
+        params = list(archivos)
+    return pd.read_sql_query(sql + " ORDER BY _archivo, _fila", con, params=params)
+
+
+def _ultimo_cierre(con):
+    fila = con.execute("SELECT MAX(_archivo) FROM cierres_confirmados").fetchone()
+    return fila[0]
+
+
+def estado(con, tabla, archivo):
+    """Aporte actual de ``archivo`` al saldo (o del último cierre, para cierres)."""
+    if tabla not in TABLAS_CON_EFECTO:
+        return None
+    if tabla == "cierres_confirmados":
+        archivo = _ultimo_cierre(con)
+        if archivo is None:
+            return efecto(tabla, pd.DataFrame())
+    return efecto(tabla, _leer(con, tabla, [archivo]))
+
+
+def aplicar(con, antes, despues):
+    """Suma al saldo persistido la diferencia ``despues - antes``."""
+    if antes is None or despues is None:
+        return
+    delta = despues.sub(antes, fill_value=0.0)
+    delta = delta[delta.abs() > TOLERANCIA]
+    if delta.empty:
+        return
+    con.executemany(
+        'INSERT INTO saldos ("Item", "Ubicación", "Cantidad") VALUES (?, ?, ?) '
+        'ON CONFLICT ("Item", "Ubicación") DO UPDATE SET "Cantidad" = "Cantidad" + excluded."Cantidad"',
+        ((item, ubic, float(cant)) for (item, ubic), cant in delta.items()),
+    )
+
+
+def recalcular(con):
+    """Saldo por par recalculado a partir de todo el historial del almacén."""
+    partes = [efecto(tabla, _leer(con, tabla)) for tabla in ("entradas", "transferencias", "ventas_procesadas")]
+    ultimo = _ultimo_cierre(con)
+    if ultimo is not None:
+        partes.append(efecto("cierres_confirmados", _leer(con, "cierres_confirmados", [ultimo])))
+    partes = [p for p in partes if not p.empty]
+    if not partes:
+        return efecto("entradas", pd.DataFrame())
+    return pd.concat(partes).groupby(level=["Item", "Ubicación"]).sum()
+
+
+def reconstruir(con):
+    """Reemplaza la tabla de saldos por el recálculo completo."""
+    total = recalcular(con)
+    con.execute("DELETE FROM saldos")
+    con.executemany(
+        'INSERT INTO saldos ("Item", "Ubicación", "Cantidad") VALUES (?, ?, ?)',
+        ((item, ubic, float(cant)) for (item, ubic), cant in total.items()),
+    )
+    return total
+
+
+def leer_saldos(con):
+    """Saldo persistido como serie indexada por (Item, Ubicación)."""
+    df = pd.read_sql_query('SELECT "Item", "Ubicación", "Cantidad" FROM saldos', con)
+    return df.set_index(["Item", "Ubicación"])["Cantidad"].astype(float)
+
+
+def verificar(con):
+    """Compara el saldo incremental con el recálculo completo.
+
+    Devuelve un DataFrame con los pares que difieren (vacío si coinciden).
+    """
+    persistido = leer_saldos(con)
+    completo = recalcular(con)
+    df = pd.DataFrame({"Incremental": persistido, "Recalculado": completo}).fillna(0.0)
+    df["Diferencia"] = df["Incremental"] - df["Recalculado"]
+    return df[df["Diferencia"].abs() > TOLERANCIA].reset_index()
+
+
+if __name__ == "__main__":
+    from utils.event_store import conectar
+
+    comando = sys.argv[1] if len(sys.argv) > 1 else ""
+    if comando not in ("verificar", "reconstruir"):
+        print("Uso: python -m utils.saldos [verificar|reconstruir]")
+        sys.exit(1)
+    con = conectar()
+    try:
+        if comando == "reconstruir":
+            with con:
+                total = reconstruir(con)
+            print(f"Saldo reconstruido para {len(total)} pares (Item, Ubicación).")
+        else:
+            diferencias = verificar(con)
+            if diferencias.empty:
+                print("El saldo incremental coincide con el recálculo completo.")
+            else:
+                print(diferencias.to_string(index=False))
+                sys.exit(2)
+    finally:
+        con.close()
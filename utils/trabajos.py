@@ -0,0 +1,229 @@
+"""Ejecución en segundo plano de reportes pesados (PDF y exportaciones).
+
+Cada trabajo genera los bytes de un archivo a partir de un DataFrame y los
+guarda en disco (por defecto en ``data/reportes_pdf``) mediante el escritor
+único. El identificador del trabajo se deriva de la función, la ruta, la
+fecha y el contenido del DataFrame: pedir dos veces el mismo reporte
+devuelve el mismo trabajo y, si el archivo ya existe con ese contenido, no se
+vuelve a generar. Junto a cada resultado se guarda ``.<archivo>.id`` con el
+identificador que lo produjo y la firma (inodo, tamaño, mtime) del archivo
+que quedó en su lugar; ambos se escriben en una sola tarea del escritor, sin
+coalescer con otras. Si otro trabajo escribió después el mismo archivo, el
+primero figura como reemplazado y ya no ofrece la descarga, y :func:`leer`
+sólo entrega los bytes cuya firma coincide con la marca. Los
+reportes que dependen de filtros de la página se piden con ``unico=True``,
+que agrega el identificador al nombre del archivo.
+
+Las páginas consultan :func:`estado` para mostrar el avance y pueden
+:func:`cancelar` un trabajo: si aún no empezó no se ejecuta y si ya está en
+curso su resultado se descarta.
+"""
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from utils import cache, escritor
+from utils.path_utils import REPORTES_PDF_DIR
+
+MAX_HILOS = min(4, os.cpu_count() or 1)
+MAX_TRABAJOS = 200
+
+EN_COLA = "en cola"
+EN_CURSO = "en curso"
+LISTO = "listo"
+ERROR = "error"
+CANCELADO = "cancelado"
+REEMPLAZADO = "reemplazado"  # el archivo lo sobrescribió otro trabajo
+
+_pool = ThreadPoolExecutor(max_workers=MAX_HILOS, thread_name_prefix="trabajo")
+_lock = threading.Lock()
+_trabajos = {}  # id -> dict con el estado del trabajo
+
+
+def _identificador(generar, df, ruta):
+    h = hashlib.sha1()
+    for parte in (generar.__module__, generar.__name__, os.path.abspath(ruta),
+                  datetime.today().strftime("%Y-%m-%d"), cache.hash_dataframe(df)):
+        h.update(parte.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()[:16]
+
+
+def _marca(ruta):
+    return os.path.join(os.path.dirname(ruta), f".{os.path.basename(ruta)}.id")
+
+
+def _firma(info):
+    return f"{info.st_ino}:{info.st_size}:{info.st_mtime_ns}"
+
+
+def _leer_marca(ruta):
+    """(id, firma) guardados junto a ``ruta``; (None, None) si no hay marca válida."""
+    try:
+        with open(_marca(ruta), encoding="utf-8") as f:
+            partes = f.read().split()
+    except OSError:
+        return None, None
+    return tuple(partes) if len(partes) == 2 else (None, None)
+
+
+def _en_disco(ruta, trabajo_id):
+    marca_id, firma = _leer_marca(ruta)
+    try:
+        return marca_id == trabajo_id and firma == _firma(os.stat(ruta))
+    except OSError:
+        return False
+
+
+def _guardar(ruta, contenido, trabajo_id):
+    """Escribe el resultado y su marca en una única tarea del escritor.
+
+    La marca anterior se borra antes de reemplazar el archivo, así que en
+    ningún momento queda la marca de un trabajo junto a los bytes de otro.
+    """
+    def tarea():
+        marca = _marca(ruta)
+        try:
+            os.remove(marca)
+        except FileNotFoundError:
+            pass
+        escritor.escribir_atomico(ruta, contenido)
+        firma = _firma(os.stat(ruta))
+        escritor.escribir_atomico(marca, f"{trabajo_id} {firma}".encode("utf-8"))
+
+    escritor.ejecutar(tarea)
+
+
+def _actualizar(trabajo_id, **cambios):
+    with _lock:
+        _trabajos[trabajo_id].update(cambios)
+
+
+def _ejecutar(trabajo_id, generar, df, ruta, cancelar):
+    if cancelar.is_set():
+        _actualizar(trabajo_id, estado=CANCELADO, fin=time.time())
+        return None
+    _actualizar(trabajo_id, estado=EN_CURSO, inicio=time.time())
+    try:
+        contenido = generar(df)
+        if cancelar.is_set():
+            _actualizar(trabajo_id, estado=CANCELADO, fin=time.time())
+            return None
+        _guardar(ruta, contenido, trabajo_id)
+        cache.invalidar(ruta)
+    except Exception as e:
+        _actualizar(trabajo_id, estado=ERROR, error=str(e), fin=time.time())
+        return None
+    _actualizar(trabajo_id, estado=LISTO, fin=time.time())
+    return ruta
+
+
+def _podar():
+    terminados = [
+        t for t in _trabajos.values() if t["estado"] in (LISTO, ERROR, CANCELADO)
+    ]
+    terminados.sort(key=lambda t: t["creado"])
+    for t in terminados[: max(0, len(_trabajos) - MAX_TRABAJOS)]:
+        del _trabajos[t["id"]]
+        if t["unico"]:
+            # Nadie más usa ese archivo: se borra con el trabajo
+            for ruta in (t["ruta"], _marca(t["ruta"])):
+                try:
+                    os.remove(ruta)
+                except OSError:
+                    pass
+
+
+def enviar(generar, df, nombre, carpeta=REPORTES_PDF_DIR, descripcion=None, unico=False):
+    """Encola ``generar(df) -> bytes`` y devuelve el id del trabajo.
+
+    El resultado se guarda como ``carpeta/nombre`` o, con ``unico``, como
+    ``carpeta/<nombre>_<id>.<ext>`` (la descarga conserva ``nombre``). Si ya
+    hay un trabajo igual (o su resultado está en disco) se reutiliza.
+    """
+    ruta = os.path.join(carpeta, nombre)
+    df = df.copy()
+    trabajo_id = _identificador(generar, df, ruta)
+    if unico:
+        base, extension = os.path.splitext(nombre)
+        ruta = os.path.join(carpeta, f"{base}_{trabajo_id}{extension}")
+    with _lock:
+        previo = _trabajos.get(trabajo_id)
+        if previo is not None and previo["estado"] not in (ERROR, CANCELADO):
+            return trabajo_id
+        trabajo = {
+            "id": trabajo_id,
+            "descripcion": descripcion or nombre,
+            "nombre": nombre,
+            "ruta": ruta,
+            "unico": unico,
+            "estado": EN_COLA,
+            "error": None,
+            "creado": time.time(),
+            "inicio": None,
+            "fin": None,
+        }
+        _trabajos[trabajo_id] = trabajo
+        _podar()
+        if _en_disco(ruta, trabajo_id):
+            trabajo.update(estado=LISTO, inicio=trabajo["creado"], fin=trabajo["creado"])
+            return trabajo_id
+        cancelar = threading.Event()
+        trabajo["_cancelar"] = cancelar
+        trabajo["_futuro"] = _pool.submit(_ejecutar, trabajo_id, generar, df, ruta, cancelar)
+    return trabajo_id
+
+
+def estado(trabajo_id):
+    """Copia del estado de un trabajo (None si no existe).
+
+    Un trabajo listo cuyo archivo ya fue escrito por otro figura como
+    :data:`REEMPLAZADO`.
+    """
+    with _lock:
+        trabajo = _trabajos.get(trabajo_id)
+        if trabajo is None:
+            return None
+        info = {k: v for k, v in trabajo.items() if not k.startswith("_")}
+    if info["estado"] == LISTO and not _en_disco(info["ruta"], trabajo_id):
+        info["estado"] = REEMPLAZADO
+    return info
+
+
+def leer(trabajo_id):
+    """Bytes del resultado de un trabajo listo.
+
+    Se comprueba la firma del archivo abierto contra la marca, así que nunca
+    se entregan los bytes que otro trabajo escribió en la misma ruta.
+    """
+    with _lock:
+        ruta = _trabajos[trabajo_id]["ruta"]
+    marca_id, firma = _leer_marca(ruta)
+    with open(ruta, "rb") as f:
+        if marca_id != trabajo_id or firma != _firma(os.fstat(f.fileno())):
+            raise FileNotFoundError(f"{os.path.basename(ruta)} fue reemplazado por otro reporte")
+        return f.read()
+
+
+def cancelar(trabajo_id):
+    """Cancela un trabajo pendiente o descarta el resultado de uno en curso."""
+    with _lock:
+        trabajo = _trabajos.get(trabajo_id)
+        if trabajo is None or trabajo["estado"] not in (EN_COLA, EN_CURSO):
+            return False
+        trabajo["_cancelar"].set()
+        if trabajo["_futuro"].cancel():
+            trabajo.update(estado=CANCELADO, fin=time.time())
+    return True
+
+
+def esperar(trabajo_id, timeout=None):
+    """Bloquea hasta que el trabajo termine; devuelve su estado final."""
+    with _lock:
+        futuro = _trabajos.get(trabajo_id, {}).get("_futuro")
+    if futuro is not None and not futuro.cancelled():
+        futuro.result(timeout=timeout)
+    return estado(trabajo_id)
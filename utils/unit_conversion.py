@@ -1,5 +1,8 @@
+import os
 import pandas as pd
 
+from utils import cache
+
 
 def to_ml(item: str, cantidad: float, catalogo: pd.DataFrame) -> float:
     """Convert ``cantidad`` to milliliters based on catalog info.
@@ -59,3 +62,88 @@ def to_bottles(item: str, cantidad_ml: float, catalogo: pd.DataFrame):
     except Exception:
         pass
     return None
+
+
+def _capacidad_catalogo(cat: pd.DataFrame) -> pd.Series:
+    """Capacidad en ml por fila con la misma regla que ``to_ml``/``to_bottles``.
+
+    Se usa ``Volumen_ml_por_unidad`` y, si viene vacío o en cero, ``Cantidad
+    por unidad``. Valores no numéricos o no positivos quedan como NaN.
+    """
+    vol = cat["Volumen_ml_por_unidad"] if "Volumen_ml_por_unidad" in cat.columns else None
+    cpu = cat["Cantidad por unidad"] if "Cantidad por unidad" in cat.columns else None
+    if vol is None:
+        capacidad = cpu if cpu is not None else pd.Series(index=cat.index, dtype=float)
+    else:
+        vacio = vol.isin([0, ""]) | vol.map(lambda v: v is None)
+        capacidad = vol.mask(vacio, cpu) if cpu is not None else vol.mask(vacio)
+    capacidad = pd.to_numeric(capacidad, errors="coerce")
+    return capacidad.where(capacidad > 0)
+
+
+class CatalogIndex:
+    """Índice del catálogo para búsquedas O(1) por ítem.
+
+    Normaliza los encabezados (``Nombre`` o ``Item``, columnas antiguas y
+    nuevas de capacidad) una sola vez y guarda mapas ítem→capacidad en ml e
+    ítem→dosis en ml. Como en ``to_ml``/``to_bottles``, cuando un ítem aparece
+    repetido se toma la primera fila.
+    """
+
+    def __init__(self, catalogo: pd.DataFrame | None):
+        cat = pd.DataFrame() if catalogo is None else catalogo.copy()
+        cat.columns = cat.columns.astype(str).str.strip()
+        if "Item" not in cat.columns and "Nombre" in cat.columns:
+            cat = cat.rename(columns={"Nombre": "Item"})
+        if "Item" not in cat.columns:
+            cat["Item"] = pd.Series(dtype=object)
+        cat = cat.drop_duplicates(subset="Item").set_index("Item")
+        capacidad = _capacidad_catalogo(cat)
+        dosis = pd.to_numeric(cat.get("Dosis_ml"), errors="coerce") if "Dosis_ml" in cat.columns else None
+        self.capacidad: dict = capacidad.dropna().to_dict()
+        self.dosis: dict = {} if dosis is None else dosis.dropna().to_dict()
+
+    @classmethod
+    def desde_archivo(cls, path: str) -> "CatalogIndex":
+        """Índice del catálogo en ``path``, reconstruido sólo si el archivo cambió."""
+        return cache.obtener(
+            ("catalog_index", os.path.abspath(path)),
+            cache.firma(path),
+            lambda: cls(cache.leer_excel(path)),
+        )
+
+    @classmethod
+    def de(cls, catalogo) -> "CatalogIndex":
+        """Acepta un ``CatalogIndex`` ya construido o un DataFrame de catálogo."""
+        return catalogo if isinstance(catalogo, cls) else cls(catalogo)
+
+    def capacidad_de(self, item):
+        return self.capacidad.get(item)
+
+    def dosis_de(self, item):
+        return self.dosis.get(item)
+
+    def to_ml_series(self, items: pd.Series, cantidades: pd.Series) -> pd.Series:
+        """Versión vectorizada de ``to_ml`` para columnas completas.
+
+        Las cantidades de ítems sin capacidad válida se devuelven sin cambio.
+        """
+        capacidad = pd.Series(items, copy=False).map(self.capacidad).to_numpy(dtype=float)
+        numericas = pd.to_numeric(cantidades, errors="coerce")
+        convertir = numericas.notna() & ~pd.isna(capacidad)
+        return cantidades.mask(convertir, numericas * capacidad)
+
+    def to_bottles_series(self, items: pd.Series, cantidades_ml: pd.Series) -> pd.Series:
+        """Versión vectorizada de ``to_bottles``; NaN donde no hay capacidad."""
+        capacidad = pd.Series(items, copy=False).map(self.capacidad).to_numpy(dtype=float)
+        return pd.to_numeric(cantidades_ml, errors="coerce") / capacidad
+
+
+def to_ml_series(items: pd.Series, cantidades: pd.Series, catalogo) -> pd.Series:
+    """Convierte una columna de cantidades en botellas a ml."""
+    return CatalogIndex.de(catalogo).to_ml_series(items, cantidades)
+
+
+def to_bottles_series(items: pd.Series, cantidades_ml: pd.Series, catalogo) -> pd.Series:
+    """Convierte una columna de cantidades en ml a botellas."""
+    return CatalogIndex.de(catalogo).to_bottles_series(items, cantidades_ml)